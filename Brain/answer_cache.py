@@ -0,0 +1,196 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Persistent answer cache keyed on the query embedding.
+
+    Lookups first try an exact match on the normalized question, then a
+    cosine-similarity search over the cached query embeddings. Answers are
+    stored under a ``scope`` (e.g. generation mode and backend) and only
+    served to lookups of the same scope. Entries expire
+    after ``ttl`` seconds, the least recently used ones are evicted beyond
+    ``max_entries``, and the whole cache is dropped when the fingerprint of the
+    knowledge collection changes.
+    """
+
+    def __init__(self, embedding_function, path="./tejas_ai_knowledge_db/answer_cache.sqlite3",
+                 threshold=0.92, max_entries=1000, ttl=7 * 24 * 3600):
+        """
+        :param embedding_function: Callable mapping a list of texts to a list of vectors
+        :param path: SQLite file holding the cache
+        :param threshold: Minimum cosine similarity for a semantic hit
+        :param max_entries: Number of answers kept before LRU eviction
+        :param ttl: Seconds before an answer expires (None keeps answers forever)
+        """
+        self.embedding_function = embedding_function
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS answers (
+            key TEXT PRIMARY KEY, question TEXT, answer TEXT, embedding BLOB,
+            created REAL, last_access REAL, scope TEXT DEFAULT '')""")
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(answers)")]
+        if "scope" not in columns:  # Cache written before answers were scoped
+            self._db.execute("ALTER TABLE answers ADD COLUMN scope TEXT DEFAULT ''")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+        self._load()
+
+    @staticmethod
+    def normalize(question):
+        """Lowercase, collapse whitespace and drop trailing punctuation"""
+        return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?!. ")
+
+    @classmethod
+    def key(cls, question, scope=""):
+        return hashlib.sha256(f"{scope}\n{cls.normalize(question)}".encode("utf-8")).hexdigest()
+
+    def _load(self):
+        """Read every entry into memory as a normalized embedding matrix"""
+        rows = self._db.execute("SELECT key, embedding, last_access, scope FROM answers").fetchall()
+        self._keys = [row[0] for row in rows]
+        self._scopes = [row[3] for row in rows]
+        self._last_access = {row[0]: row[2] for row in rows}
+        if rows:
+            self._matrix = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+        else:
+            self._matrix = np.empty((0, 0), dtype=np.float32)
+
+    def embed(self, question):
+        """Unit-length float32 embedding of a question"""
+        vector = np.asarray(self.embedding_function([question])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def _fetch(self, key, now):
+        row = self._db.execute("SELECT answer, created FROM answers WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if self._expired(row[1], now):
+            self._delete([key])
+            return None
+        self._db.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, key))
+        self._db.commit()
+        self._last_access[key] = now
+        return row[0]
+
+    def lookup(self, question, scope=""):
+        """
+        Look up an answer for a question.
+        :param scope: Only answers stored under the same scope are returned
+        :return: (answer or None, query embedding or None when the exact path hit)
+        """
+        now = time.time()
+        key = self.key(question, scope)
+        with self._lock:
+            answer = self._fetch(key, now)
+            if answer is not None:
+                self.hits["exact"] += 1
+                return answer, None
+
+        embedding = self.embed(question)
+        with self._lock:
+            if self._matrix.shape[0] and self._matrix.shape[1] == embedding.shape[0]:
+                similarities = self._matrix @ embedding
+                candidates = [self._keys[i] for i in np.argsort(-similarities)
+                              if similarities[i] >= self.threshold and self._scopes[i] == scope]
+                # Best match first, falling through to the next one when an entry has expired
+                for candidate in candidates:
+                    answer = self._fetch(candidate, now)
+                    if answer is not None:
+                        self.hits["semantic"] += 1
+                        return answer, embedding
+            self.misses += 1
+        return None, embedding
+
+    def put(self, question, answer, embedding=None, scope=""):
+        """Store an answer under a scope, evicting least recently used entries beyond max_entries"""
+        if embedding is None:
+            embedding = self.embed(question)
+        embedding = np.asarray(embedding, dtype=np.float32)
+        now = time.time()
+        key = self.key(question, scope)
+
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (key, question, answer, embedding.tobytes(), now, now, scope))
+            self._db.commit()
+            if key in self._last_access:
+                self._matrix[self._keys.index(key)] = embedding
+            else:
+                self._keys.append(key)
+                self._scopes.append(scope)
+                self._matrix = embedding[None, :] if not self._matrix.size else np.vstack([self._matrix, embedding])
+            self._last_access[key] = now
+
+            overflow = len(self._keys) - self.max_entries
+            if overflow > 0:
+                self._delete(sorted(self._keys, key=self._last_access.get)[:overflow])
+
+    def _delete(self, keys):
+        self._db.executemany("DELETE FROM answers WHERE key = ?", [(key,) for key in keys])
+        self._db.commit()
+        doomed = set(keys)
+        keep = [i for i, key in enumerate(self._keys) if key not in doomed]
+        self._keys = [self._keys[i] for i in keep]
+        self._scopes = [self._scopes[i] for i in keep]
+        self._matrix = self._matrix[keep] if self._matrix.size else self._matrix
+        for key in doomed:
+            self._last_access.pop(key, None)
+
+    def purge_expired(self):
+        """Drop every entry older than the TTL"""
+        if self.ttl is None:
+            return
+        with self._lock:
+            cutoff = time.time() - self.ttl
+            rows = self._db.execute("SELECT key FROM answers WHERE created < ?", (cutoff,)).fetchall()
+            if rows:
+                self._delete([row[0] for row in rows])
+
+    def clear(self):
+        """Remove every cached answer"""
+        with self._lock:
+            self._db.execute("DELETE FROM answers")
+            self._db.commit()
+            self._load()
+
+    def sync_fingerprint(self, fingerprint):
+        """Invalidate the cache if the knowledge collection changed since the answers were stored"""
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'fingerprint'").fetchone()
+        if row is not None and row[0] == fingerprint:
+            return False
+        self.clear()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+            self._db.commit()
+        return row is not None
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        lookups = sum(self.hits.values()) + self.misses
+        return {
+            "exact_hits": self.hits["exact"],
+            "semantic_hits": self.hits["semantic"],
+            "misses": self.misses,
+            "hit_rate": (lookups - self.misses) / lookups if lookups else 0.0,
+            "entries": len(self._keys),
+        }
@@ -0,0 +1,130 @@
+import asyncio
+import itertools
+import json
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from deepai_client import DeepAIClient
+
+PROMPTS = [f"a temple in the mountains, style {i}" for i in range(16)]
+
+
+class MockDeepAIServer:
+    """Local stand-in for the text2img endpoint and its image host.
+
+    Every ``fail_every``-th POST answers 429 (with Retry-After: 0) or 503
+    alternately, and every response waits ``latency`` seconds.
+    """
+
+    def __init__(self, latency=0.1, fail_every=4, image=b"\x89PNG\r\n\x1a\n" + b"\0" * 2048):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.image = image
+        self.posts = 0
+        self.downloads = 0
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, so pooled connections are reused
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type, headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(mock.latency)
+                with mock._lock:
+                    count = next(mock._counter)
+                    mock.posts += 1
+                if mock.fail_every and count % mock.fail_every == 0:
+                    if count // mock.fail_every % 2:
+                        self._send(429, b"{}", "application/json", {"Retry-After": "0"})
+                    else:
+                        self._send(503, b"{}", "application/json")
+                    return
+                body = json.dumps({"output_url": f"{mock.url}/images/{count}.png"}).encode("utf-8")
+                self._send(200, body, "application/json")
+
+            def do_GET(self):
+                time.sleep(mock.latency)
+                with mock._lock:
+                    mock.downloads += 1
+                self._send(200, mock.image, "image/png")
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def baseline(endpoint, prompts):
+    """The original path: one bare requests.post (plus image download) at a time, no retries"""
+    failures = 0
+    for prompt in prompts:
+        response = requests.post(endpoint, data={"text": prompt}, headers={"api-key": "test"})
+        if response.status_code != 200:
+            failures += 1
+            continue
+        requests.get(response.json()["output_url"]).content
+    return failures
+
+
+async def run_client(client, prompts):
+    started = time.perf_counter()
+    results = await client.generate_many(prompts)
+    return time.perf_counter() - started, results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="DeepAI client against a local mock server")
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--in-flight", type=int, default=8)
+    args = parser.parse_args()
+
+    with MockDeepAIServer(latency=args.latency) as server:
+        endpoint = f"{server.url}/api/text2img"
+        started = time.perf_counter()
+        failures = baseline(endpoint, PROMPTS)
+        print(f"🐢 Sequential requests.post: {time.perf_counter() - started:.2f}s, "
+              f"{failures}/{len(PROMPTS)} failed on 429/503")
+
+        directory = tempfile.mkdtemp(prefix="deepai_cache_")
+        try:
+            with DeepAIClient("test", endpoint=endpoint, max_in_flight=args.in_flight, backoff=0.05,
+                              cache_dir=directory) as client:
+                cold, results = asyncio.run(run_client(client, PROMPTS))
+                print(f"⚡ Client, {args.in_flight} in flight: {cold:.2f}s, "
+                      f"{sum(1 for r in results if r.path)}/{len(PROMPTS)} images, {client.stats['retries']} retries")
+                warm, results = asyncio.run(run_client(client, PROMPTS))
+                print(f"💾 Repeat prompts: {1000 * warm:.1f}ms, {sum(r.cached for r in results)} cache hits, "
+                      f"server saw {server.posts} posts / {server.downloads} downloads in total")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,74 @@
+import shutil
+import tempfile
+import time
+
+from image_worker import ImageCache, ImageGenerationWorker, StubPipeline
+
+PROMPTS = [
+    "a sunset over the ghats",
+    "the Konark sun temple at dawn",
+    "a peacock in the rain",
+    "a tea garden in Munnar",
+    "a boat on the Ganges at night",
+    "the Hampi ruins in watercolor",
+    "a tiger in the Sundarbans",
+    "a lotus pond with koi",
+]
+
+# (name, worker options)
+CONFIGURATIONS = [
+    ("sequential", {"max_batch": 1, "batch_window": 0.0}),
+    ("batch 4", {"max_batch": 4, "batch_window": 0.05}),
+    ("batch 8", {"max_batch": 8, "batch_window": 0.05}),
+]
+
+
+def benchmark(pipeline, options, prompts=PROMPTS, steps=10, size=(64, 64)):
+    """Throughput of a cold run, then latency of the same requests served from a fresh cache"""
+    directory = tempfile.mkdtemp(prefix="image_cache_")
+    worker = ImageGenerationWorker(pipeline, cache=ImageCache(directory), steps=steps, size=size, **options)
+    try:
+        started = time.perf_counter()
+        jobs = [worker.submit(prompt) for prompt in prompts]
+        submit_ms = 1000 * (time.perf_counter() - started) / len(jobs)
+        for job in jobs:
+            job.result()
+        cold = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for job in [worker.submit(prompt) for prompt in prompts]:
+            job.result()
+        cached = time.perf_counter() - started
+        report = worker.report()
+    finally:
+        worker.close()
+        shutil.rmtree(directory, ignore_errors=True)
+    return {
+        "submit_ms": submit_ms,
+        "cold_s": cold,
+        "images_per_s": len(prompts) / cold,
+        "cached_ms": 1000 * cached / len(prompts),
+        "mean_batch": report["mean_batch"],
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Image worker: sequential vs batched generation and cache hits")
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--step-time", type=float, default=0.02, help="Stub fixed cost per denoising step (s)")
+    parser.add_argument("--image-step-time", type=float, default=0.005, help="Stub cost per image per step (s)")
+    args = parser.parse_args()
+
+    pipeline = StubPipeline(call_time=0.05, step_time=args.step_time, image_step_time=args.image_step_time)
+    print(f"{'config':<12}{'submit ms':>11}{'cold s':>9}{'img/s':>8}{'batch':>7}{'cached ms':>11}")
+    results = {}
+    for name, options in CONFIGURATIONS:
+        row = results[name] = benchmark(pipeline, options, steps=args.steps)
+        print(f"{name:<12}{row['submit_ms']:>11.2f}{row['cold_s']:>9.2f}{row['images_per_s']:>8.1f}"
+              f"{row['mean_batch']:>7.1f}{row['cached_ms']:>11.2f}")
+
+    best = max(results, key=lambda name: results[name]["images_per_s"])
+    speedup = results[best]["images_per_s"] / results["sequential"]["images_per_s"]
+    print(f"⚡ {best} generates {speedup:.2f}x more images per second than sequential")
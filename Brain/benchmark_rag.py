@@ -0,0 +1,53 @@
+import statistics
+import time
+
+from knowledge import GENERATION_MODES, Knowledge
+
+# Fixed question set so runs are comparable across changes
+QUESTIONS = [
+    "What is dharma according to the Bhagavad Gita?",
+    "Who wrote the Arthashastra and what is it about?",
+    "What does the Isha Upanishad teach about renunciation?",
+    "How did Aryabhata describe the rotation of the Earth?",
+    "What is the difference between Advaita and Dvaita Vedanta?",
+    "What are the eight limbs of yoga in the Yoga Sutras?",
+]
+
+
+def benchmark(knowledge, questions=QUESTIONS, modes=GENERATION_MODES):
+    """Time every question in every generation mode with the answer cache bypassed"""
+    report = {}
+    for mode in modes:
+        latencies, chars, tokens = [], [], []
+        for question in questions:
+            started = time.perf_counter()
+            answer = knowledge.query(question, mode=mode, use_cache=False)
+            latencies.append(time.perf_counter() - started)
+            chars.append(len(answer))
+            tokens.append(knowledge.backend.count_tokens(answer))
+        report[mode] = {
+            "mean_latency_s": statistics.mean(latencies),
+            "median_latency_s": statistics.median(latencies),
+            "max_latency_s": max(latencies),
+            "mean_chars": statistics.mean(chars),
+            "mean_tokens": statistics.mean(tokens),
+            "tokens_per_s": sum(tokens) / sum(latencies),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+
+    # e.g. python benchmark_rag.py llama_cpp
+    knowledge = Knowledge(backend=sys.argv[1] if len(sys.argv) > 1 else "transformers")
+    results = benchmark(knowledge)
+
+    print(f"{'mode':<10}{'mean s':>10}{'median s':>10}{'max s':>10}{'chars':>10}{'tokens':>10}{'tok/s':>10}")
+    for mode, row in results.items():
+        print(f"{mode:<10}{row['mean_latency_s']:>10.2f}{row['median_latency_s']:>10.2f}{row['max_latency_s']:>10.2f}"
+              f"{row['mean_chars']:>10.0f}{row['mean_tokens']:>10.0f}{row['tokens_per_s']:>10.1f}")
+
+    if "single" in results and "two_pass" in results:
+        speedup = results["two_pass"]["mean_latency_s"] / results["single"]["mean_latency_s"]
+        print(f"⚡ Single-pass is {speedup:.2f}x faster than two-pass on average")
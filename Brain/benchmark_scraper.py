@@ -0,0 +1,105 @@
+import threading
+import time
+from concurrent.futures import as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scraper import ConcurrentFetcher
+
+# (pages, seconds per response) per host; the slow host comes first, as sacred-texts does in resources.txt
+HOSTS = [(40, 0.2), (10, 0.05), (10, 0.05), (10, 0.05), (10, 0.05)]
+
+
+class MockHost:
+    """Local stand-in for one website: every GET waits ``latency`` seconds and returns a small HTML page.
+
+    Tracks the peak number of requests it served at once so the per-host
+    limit can be checked.
+    """
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.requests = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, so pooled connections are reused
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with mock._lock:
+                    mock.requests += 1
+                    mock.active += 1
+                    mock.peak = max(mock.peak, mock.active)
+                time.sleep(mock.latency)
+                with mock._lock:
+                    mock.active -= 1
+                body = f"<html><body><p>{self.path}</p></body></html>".encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_jobs(hosts):
+    """(key, url, headers) jobs grouped host by host, in the order the scraper builds them"""
+    return [((index, page), f"{host.url}/page/{page}", None)
+            for index, (host, (pages, _)) in enumerate(zip(hosts, HOSTS)) for page in range(pages)]
+
+
+def run_pool_order(fetcher, jobs):
+    """The previous scheduling: every URL goes to the shared pool at once and waits there for its host's slot"""
+    futures = {fetcher._executor.submit(fetcher.fetch, url, headers): key for key, url, headers in jobs}
+    for future in as_completed(futures):
+        yield futures[future], future.result()
+
+
+def measure(fetch_all, jobs, hosts):
+    """Seconds until each host's last page arrived, plus failures"""
+    with ConcurrentFetcher(max_workers=16, per_host_limit=2, parse_in_processes=False) as fetcher:
+        started = time.perf_counter()
+        finished = {}
+        failures = 0
+        for (index, _), result in fetch_all(fetcher, jobs):
+            finished[index] = time.perf_counter() - started
+            failures += not result.ok
+    return [finished[index] for index in range(len(hosts))], failures
+
+
+if __name__ == "__main__":
+    hosts = [MockHost(latency) for _, latency in HOSTS]
+    for host in hosts:
+        host.__enter__()
+    try:
+        jobs = make_jobs(hosts)
+        print(f"{'scheduling':<14}" + "".join(f"{f'host {i} s':>10}" for i in range(len(hosts))) + f"{'failed':>8}")
+        for name, fetch_all in (("pool order", run_pool_order),
+                                ("per host", lambda fetcher, jobs: fetcher.fetch_all(jobs))):
+            times, failures = measure(fetch_all, jobs, hosts)
+            print(f"{name:<14}" + "".join(f"{t:>10.2f}" for t in times) + f"{failures:>8}")
+        assert all(host.peak <= 2 for host in hosts), "per-host limit exceeded"
+        print(f"🌐 Peak requests per host: {[host.peak for host in hosts]} (limit 2), "
+              f"{sum(host.requests for host in hosts)} requests served")
+    finally:
+        for host in hosts:
+            host.__exit__()
@@ -0,0 +1,100 @@
+import re
+
+SENTENCE_END = re.compile(r"(?<=[.!?।])\s+")
+
+
+class Chunker:
+    """Turns a page's paragraphs into retrieval chunks of roughly even size.
+
+    Paragraphs shorter than ``min_chunk_size`` are merged with their
+    neighbours, and paragraphs longer than ``chunk_size`` are split on
+    sentence (then word) boundaries with ``overlap`` characters carried over
+    between consecutive pieces. All sizes are in characters.
+    """
+
+    def __init__(self, chunk_size=1000, overlap=150, min_chunk_size=300):
+        if overlap >= chunk_size - 1:  # Pieces carry a space plus the overlap, leaving no room for new text
+            raise ValueError("overlap must be at least 2 smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.min_chunk_size = min(min_chunk_size, chunk_size)
+
+    def chunk(self, paragraphs):
+        """Return the list of chunk texts for an ordered list of paragraphs"""
+        chunks = []
+        buffer = ""
+
+        for paragraph in paragraphs:
+            paragraph = " ".join(paragraph.split())
+            if not paragraph:
+                continue
+
+            if len(paragraph) > self.chunk_size:
+                if buffer:
+                    chunks.append(buffer)
+                    buffer = ""
+                chunks.extend(self.split(paragraph))
+                continue
+
+            candidate = f"{buffer}\n{paragraph}" if buffer else paragraph
+            if len(candidate) > self.chunk_size:
+                chunks.append(buffer)
+                candidate = paragraph
+            buffer = candidate
+            if len(buffer) >= self.min_chunk_size:
+                chunks.append(buffer)
+                buffer = ""
+
+        if buffer:
+            # Fold a short tail into the previous chunk when it still fits
+            if chunks and len(chunks[-1]) + len(buffer) + 1 <= self.chunk_size:
+                chunks[-1] = f"{chunks[-1]}\n{buffer}"
+            else:
+                chunks.append(buffer)
+        return chunks
+
+    def split(self, text):
+        """Split one oversized text into overlapping pieces of at most chunk_size"""
+        units = [s for s in SENTENCE_END.split(text) if s]
+        pieces = []
+        current = ""
+
+        for unit in self._fit_units(units):
+            candidate = f"{current} {unit}" if current else unit
+            if len(candidate) <= self.chunk_size:
+                current = candidate
+                continue
+            pieces.append(current)
+            tail = current[-self.overlap:] if self.overlap else ""
+            # Start the overlap on a word boundary
+            if tail and " " in tail:
+                tail = tail[tail.index(" ") + 1:]
+            current = f"{tail} {unit}" if tail and len(tail) + len(unit) + 1 <= self.chunk_size else unit
+
+        if current:
+            pieces.append(current)
+        return pieces
+
+    def _fit_units(self, units):
+        """Break sentences that alone exceed chunk_size into word runs, then hard slices"""
+        limit = max(1, self.chunk_size - self.overlap - 1)
+        for unit in units:
+            if len(unit) <= limit:
+                yield unit
+                continue
+            run = ""
+            for word in unit.split(" "):
+                while len(word) > limit:
+                    if run:
+                        yield run
+                        run = ""
+                    yield word[:limit]
+                    word = word[limit:]
+                candidate = f"{run} {word}" if run else word
+                if len(candidate) > limit:
+                    yield run
+                    run = word
+                else:
+                    run = candidate
+            if run:
+                yield run
@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import json
+import mimetypes
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+IMAGE_EXTENSIONS = (".jpg", ".png", ".webp", ".gif")
+
+
+class DeepAIError(RuntimeError):
+    """The API kept failing after every retry, or answered without an image."""
+
+
+class DeepAIResult:
+    """A generated image: its remote URL and the local copy."""
+
+    def __init__(self, prompt, url, path, cached=False, attempts=0, elapsed=0.0):
+        self.prompt = prompt
+        self.url = url
+        self.path = path
+        self.cached = cached
+        self.attempts = attempts
+        self.elapsed = elapsed
+
+
+class DeepAIClient:
+    """Pooled, retrying client for the DeepAI text2img endpoint.
+
+    Requests run on a small thread pool whose size is the in-flight limit,
+    each thread keeping its own keep-alive session. ``submit`` returns a
+    concurrent future and ``generate_async`` awaits one from asyncio code.
+    Images are downloaded into ``cache_dir`` keyed on the prompt and
+    parameters, so repeated prompts never touch the network, and identical
+    requests in flight share one call.
+    """
+
+    def __init__(self, api_key, endpoint="https://api.deepai.org/api/text2img", max_in_flight=4, timeout=(5, 60),
+                 retries=4, backoff=0.5, cache_dir="./image_cache/deepai", max_retry_delay=30.0):
+        """
+        :param api_key: DeepAI API key
+        :param endpoint: text2img URL (point it at a local mock server in tests)
+        :param max_in_flight: Requests running at the same time
+        :param timeout: (connect, read) timeout passed to requests
+        :param retries: Extra attempts on connection errors, timeouts and 429/5xx
+        :param backoff: Base delay for exponential backoff between attempts (Retry-After wins when sent)
+        :param cache_dir: Folder the images are downloaded to (None keeps only the URLs)
+        :param max_retry_delay: Longest wait before a retry, however long the server's Retry-After asks for
+        """
+        if not api_key:
+            raise ValueError("🔴 API Key is required for DeepAI API.")
+        self.api_key = api_key
+        self.endpoint = endpoint
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_retry_delay = max_retry_delay
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.stats = {"requests": 0, "retries": 0, "cache_hits": 0, "coalesced": 0, "failures": 0}
+
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="deepai")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._sessions = []
+        self._inflight = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Wait for the running requests and close every pooled session"""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+
+    def _session(self):
+        """One keep-alive session per worker thread, shared by the API and image hosts (so it carries no API key)"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=2)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    @staticmethod
+    def key(prompt, params):
+        payload = json.dumps({"text": prompt, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def cached(self, key):
+        """Local path of an already downloaded image, or None"""
+        if not self.cache_dir:
+            return None
+        for extension in IMAGE_EXTENSIONS:
+            path = os.path.join(self.cache_dir, key + extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = self.backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+        return min(delay, self.max_retry_delay)  # A huge Retry-After must not hold a pool thread for hours
+
+    def _request(self, method, url, **kwargs):
+        """Send with retries on connection errors, timeouts and 429/5xx; returns (response, attempts)"""
+        session = self._session()
+        attempt = 0
+        while True:
+            attempt += 1
+            with self._lock:
+                self.stats["requests"] += 1
+            try:
+                response = session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt > self.retries:
+                    raise
+                response = None
+            if response is not None and (response.status_code not in RETRY_STATUS_CODES or attempt > self.retries):
+                response.raise_for_status()
+                return response, attempt
+            with self._lock:
+                self.stats["retries"] += 1
+            time.sleep(self._retry_delay(attempt - 1, response))
+            if response is not None:
+                response.close()
+
+    def _download(self, url, key):
+        response, attempts = self._request("GET", url, stream=True)
+        extension = os.path.splitext(urlparse(url).path)[1].lower()
+        if extension not in IMAGE_EXTENSIONS:
+            content_type = response.headers.get("Content-Type", "").split(";")[0]
+            extension = mimetypes.guess_extension(content_type) or ".jpg"
+            extension = ".jpg" if extension in (".jpe", ".jpeg") else extension
+        path = os.path.join(self.cache_dir, key + extension)
+        tmp_path = path + ".tmp"
+        with response, open(tmp_path, "wb") as f:
+            for block in response.iter_content(64 * 1024):
+                f.write(block)
+        os.replace(tmp_path, path)
+        return path, attempts
+
+    def _generate(self, prompt, params, key):
+        started = time.perf_counter()
+        try:
+            # The key goes on the API request only, never to the host named in output_url
+            response, attempts = self._request("POST", self.endpoint, data={"text": prompt, **params},
+                                               headers={"api-key": self.api_key})
+            url = response.json().get("output_url")
+            if not url:
+                raise DeepAIError(f"DeepAI returned no image: {response.text[:200]}")
+            path = None
+            if self.cache_dir:
+                path, downloads = self._download(url, key)
+                attempts += downloads
+            return DeepAIResult(prompt, url, path, attempts=attempts, elapsed=time.perf_counter() - started)
+        except Exception:
+            with self._lock:
+                self.stats["failures"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def submit(self, prompt, **params):
+        """
+        Queue a text2img request without blocking.
+        :param params: Extra form fields of the endpoint (e.g. width, height)
+        :return: concurrent.futures.Future of a DeepAIResult
+        """
+        key = self.key(prompt, params)
+        path = self.cached(key)
+        with self._lock:
+            if path is not None:
+                self.stats["cache_hits"] += 1
+            elif key in self._inflight:
+                self.stats["coalesced"] += 1
+                return self._inflight[key]
+            else:
+                future = self._inflight[key] = self._executor.submit(self._generate, prompt, params, key)
+                return future
+        future = Future()  # Already resolved, cache hits never wait behind queued requests
+        future.set_result(DeepAIResult(prompt, None, path, cached=True))
+        return future
+
+    def generate(self, prompt, **params):
+        """Blocking text2img call, returns a DeepAIResult"""
+        return self.submit(prompt, **params).result()
+
+    async def generate_async(self, prompt, **params):
+        """Await a text2img call from asyncio code without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(prompt, **params))
+
+    async def generate_many(self, prompts, **params):
+        """Generate several prompts concurrently (up to max_in_flight at a time), results in prompt order"""
+        return await asyncio.gather(*(self.generate_async(prompt, **params) for prompt in prompts))
@@ -0,0 +1,373 @@
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def seeded_generators(seeds, device="cpu"):
+    """One torch.Generator per seed, so every image of a batch is reproducible on its own"""
+    try:
+        import torch
+    except ImportError:  # Stub pipelines take the plain seeds
+        return list(seeds)
+    return [torch.Generator(device).manual_seed(seed) for seed in seeds]
+
+
+def pipeline_signature(pipeline):
+    """Model and scheduler names, part of the cache key so switching either never serves stale images"""
+    config = getattr(pipeline, "config", None)
+    model = getattr(config, "_name_or_path", None) or getattr(pipeline, "name_or_path", None) or type(pipeline).__name__
+    scheduler = getattr(pipeline, "scheduler", None)
+    return f"{model}:{type(scheduler).__name__ if scheduler is not None else '-'}"
+
+
+class ImageCache:
+    """PNG files on disk keyed on the prompt, seed and generation parameters."""
+
+    def __init__(self, directory="./image_cache", max_entries=500):
+        """
+        :param directory: Folder holding the cached images
+        :param max_entries: Images kept before the least recently used ones are deleted
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(prompt, seed, params, signature=""):
+        payload = json.dumps({"prompt": prompt, "seed": seed, "params": params, "model": signature}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.png")
+
+    def get(self, key):
+        """Cached PIL image, or None"""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        from PIL import Image
+
+        with Image.open(path) as image:
+            image.load()
+        os.utime(path)  # Mark as recently used
+        return image
+
+    def put(self, key, image):
+        tmp_path = self._path(key) + ".tmp"
+        image.save(tmp_path, format="PNG")
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        if not self.max_entries:
+            return
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".png")]
+        if len(paths) > self.max_entries:
+            paths.sort(key=os.path.getmtime)
+            for path in paths[:len(paths) - self.max_entries]:
+                os.remove(path)
+
+
+class ImageJob:
+    """Handle of a queued generation: id, progress and a future resolving to the PIL image."""
+
+    def __init__(self, job_id, prompt, seed, params, key):
+        self.id = job_id
+        self.prompt = prompt
+        self.seed = seed
+        self.params = params
+        self.key = key
+        self.future = Future()
+        self.status = "queued"  # queued, cached, running, done, failed, cancelled
+        self.step = 0
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.finished = None
+
+    @property
+    def steps(self):
+        return self.params["num_inference_steps"]
+
+    @property
+    def batch_key(self):
+        """Requests with equal batch keys can share one pipeline call"""
+        return tuple(sorted(self.params.items()))
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.submitted
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+    def cancel(self):
+        """Cancel the job if it has not started yet"""
+        return self.future.cancel()
+
+
+class ImageGenerationWorker:
+    """Background thread generating images from a request queue.
+
+    Requests with the same step count, resolution and guidance scale that are
+    queued together run as one batched pipeline call. Results are cached on
+    disk, so a repeated (prompt, seed, params) request resolves immediately,
+    and identical requests in flight share one job.
+
+    ``on_progress(job, event)`` receives "queued", "cached", "started",
+    "step", "done", "failed" and "cancelled" events from the worker thread.
+    """
+
+    def __init__(self, pipeline, cache=None, max_batch=4, batch_window=0.05, steps=20, size=(512, 512),
+                 guidance_scale=7.5, seed=0, on_progress=None, history=256):
+        """
+        :param pipeline: Diffusers-style callable (prompt list, num_inference_steps, height, width, guidance_scale,
+                         generator, callback_on_step_end) returning an object with .images
+        :param cache: ImageCache, or None to disable caching
+        :param max_batch: Most prompts generated in one pipeline call
+        :param batch_window: Seconds the worker waits for more compatible requests before starting a batch
+        :param steps: Default inference steps
+        :param size: Default (width, height)
+        :param guidance_scale: Default classifier-free guidance scale
+        :param seed: Default seed, fixed so that repeated prompts hit the cache
+        :param on_progress: Optional callable(job, event)
+        :param history: Number of finished jobs kept for lookup by id
+        """
+        self.pipeline = pipeline
+        self.cache = cache
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.defaults = {"num_inference_steps": steps, "width": size[0], "height": size[1],
+                         "guidance_scale": guidance_scale}
+        self.seed = seed
+        self.on_progress = on_progress
+        self.history = history
+        self.signature = pipeline_signature(pipeline)
+        self.stats = {"submitted": 0, "cache_hits": 0, "coalesced": 0, "batches": 0, "images": 0,
+                      "generation_time": 0.0}
+
+        self._ids = itertools.count(1)
+        self._jobs = OrderedDict()
+        self._pending = []
+        self._inflight = {}
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="image-worker", daemon=True)
+        self._thread.start()
+
+    def _params(self, steps, width, height, guidance_scale):
+        params = dict(self.defaults)
+        for name, value in (("num_inference_steps", steps), ("width", width), ("height", height),
+                            ("guidance_scale", guidance_scale)):
+            if value is not None:
+                params[name] = value
+        for side in ("width", "height"):
+            params[side] = int(params[side]) // 8 * 8  # The VAE works on 8x8 blocks
+            if params[side] < 64:
+                raise ValueError(f"Image {side} must be at least 64 pixels")
+        params["num_inference_steps"] = int(params["num_inference_steps"])
+        params["guidance_scale"] = float(params["guidance_scale"])
+        return params
+
+    def _emit(self, job, event):
+        if self.on_progress:
+            try:
+                self.on_progress(job, event)
+            except Exception as e:
+                print(f"⚠️ Image progress callback failed: {e}")
+
+    def submit(self, prompt, seed=None, steps=None, width=None, height=None, guidance_scale=None):
+        """
+        Queue a prompt for generation.
+        :return: ImageJob, whose future resolves to the PIL image
+        """
+        params = self._params(steps, width, height, guidance_scale)
+        seed = self.seed if seed is None else int(seed)
+        key = ImageCache.key(prompt, seed, params, self.signature)
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Image worker is closed")
+            self.stats["submitted"] += 1
+            if key in self._inflight:
+                self.stats["coalesced"] += 1
+                return self._inflight[key]
+            # Registered in the same critical section as the check, so identical requests share this job
+            job = self._inflight[key] = ImageJob(next(self._ids), prompt, seed, params, key)
+            self._remember(job)
+
+        image = self.cache.get(key) if self.cache else None
+        if image is not None:
+            with self._condition:
+                self.stats["cache_hits"] += 1
+                self._inflight.pop(key, None)
+            job.status = "cached"
+            job.started = job.finished = time.perf_counter()
+            job.future.set_running_or_notify_cancel()
+            job.future.set_result(image)
+            self._emit(job, "cached")
+            return job
+
+        with self._condition:
+            closed = self._closed
+            if closed:
+                self._inflight.pop(key, None)
+            else:
+                self._pending.append(job)
+                self._condition.notify()
+        if closed:  # close() ran during the cache lookup, the worker may already be gone
+            job.status = "failed"
+            job.future.set_running_or_notify_cancel()
+            job.future.set_exception(RuntimeError("Image worker is closed"))
+            return job
+        self._emit(job, "queued")
+        return job
+
+    def _remember(self, job):
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.history:
+            self._jobs.popitem(last=False)
+
+    def job(self, job_id):
+        """Look up a recent job by id"""
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def pending(self):
+        with self._condition:
+            return len(self._pending)
+
+    def _next_batch(self):
+        """Wait for a request, then up to batch_window for compatible ones to join it"""
+        with self._condition:
+            while not self._pending and not self._closed:
+                self._condition.wait()
+            if not self._pending:
+                return None
+            batch_key = self._pending[0].batch_key
+            deadline = time.monotonic() + self.batch_window
+            while True:
+                batch = [job for job in self._pending if job.batch_key == batch_key][:self.max_batch]
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.max_batch or remaining <= 0 or self._closed:
+                    break
+                self._condition.wait(remaining)
+            for job in batch:
+                self._pending.remove(job)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._generate(batch)
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished = time.perf_counter()
+        with self._condition:
+            self._inflight.pop(job.key, None)
+        self._emit(job, status)
+
+    def _generate(self, batch):
+        jobs = []
+        for job in batch:
+            if job.future.set_running_or_notify_cancel():
+                job.status = "running"
+                job.started = time.perf_counter()
+                jobs.append(job)
+                self._emit(job, "started")
+            else:
+                self._finish(job, "cancelled")
+        if not jobs:
+            return
+
+        def on_step(pipe, step, timestep, callback_kwargs):
+            for job in jobs:
+                job.step = step + 1
+                self._emit(job, "step")
+            return callback_kwargs
+
+        started = time.perf_counter()
+        try:
+            output = self.pipeline(
+                prompt=[job.prompt for job in jobs],
+                generator=seeded_generators([job.seed for job in jobs], getattr(self.pipeline, "device", "cpu")),
+                callback_on_step_end=on_step,
+                **jobs[0].params,
+            )
+        except Exception as e:
+            for job in jobs:
+                job.future.set_exception(e)
+                self._finish(job, "failed")
+            return
+
+        with self._condition:
+            self.stats["batches"] += 1
+            self.stats["images"] += len(jobs)
+            self.stats["generation_time"] += time.perf_counter() - started
+        for job, image in zip(jobs, output.images):
+            if self.cache:
+                try:
+                    self.cache.put(job.key, image)
+                except OSError as e:
+                    print(f"⚠️ Could not cache image: {e}")
+            job.future.set_result(image)
+            self._finish(job, "done")
+
+    def close(self, wait=True):
+        """Stop accepting requests; the worker finishes the queued ones before exiting"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            self._thread.join()
+
+    def report(self):
+        """Stats plus the mean batch size and generation time per image"""
+        with self._condition:
+            stats = dict(self.stats)
+        stats["mean_batch"] = stats["images"] / stats["batches"] if stats["batches"] else 0.0
+        stats["seconds_per_image"] = stats["generation_time"] / stats["images"] if stats["images"] else 0.0
+        return stats
+
+
+class StubPipeline:
+    """Stand-in for StableDiffusionPipeline in tests and benchmarks, no model required.
+
+    Each call costs ``call_time`` plus ``step_time + image_step_time * batch``
+    per step, mimicking the fixed per-step overhead a batch amortizes.
+    """
+
+    def __init__(self, call_time=0.0, step_time=0.0, image_step_time=0.0):
+        self.call_time = call_time
+        self.step_time = step_time
+        self.image_step_time = image_step_time
+        self.calls = []
+
+    def __call__(self, prompt, num_inference_steps=50, width=512, height=512, guidance_scale=7.5, generator=None,
+                 callback_on_step_end=None):
+        from types import SimpleNamespace
+
+        from PIL import Image
+
+        prompts = [prompt] if isinstance(prompt, str) else list(prompt)
+        self.calls.append({"prompts": prompts, "steps": num_inference_steps, "size": (width, height)})
+        time.sleep(self.call_time)
+        for step in range(num_inference_steps):
+            time.sleep(self.step_time + self.image_step_time * len(prompts))
+            if callback_on_step_end:
+                callback_on_step_end(self, step, num_inference_steps - step, {})
+
+        seeds = generator or [0] * len(prompts)
+        images = []
+        for text, seed in zip(prompts, seeds):
+            seed = seed.initial_seed() if hasattr(seed, "initial_seed") else seed
+            color = hashlib.md5(f"{text}:{seed}".encode("utf-8")).digest()[:3]
+            images.append(Image.new("RGB", (width, height), tuple(color)))
+        return SimpleNamespace(images=images)
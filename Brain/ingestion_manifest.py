@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+
+
+class IngestionManifest:
+    """Tracks what has already been ingested for every scraped source.
+
+    Each entry is keyed by URL and records the HTTP validators (ETag and
+    Last-Modified), a hash of the full page content and the ids of the chunks
+    stored in ChromaDB, so a restart only re-embeds what actually changed.
+    """
+
+    def __init__(self, path="./tejas_ai_knowledge_db/ingestion_manifest.json"):
+        self.path = path
+        self.entries = {}
+        self.load()
+
+    @staticmethod
+    def hash_text(text):
+        """Stable content hash used for pages and chunks"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def load(self):
+        """Load the manifest from disk (missing or corrupt files start empty)"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        """Atomically write the manifest back to disk"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get(self, url):
+        """Return the stored entry for a URL, or None if it was never ingested"""
+        return self.entries.get(url)
+
+    def conditional_headers(self, url):
+        """Build If-None-Match / If-Modified-Since headers for a conditional GET"""
+        entry = self.entries.get(url)
+        headers = {}
+        if not entry:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def update(self, url, category, etag, last_modified, content_hash, chunk_ids):
+        """Record the latest ingested state of a source"""
+        self.entries[url] = {
+            "category": category,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": content_hash,
+            "chunk_ids": sorted(chunk_ids),
+        }
+
+    def touch(self, url, etag, last_modified):
+        """Refresh the validators of an unchanged source"""
+        entry = self.entries.get(url)
+        if entry is None:
+            return
+        entry["etag"] = etag or entry.get("etag")
+        entry["last_modified"] = last_modified or entry.get("last_modified")
+
+    def diff_chunks(self, url, chunk_ids):
+        """Split chunk ids into (added, removed) relative to the stored entry"""
+        entry = self.entries.get(url)
+        previous = set(entry["chunk_ids"]) if entry else set()
+        current = set(chunk_ids)
+        return current - previous, previous - current
+
+    def fingerprint(self):
+        """Hash of every stored chunk id, changes whenever the collection contents change"""
+        chunk_ids = sorted(chunk_id for entry in self.entries.values() for chunk_id in entry["chunk_ids"])
+        return self.hash_text("\n".join(chunk_ids))
@@ -1,25 +1,90 @@
 import chromadb
 from chromadb.utils import embedding_functions
-import requests
-from bs4 import BeautifulSoup
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
-import torch
+import re
+import time
+from answer_cache import SemanticAnswerCache
+from chunker import Chunker
+from ingestion_manifest import IngestionManifest
+from llm_backend import create_backend
+from scraper import ConcurrentFetcher, extract_paragraphs
+
+GENERATION_MODES = ("single", "two_pass")
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?।])[\"')\]]*\s+")
+
+SINGLE_PASS_PROMPT = """[INST] <<SYS>>
+You are Tejas AI, an expert in Hindu scriptures, history, and philosophy.
+Answer using the context passages below. If they do not cover the question, say so and answer from general knowledge.
+Give one clear, well-structured and insightful answer without repeating the question or the context.
+<</SYS>>
+
+Context:
+{context}
+
+Question: {question} [/INST]"""
+
+TWO_PASS_PROMPT = """
+        You are Tejas AI, an expert in Hindu scriptures, history, and philosophy.
+        Below is a question followed by relevant texts. Generate a concise response.
+
+        Question: {question}
+
+        Relevant Texts:
+        {context}
+
+        Provide a **clear and insightful** answer.
+        """
+
+COMBINE_PROMPT = """
+        Given the following two responses, generate a **coherent and meaningful** answer:
+
+        📖 **Response from Scriptures (ChromaDB):**  
+        {context}
+
+        🧠 **Response from AI (Llama-2):**  
+        {llama_response}
+
+        Create a **single, well-structured, and insightful** answer.
+        """
 
 class Knowledge:
-    def __init__(self):
-        """Initialize ChromaDB, scrape & store scriptures, and load Llama-2"""
+    def __init__(self, fetcher_options=None, chunker=None, embedding_batch_size=256, cache_threshold=0.92,
+                 generation_mode="single", max_new_tokens=512, backend="transformers", backend_options=None):
+        """
+        Initialize ChromaDB, scrape & store scriptures, and load Llama-2
+        :param fetcher_options: Keyword arguments for ConcurrentFetcher (workers, per-host limit, timeouts, retries)
+        :param chunker: Chunker controlling chunk size and overlap (defaults to Chunker())
+        :param embedding_batch_size: Number of chunks embedded and upserted per ChromaDB call
+        :param cache_threshold: Cosine similarity above which a cached answer is reused
+        :param generation_mode: "single" answers in one generation, "two_pass" keeps the answer + combine passes
+        :param max_new_tokens: Generation budget per LLM call
+        :param backend: Generation backend name ("transformers", "llama_cpp", "echo") or a backend instance
+        :param backend_options: Keyword arguments for the named backend (e.g. model_path, n_threads, n_ctx)
+        """
+        if generation_mode not in GENERATION_MODES:
+            raise ValueError(f"generation_mode must be one of {GENERATION_MODES}")
+        self.generation_mode = generation_mode
+        self.max_new_tokens = max_new_tokens
+        self.stream_metrics = {}  # timings of the last stream_query call
+        self.fetcher_options = fetcher_options or {}
+        self.chunker = chunker or Chunker()
+        self.embedding_batch_size = embedding_batch_size
+        self.ingest_throughput = 0.0  # chunks/s of the last ingest
+
         # Setup ChromaDB
         self.chroma_client = chromadb.PersistentClient(path="./tejas_ai_knowledge_db")
+        self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
         self.scripture_collection = self.chroma_client.get_or_create_collection(
             name="hindu_knowledge",
-            embedding_function=embedding_functions.DefaultEmbeddingFunction()
+            embedding_function=self.embedding_function
         )
+        self.manifest = IngestionManifest(path="./tejas_ai_knowledge_db/ingestion_manifest.json")
+        self.answer_cache = SemanticAnswerCache(self.embedding_function, path="./tejas_ai_knowledge_db/answer_cache.sqlite3",
+                                                threshold=cache_threshold)
 
-        # Load Llama-2
-        MODEL_NAME = "meta-llama/Llama-2-7b-chat-hf"
-        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-        self.model = AutoModelForCausalLM.from_pretrained(MODEL_NAME, torch_dtype=torch.float16, device_map="auto")
-        self.llama_pipeline = pipeline("text-generation", model=self.model, tokenizer=self.tokenizer, max_length=1024)
+        # Load Llama-2 (transformers, or a quantized GGUF through llama.cpp)
+        if isinstance(backend, str):
+            backend = create_backend(backend, **(backend_options or {}))
+        self.backend = backend
 
         # Scrape and store data
         self.resources = {
@@ -169,61 +234,240 @@ class Knowledge:
         self.scrape_and_store_resources()
 
     def scrape_and_store_resources(self):
-        """Scrape scripture texts from resources and store in ChromaDB"""
-        for category, url in self.resources.items():
-            response = requests.get(url)
-            soup = BeautifulSoup(response.text, "html.parser")
-            texts = soup.find_all("p")  # Extract paragraph texts
-
-            for i, text in enumerate(texts):
-                self.scripture_collection.add(
-                    ids=[f"{category}_{i+1}"],
-                    metadatas=[{"category": category}],
-                    documents=[text.text.strip()]
-                )
-        print("✅ Hindu scriptures and history stored successfully!")
-
-    def query_chromadb(self, question):
+        """Incrementally scrape scripture texts and store only new or changed chunks in ChromaDB"""
+        unchanged, updated = 0, 0
+        jobs = [(category, url, self.manifest.conditional_headers(url)) for category, url in self.resources.items()]
+        pending = {}
+
+        with ConcurrentFetcher(**self.fetcher_options) as fetcher:
+            for category, result in fetcher.fetch_all(jobs):
+                url = result.url
+                if not result.ok:
+                    print(f"⚠️ Could not fetch {category}: {result.error}")
+                    continue
+
+                etag = result.headers.get("ETag")
+                last_modified = result.headers.get("Last-Modified")
+
+                # Server confirmed nothing changed since the last ingest
+                if result.status_code == 304:
+                    self.manifest.touch(url, etag, last_modified)
+                    unchanged += 1
+                    continue
+                if result.status_code != 200:
+                    print(f"⚠️ Skipping {category}: HTTP {result.status_code}")
+                    continue
+
+                # Validators missing or ignored, but the page itself is identical
+                content_hash = IngestionManifest.hash_text(result.text)
+                entry = self.manifest.get(url)
+                if entry and entry["content_hash"] == content_hash:
+                    self.manifest.touch(url, etag, last_modified)
+                    unchanged += 1
+                    continue
+
+                # Parse off the fetch threads while the remaining hosts are still downloading
+                future = fetcher.parse_async(extract_paragraphs, result.text)
+                pending[category] = (url, etag, last_modified, content_hash, future)
+
+            records = []
+            for category, (url, etag, last_modified, content_hash, future) in pending.items():
+                chunks = self._page_chunks(category, self.chunker.chunk(future.result()))
+                records.extend(self.diff_source(category, url, chunks))
+                self.manifest.update(url, category, etag, last_modified, content_hash, chunks.keys())
+                updated += 1
+
+        embedded = self.upsert_in_batches(records)
+        self.manifest.save()
+        if self.answer_cache.sync_fingerprint(self.manifest.fingerprint()):
+            print("♻️ Knowledge changed, answer cache invalidated.")
+        print(f"✅ Hindu scriptures and history stored successfully! "
+              f"({updated} updated, {unchanged} unchanged, {embedded} chunks embedded)")
+
+    def _page_chunks(self, category, texts):
+        """Map content-addressed ids to the chunk texts of one page"""
+        return {f"{category}_{IngestionManifest.hash_text(text)[:16]}": text for text in texts}
+
+    def diff_source(self, category, url, chunks):
+        """Diff a page's chunks against the manifest, delete stale ones and return (id, document, metadata) records to add"""
+        # First ingest under the manifest: drop rows written with the old positional ids
+        if self.manifest.get(url) is None:
+            self.scripture_collection.delete(where={"category": category})
+
+        added, removed = self.manifest.diff_chunks(url, chunks.keys())
+        if removed:
+            self.scripture_collection.delete(ids=sorted(removed))
+        return [(chunk_id, chunks[chunk_id], {"category": category, "source": url}) for chunk_id in sorted(added)]
+
+    def upsert_in_batches(self, records):
+        """Embed and upsert records with one embedding call and one write per batch, returns the number written"""
+        if not records:
+            return 0
+
+        batch_size = self.embedding_batch_size
+        if hasattr(self.chroma_client, "get_max_batch_size"):
+            batch_size = min(batch_size, self.chroma_client.get_max_batch_size())
+
+        started = time.perf_counter()
+        for start in range(0, len(records), batch_size):
+            ids, documents, metadatas = (list(column) for column in zip(*records[start:start + batch_size]))
+            self.scripture_collection.upsert(
+                ids=ids,
+                embeddings=self.embedding_function(documents),
+                metadatas=metadatas,
+                documents=documents
+            )
+        elapsed = time.perf_counter() - started
+
+        self.ingest_throughput = len(records) / elapsed if elapsed > 0 else float("inf")
+        print(f"⚡ Embedded {len(records)} chunks in {elapsed:.1f}s ({self.ingest_throughput:.1f} chunks/s)")
+        return len(records)
+
+    def query_chromadb(self, question, query_embedding=None):
         """Fetch relevant scripture texts from ChromaDB"""
-        results = self.scripture_collection.query(query_texts=[question], n_results=5)
-        retrieved_texts = results["documents"]
+        if query_embedding is not None:
+            results = self.scripture_collection.query(query_embeddings=[query_embedding.tolist()], n_results=5)
+        else:
+            results = self.scripture_collection.query(query_texts=[question], n_results=5)
+        retrieved_texts = results["documents"][0] if results["documents"] else []
         return " ".join(retrieved_texts) if retrieved_texts else "No relevant scriptures found."
 
-    def generate_llama_response(self, question, context_text):
+    def format_prompt(self, template, context, **fields):
+        """
+        Fill a prompt template, shortening only the retrieved context when the backend's window is too small.
+        The instructions, question and chat markup are always kept whole.
+        """
+        prompt = template.format(context=context, **fields)
+        budget = self.backend.prompt_budget(self.max_new_tokens)
+        if budget is None:
+            return prompt
+        overflow = self.backend.count_tokens(prompt) - budget
+        if overflow <= 0:
+            return prompt
+        keep = max(0, self.backend.count_tokens(context) - overflow)
+        print(f"⚠️ Context truncated by {overflow} tokens to fit the model's window")
+        return template.format(context=self.backend.truncate(context, keep), **fields)
+
+    def generate_llama_response(self, question, context_text, cancelled=None):
         """Generate AI response using Llama-2"""
-        prompt = f"""
-        You are Tejas AI, an expert in Hindu scriptures, history, and philosophy.
-        Below is a question followed by relevant texts. Generate a concise response.
-
-        Question: {question}
+        return self.generate(self.format_prompt(TWO_PASS_PROMPT, context_text, question=question), cancelled)
 
-        Relevant Texts:
-        {context_text}
-
-        Provide a **clear and insightful** answer.
-        """
-        response = self.llama_pipeline(prompt)[0]["generated_text"]
-        return response
+    def _combine_prompt(self, chroma_response, llama_response):
+        return self.format_prompt(COMBINE_PROMPT, chroma_response, llama_response=llama_response)
 
     def combine_responses(self, chroma_response, llama_response):
         """Merge ChromaDB response and Llama-2 response into one meaningful answer"""
-        prompt = f"""
-        Given the following two responses, generate a **coherent and meaningful** answer:
+        return self.generate(self._combine_prompt(chroma_response, llama_response))
 
-        📖 **Response from Scriptures (ChromaDB):**  
-        {chroma_response}
+    def generate_single_pass(self, question, context_text):
+        """Answer from the retrieved context in one generation"""
+        return self.generate(self.format_prompt(SINGLE_PASS_PROMPT, context_text, question=question))
 
-        🧠 **Response from AI (Llama-2):**  
-        {llama_response}
+    def generate(self, prompt, cancelled=None):
+        """Run Llama-2 and return only the newly generated text, without the echoed prompt"""
+        return self.backend.generate(prompt, max_new_tokens=self.max_new_tokens, cancelled=cancelled)
 
-        Create a **single, well-structured, and insightful** answer.
+    def cache_scope(self, mode):
+        """Answers are only reused for the same generation mode and backend model"""
+        model = getattr(self.backend, "model_name", None) or getattr(self.backend, "model_path", "")
+        return f"{mode}:{type(self.backend).__name__}:{model}"
+
+    def query(self, question, mode=None, use_cache=True):
+        """
+        Main function to get a response from ChromaDB and Llama-2
+        :param mode: Override the configured generation mode ("single" or "two_pass")
+        :param use_cache: Set to False to always run retrieval and generation (e.g. for benchmarks)
         """
-        final_response = self.llama_pipeline(prompt)[0]["generated_text"]
+        mode = mode or self.generation_mode
+        if mode not in GENERATION_MODES:
+            raise ValueError(f"mode must be one of {GENERATION_MODES}")
+
+        query_embedding = None
+        if use_cache:
+            cached_response, query_embedding = self.answer_cache.lookup(question, self.cache_scope(mode))
+            if cached_response is not None:
+                return cached_response
+
+        chroma_response = self.query_chromadb(question, query_embedding)
+        if mode == "single":
+            final_response = self.generate_single_pass(question, chroma_response)
+        else:
+            llama_response = self.generate_llama_response(question, chroma_response)
+            final_response = self.combine_responses(chroma_response, llama_response)
+
+        if use_cache:
+            self.answer_cache.put(question, final_response, query_embedding, self.cache_scope(mode))
         return final_response
 
-    def query(self, question):
-        """Main function to get a combined response from ChromaDB and Llama-2"""
-        chroma_response = self.query_chromadb(question)
-        llama_response = self.generate_llama_response(question, chroma_response)
-        final_response = self.combine_responses(chroma_response, llama_response)
-        return final_response
\ No newline at end of file
+    def stream_generate(self, prompt, cancelled=None):
+        """Yield newly generated text pieces as Llama-2 produces them, until ``cancelled`` is set"""
+        yield from self.backend.stream(prompt, max_new_tokens=self.max_new_tokens, cancelled=cancelled)
+
+    def unload_model(self):
+        """Free the LLM weights, they are reloaded on the next generation"""
+        self.backend.unload()
+
+    def stream_query(self, question, mode=None, use_cache=True, cancelled=None):
+        """
+        Like query, but yield the answer sentence by sentence while it is being generated.
+        Timings are recorded in self.stream_metrics (time_to_first_token, total).
+        :param cancelled: Optional threading.Event that stops generation; a cut-short answer is not cached
+        """
+        mode = mode or self.generation_mode
+        if mode not in GENERATION_MODES:
+            raise ValueError(f"mode must be one of {GENERATION_MODES}")
+        started = time.perf_counter()
+        self.stream_metrics = {"time_to_first_token": None, "total": None, "cached": False}
+
+        query_embedding = None
+        if use_cache:
+            cached_response, query_embedding = self.answer_cache.lookup(question, self.cache_scope(mode))
+            if cached_response is not None:
+                self.stream_metrics.update(time_to_first_token=time.perf_counter() - started, cached=True)
+                yield from iter_sentences([cached_response])
+                self.stream_metrics["total"] = time.perf_counter() - started
+                return
+
+        chroma_response = self.query_chromadb(question, query_embedding)
+        if mode == "single":
+            prompt = self.format_prompt(SINGLE_PASS_PROMPT, chroma_response, question=question)
+        else:
+            # Only the final combine pass is streamed, the first answer is needed in full
+            llama_response = self.generate_llama_response(question, chroma_response, cancelled)
+            if cancelled is not None and cancelled.is_set():
+                return
+            prompt = self._combine_prompt(chroma_response, llama_response)
+
+        pieces = []
+
+        def timed_tokens():
+            for text in self.stream_generate(prompt, cancelled):
+                if self.stream_metrics["time_to_first_token"] is None:
+                    self.stream_metrics["time_to_first_token"] = time.perf_counter() - started
+                pieces.append(text)
+                yield text
+
+        yield from iter_sentences(timed_tokens())
+        self.stream_metrics["total"] = time.perf_counter() - started
+
+        final_response = "".join(pieces).strip()
+        if cancelled is not None and cancelled.is_set():
+            return
+        if use_cache and final_response:
+            self.answer_cache.put(question, final_response, query_embedding, self.cache_scope(mode))
+
+
+def iter_sentences(pieces):
+    """Regroup a stream of text pieces into complete sentences"""
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        while True:
+            match = SENTENCE_BOUNDARY.search(buffer)
+            if not match:
+                break
+            sentence, buffer = buffer[:match.end()].strip(), buffer[match.end():]
+            if sentence:
+                yield sentence
+    if buffer.strip():
+        yield buffer.strip()
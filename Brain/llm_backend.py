@@ -0,0 +1,346 @@
+import gc
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+def stop_when(cancelled):
+    """transformers stopping criteria ending generation at the next token once ``cancelled`` is set"""
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class Cancelled(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return cancelled.is_set()
+
+    return StoppingCriteriaList([Cancelled()])
+
+
+class TransformersBackend:
+    """Hugging Face transformers backend (the original Llama-2 setup)."""
+
+    def __init__(self, model_name="meta-llama/Llama-2-7b-chat-hf", lazy=False, token_timeout=300.0):
+        """
+        :param model_name: Hugging Face model id
+        :param lazy: Defer loading the weights until the first generation
+        :param token_timeout: Seconds to wait for the next streamed piece before giving up
+        """
+        self.model_name = model_name
+        self.token_timeout = token_timeout
+        self.model = None
+        self.tokenizer = None
+        self._lock = threading.Lock()
+        self._users = 0  # Generations holding the weights
+        self._unload_pending = False
+        if not lazy:
+            self.load()
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    def load(self):
+        """Load tokenizer and weights (float16 only when a GPU is available)"""
+        with self._lock:
+            self._load()
+
+    def _load(self):
+        self._unload_pending = False
+        if self.model is not None:
+            return
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.model = AutoModelForCausalLM.from_pretrained(self.model_name, torch_dtype=dtype, device_map="auto")
+
+    def unload(self):
+        """Release the weights so the memory can be reclaimed, once running generations finish"""
+        with self._lock:
+            if self._users:
+                self._unload_pending = True
+                return
+            self.model = None
+            self.tokenizer = None
+        gc.collect()
+
+    @contextmanager
+    def _acquire(self):
+        """Load the weights and keep unload() from dropping them until the block exits"""
+        with self._lock:
+            self._load()
+            self._users += 1
+            model, tokenizer = self.model, self.tokenizer
+        try:
+            yield model, tokenizer
+        finally:
+            with self._lock:
+                self._users -= 1
+                release = self._unload_pending and not self._users
+                if release:
+                    self.model = None
+                    self.tokenizer = None
+                    self._unload_pending = False
+            if release:
+                gc.collect()
+
+    def generate(self, prompt, max_new_tokens=512, cancelled=None):
+        """Return only the newly generated text"""
+        return "".join(self.stream(prompt, max_new_tokens, cancelled)).strip()
+
+    def stream(self, prompt, max_new_tokens=512, cancelled=None):
+        """
+        Yield generated text pieces while generation runs on a background thread
+        :param cancelled: Optional threading.Event, generation stops at the next token once it is set
+        """
+        from transformers import TextIteratorStreamer
+
+        with self._acquire() as (model, tokenizer):
+            inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+            streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True,
+                                            timeout=self.token_timeout)
+            options = {"stopping_criteria": stop_when(cancelled)} if cancelled is not None else {}
+            errors = []
+
+            def run():
+                try:
+                    model.generate(**inputs, streamer=streamer, max_new_tokens=max_new_tokens, **options)
+                except Exception as e:
+                    errors.append(e)
+                    streamer.end()  # Wake the consumer instead of leaving it waiting for tokens
+
+            worker = threading.Thread(target=run, name="generate", daemon=True)
+            worker.start()
+            try:
+                for text in streamer:
+                    if cancelled is not None and cancelled.is_set():
+                        break
+                    if text:
+                        yield text
+            except queue.Empty:
+                raise TimeoutError(f"No text generated for {self.token_timeout}s") from None
+            worker.join(self.token_timeout)
+            if errors:
+                raise errors[0]
+
+    def count_tokens(self, text):
+        with self._acquire() as (_, tokenizer):
+            return len(tokenizer.encode(text, add_special_tokens=False))
+
+    def prompt_budget(self, max_new_tokens=512):
+        """Prompt tokens that fit in the model's window next to max_new_tokens generated ones"""
+        with self._acquire() as (model, _):
+            return model.config.max_position_embeddings - max_new_tokens
+
+    def truncate(self, text, max_tokens):
+        """The first max_tokens tokens of text"""
+        with self._acquire() as (_, tokenizer):
+            tokens = tokenizer.encode(text, add_special_tokens=False)
+            return text if len(tokens) <= max_tokens else tokenizer.decode(tokens[:max_tokens])
+
+
+class LlamaCppBackend:
+    """Quantized GGUF model served by llama.cpp (llama-cpp-python) on the CPU.
+
+    Weights are memory-mapped so several processes share one copy and only the
+    touched pages become resident; ``use_mlock`` pins them to avoid swapping.
+    """
+
+    def __init__(self, model_path="./models/llama-2-7b-chat.Q4_K_M.gguf", n_ctx=4096, n_threads=None,
+                 n_threads_batch=None, n_batch=512, use_mmap=True, use_mlock=False, lazy=False):
+        """
+        :param model_path: Path of the GGUF file
+        :param n_ctx: Context window cap (prompt + generated tokens)
+        :param n_threads: Threads used while generating (defaults to the physical core estimate)
+        :param n_threads_batch: Threads used for prompt processing (defaults to all cores)
+        :param n_batch: Prompt tokens evaluated per batch
+        :param use_mmap: Memory-map the weights instead of reading them into RAM
+        :param use_mlock: Lock the mapped weights in RAM
+        :param lazy: Defer loading the weights until the first generation
+        """
+        cores = os.cpu_count() or 1
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        self.n_threads = n_threads or max(1, cores // 2)
+        self.n_threads_batch = n_threads_batch or cores
+        self.n_batch = n_batch
+        self.use_mmap = use_mmap
+        self.use_mlock = use_mlock
+        self.llm = None
+        self._lock = threading.Lock()
+        self._users = 0  # Calls holding the model
+        self._unload_pending = False
+        if not lazy:
+            self.load()
+
+    @property
+    def loaded(self):
+        return self.llm is not None
+
+    def load(self):
+        with self._lock:
+            self._load()
+
+    def _load(self):
+        self._unload_pending = False
+        if self.llm is not None:
+            return
+        from llama_cpp import Llama
+
+        self.llm = Llama(
+            model_path=self.model_path,
+            n_ctx=self.n_ctx,
+            n_threads=self.n_threads,
+            n_threads_batch=self.n_threads_batch,
+            n_batch=self.n_batch,
+            use_mmap=self.use_mmap,
+            use_mlock=self.use_mlock,
+            verbose=False
+        )
+
+    @staticmethod
+    def _close(llm):
+        if hasattr(llm, "close"):
+            llm.close()
+
+    def unload(self):
+        """Close the native model, once running generations finish"""
+        with self._lock:
+            if self._users:
+                self._unload_pending = True
+                return
+            llm, self.llm = self.llm, None
+        if llm is not None:
+            self._close(llm)
+        gc.collect()
+
+    @contextmanager
+    def _acquire(self):
+        """Load the model and keep unload() from closing it until the block exits"""
+        with self._lock:
+            self._load()
+            self._users += 1
+            llm = self.llm
+        try:
+            yield llm
+        finally:
+            with self._lock:
+                self._users -= 1
+                release = self._unload_pending and not self._users
+                if release:
+                    self.llm = None
+                    self._unload_pending = False
+            if release:
+                self._close(llm)
+                gc.collect()
+
+    def prompt_budget(self, max_new_tokens=512):
+        """Prompt tokens that fit in n_ctx next to max_new_tokens generated ones"""
+        return self.n_ctx - min(max_new_tokens, self.n_ctx // 2)
+
+    def truncate(self, text, max_tokens):
+        """The first max_tokens tokens of text"""
+        with self._acquire() as llm:
+            tokens = llm.tokenize(text.encode("utf-8"), add_bos=False)
+            if len(tokens) <= max_tokens:
+                return text
+            return llm.detokenize(tokens[:max_tokens]).decode("utf-8", errors="ignore")
+
+    def _fit(self, llm, prompt, max_new_tokens):
+        """
+        Shrink the generation budget so prompt + generation stay inside n_ctx.
+        The prompt itself is never cut (that would drop BOS and the system header), callers shorten
+        the context passage first, see prompt_budget and truncate.
+        """
+        tokens = len(llm.tokenize(prompt.encode("utf-8")))
+        max_new_tokens = min(max_new_tokens, self.n_ctx // 2, self.n_ctx - tokens)
+        if max_new_tokens <= 0:
+            raise ValueError(f"Prompt of {tokens} tokens does not fit n_ctx={self.n_ctx}, shorten its context")
+        return max_new_tokens
+
+    def generate(self, prompt, max_new_tokens=512, cancelled=None):
+        if cancelled is not None:  # Streamed, so the cancel is seen between tokens
+            return "".join(self.stream(prompt, max_new_tokens, cancelled)).strip()
+        with self._acquire() as llm:
+            max_new_tokens = self._fit(llm, prompt, max_new_tokens)
+            output = llm(prompt, max_tokens=max_new_tokens, echo=False)
+            return output["choices"][0]["text"].strip()
+
+    def stream(self, prompt, max_new_tokens=512, cancelled=None):
+        """:param cancelled: Optional threading.Event, closing the llama.cpp generator once it is set"""
+        with self._acquire() as llm:
+            max_new_tokens = self._fit(llm, prompt, max_new_tokens)
+            for chunk in llm(prompt, max_tokens=max_new_tokens, echo=False, stream=True):
+                if cancelled is not None and cancelled.is_set():
+                    break
+                text = chunk["choices"][0]["text"]
+                if text:
+                    yield text
+
+    def count_tokens(self, text):
+        with self._acquire() as llm:
+            return len(llm.tokenize(text.encode("utf-8"), add_bos=False))
+
+
+class EchoBackend:
+    """Deterministic stand-in backend for tests and benchmarks, no model required."""
+
+    def __init__(self, response="This is a test answer from Tejas AI. It has two sentences.", token_delay=0.0,
+                 n_ctx=None):
+        """
+        :param response: Text returned for every prompt (may contain "{prompt}")
+        :param token_delay: Seconds to sleep per streamed word, to mimic generation speed
+        :param n_ctx: Context window in words to mimic (None is unlimited)
+        """
+        self.response = response
+        self.token_delay = token_delay
+        self.n_ctx = n_ctx
+        self.prompts = []
+
+    @property
+    def loaded(self):
+        return True
+
+    def load(self):
+        pass
+
+    def unload(self):
+        pass
+
+    def generate(self, prompt, max_new_tokens=512, cancelled=None):
+        return "".join(self.stream(prompt, max_new_tokens, cancelled)).strip()
+
+    def stream(self, prompt, max_new_tokens=512, cancelled=None):
+        self.prompts.append(prompt)
+        words = self.response.replace("{prompt}", prompt).split(" ")[:max_new_tokens]
+        for i, word in enumerate(words):
+            if cancelled is not None and cancelled.is_set():
+                return
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield word if i == 0 else f" {word}"
+
+    def count_tokens(self, text):
+        return len(text.split())
+
+    def prompt_budget(self, max_new_tokens=512):
+        return self.n_ctx - max_new_tokens if self.n_ctx else None
+
+    def truncate(self, text, max_tokens):
+        return " ".join(text.split()[:max_tokens])
+
+
+BACKENDS = {
+    "transformers": TransformersBackend,
+    "llama_cpp": LlamaCppBackend,
+    "echo": EchoBackend,
+}
+
+
+def create_backend(name="transformers", **options):
+    """Build a generation backend by name ("transformers", "llama_cpp" or "echo")"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}', choose from {sorted(BACKENDS)}")
+    return BACKENDS[name](**options)
@@ -0,0 +1,213 @@
+import multiprocessing
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def extract_paragraphs(html):
+    """Return the non-empty <p> texts of a page (module level so it can run in a worker process)"""
+    soup = BeautifulSoup(html, "html.parser")
+    paragraphs = []
+    for text in soup.find_all("p"):
+        paragraph = text.text.strip()
+        if paragraph:
+            paragraphs.append(paragraph)
+    return paragraphs
+
+
+class FetchResult:
+    """Outcome of one fetch: either a response snapshot or the error that ended the retries."""
+
+    def __init__(self, url, status_code=None, text="", headers=None, error=None, attempts=0, elapsed=0.0):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+        self.error = error
+        self.attempts = attempts
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None and self.status_code is not None
+
+
+class ConcurrentFetcher:
+    """Thread-pooled HTTP fetcher with per-host keep-alive, concurrency caps, rate limits and retries.
+
+    HTML parsing is handed to a separate pool via ``parse_async`` so fetch
+    threads only ever wait on the network.
+    """
+
+    def __init__(self, max_workers=16, per_host_limit=2, min_interval=0.0, timeout=(5, 20),
+                 retries=3, backoff=0.5, parse_workers=None, parse_in_processes=True,
+                 user_agent="TejasAI/1.0", max_retry_delay=30.0):
+        """
+        :param max_workers: Total number of concurrent fetch threads
+        :param per_host_limit: Maximum in-flight requests to a single host
+        :param min_interval: Minimum seconds between request starts on the same host
+        :param timeout: (connect, read) timeout passed to requests
+        :param retries: Extra attempts on connection errors, timeouts and 429/5xx
+        :param backoff: Base delay for exponential backoff between attempts
+        :param parse_workers: Size of the parse pool (defaults to the executor's own default)
+        :param parse_in_processes: Parse in a process pool (True) or a thread pool (False)
+        :param max_retry_delay: Longest wait before a retry, however long the server's Retry-After asks for
+        """
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_retry_delay = max_retry_delay
+        self.user_agent = user_agent
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        if parse_in_processes:
+            # spawn: forking a parent that already runs torch/transformers threads can deadlock
+            self._parse_executor = ProcessPoolExecutor(max_workers=parse_workers,
+                                                       mp_context=multiprocessing.get_context("spawn"))
+        else:
+            self._parse_executor = ThreadPoolExecutor(max_workers=parse_workers)
+
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self._host_next_start = {}
+        self._local = threading.local()
+        self._sessions = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Shut down both pools and every pooled session"""
+        self._executor.shutdown(wait=True)
+        self._parse_executor.shutdown(wait=True)
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+
+    def _session(self, host):
+        """One keep-alive session per (fetch thread, host)"""
+        sessions = getattr(self._local, "sessions", None)
+        if sessions is None:
+            sessions = self._local.sessions = {}
+        session = sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.per_host_limit)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = self.user_agent
+            sessions[host] = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def _slot(self, host):
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    def _wait_for_turn(self, host):
+        """Space request starts on the same host by at least ``min_interval`` seconds"""
+        if self.min_interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._host_next_start.get(host, now))
+            self._host_next_start[host] = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = self.backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+        return min(delay, self.max_retry_delay)  # A huge Retry-After must not hold a pool thread for hours
+
+    def fetch(self, url, headers=None):
+        """Fetch one URL with retries, blocking the calling thread"""
+        host = urlparse(url).netloc
+        started = time.perf_counter()
+        attempt = 0
+
+        with self._slot(host):
+            session = self._session(host)
+            while True:
+                self._wait_for_turn(host)
+                attempt += 1
+                try:
+                    response = session.get(url, headers=headers, timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if attempt > self.retries:
+                        return FetchResult(url, error=e, attempts=attempt,
+                                           elapsed=time.perf_counter() - started)
+                    time.sleep(self._retry_delay(attempt - 1))
+                    continue
+                except requests.RequestException as e:
+                    return FetchResult(url, error=e, attempts=attempt,
+                                       elapsed=time.perf_counter() - started)
+
+                if response.status_code in RETRY_STATUS_CODES and attempt <= self.retries:
+                    response.close()
+                    time.sleep(self._retry_delay(attempt - 1, response))
+                    continue
+
+                return FetchResult(url, status_code=response.status_code, text=response.text,
+                                   headers=response.headers, attempts=attempt,
+                                   elapsed=time.perf_counter() - started)
+
+    def fetch_all(self, jobs):
+        """
+        Fetch many URLs concurrently, scheduled per host.
+
+        Every host gets its own queue and only ``per_host_limit`` of its URLs
+        are handed to the pool at a time, so a host with many URLs never ties
+        up fetch threads that URLs of other hosts could be using.
+        :param jobs: Iterable of (key, url, headers) tuples
+        :return: Generator of (key, FetchResult) in completion order
+        """
+        queues = OrderedDict()
+        for key, url, headers in jobs:
+            queues.setdefault(urlparse(url).netloc, deque()).append((key, url, headers))
+
+        pending = {}
+
+        def start(host):
+            key, url, headers = queues[host].popleft()
+            pending[self._executor.submit(self.fetch, url, headers)] = (key, host)
+
+        # Interleave the first wave so every host starts right away
+        for _ in range(self.per_host_limit):
+            for host, queue in queues.items():
+                if queue:
+                    start(host)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, host = pending.pop(future)
+                if queues[host]:
+                    start(host)  # Refill the slot this host just freed
+                yield key, future.result()
+
+    def parse_async(self, parse, text):
+        """Run ``parse(text)`` on the parse pool and return its future"""
+        return self._parse_executor.submit(parse, text)
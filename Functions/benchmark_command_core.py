@@ -0,0 +1,276 @@
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from answer_cache import SemanticAnswerCache
+from camera_service import CameraService
+from command_core import CommandCore
+from command_dispatcher import CommandDispatcher
+from computer_vision import ComputerVision
+from knowledge import Knowledge
+from llm_backend import EchoBackend
+from main import MainAI
+from reconstruct_3d import Reconstruct3D
+from stt_tts import STT, Utterance
+
+# Scripted session mixing slow renders and answers with quick camera commands
+SCRIPT = [
+    "generate an image of a temple at dawn",
+    "scan code",
+    "what is dharma",
+    "scan text",
+    "generate an image of a peacock",
+    "detect objects",
+    "weather in pune",
+    "make a 3d model",
+    "scan code",
+    "generate an image of the himalayas",
+    "who was aryabhata",
+    "scan text",
+]
+
+# Seconds each kind of stub command takes
+SERVICE_TIMES = {"vision": 0.15, "image_generator": 1.0, "assistant": 0.5, "reconstructor": 0.8, "stt": 1.0}
+
+# As in main.py: scans, detection and 3D capture all open a window and share "camera_ui"
+LIMITS = {"camera_ui": 1, "image_generator": 2, "assistant": 1, "stt": 1, "default": 1}
+
+# Commands stopped while MainAI's handlers run: cancelled by id, or (the answer) by the assistant timeout
+CANCELLED = ["scan text", "scan code", "detect objects", "scan image", "scan real time environment",
+             "make a 3d model", "listen mode", "what is dharma"]
+CANCEL_AFTER = 0.5  # Seconds a command runs before it is cancelled
+TIMEOUTS = {"assistant": 0.3}
+
+ANSWER = " ".join(["Dharma is the order that sustains the world and every being in it."] * 20)
+
+
+def stub_dispatcher(service_times=SERVICE_TIMES):
+    """A dispatcher with MainAI's intents whose handlers only sleep and never look at match.cancelled"""
+    def handler(kind):
+        def run(match):
+            time.sleep(service_times[kind])
+            return kind
+        return run
+
+    dispatcher = CommandDispatcher(fallback=handler("assistant"))
+    dispatcher.register("scan_text", "scan text", handler("vision"), subsystem="camera_ui")
+    dispatcher.register("scan_code", ["scan code", "scan barcode"], handler("vision"), subsystem="camera_ui")
+    dispatcher.register("scan_image", "scan image", handler("vision"), subsystem="camera_ui")
+    dispatcher.register("detect_objects", "detect objects", handler("vision"), subsystem="camera_ui")
+    dispatcher.register("scan_environment", "scan real time environment", handler("vision"), subsystem="camera_ui")
+    dispatcher.register("make_3d_model", "make a 3d model", handler("reconstructor"), subsystem="camera_ui")
+    dispatcher.register("generate_image", "generate an image", handler("image_generator"), anchored=True,
+                        subsystem="image_generator")
+    dispatcher.register("listen_mode", "listen mode", handler("stt"), subsystem="stt")
+    return dispatcher
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "mean_s": statistics.mean(latencies),
+        "p95_s": latencies[int(0.95 * (len(latencies) - 1))],
+        "max_s": latencies[-1],
+        "total_s": elapsed,
+        "commands_per_s": len(latencies) / elapsed,
+    }
+
+
+def run_sequential(script=SCRIPT):
+    """The blocking REPL: every command waits for all the ones typed before it"""
+    dispatcher = stub_dispatcher()
+    started = time.perf_counter()
+    latencies = []
+    for command in script:
+        dispatcher.dispatch(command)
+        latencies.append(time.perf_counter() - started)  # All commands were "typed" at the start
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def run_core(script=SCRIPT, limits=LIMITS):
+    core = CommandCore(stub_dispatcher(), limits=limits, verbose=False)
+    started = time.perf_counter()
+    jobs = asyncio.run(core.run(commands=[(command, "script") for command in script], drain=True))
+    elapsed = time.perf_counter() - started
+    core.close()
+    return summarize([job.latency for job in jobs], elapsed), core.report()
+
+
+# Offline stand-ins for the leaf models only, the handlers and their frame / token / audio loops are MainAI's own
+
+class StubDetector:
+    labels = {1: "person"}
+
+    def detect(self, frame):
+        time.sleep(0.02)
+        return [("person", 0.9, (10, 10, 60, 60))]
+
+
+class StubOCR:
+    def read(self, frame):
+        time.sleep(0.02)
+        return "om"
+
+    def close(self):
+        pass
+
+
+class OfflineKnowledge(Knowledge):
+    """Knowledge over a fixed passage and a slow EchoBackend, without ChromaDB, scraping or model downloads"""
+
+    def __init__(self, cache_path, token_delay=0.05):
+        self.generation_mode = "single"
+        self.max_new_tokens = 512
+        self.stream_metrics = {}
+        self.backend = EchoBackend(ANSWER, token_delay=token_delay)
+        self.answer_cache = SemanticAnswerCache(letter_counts, path=cache_path)
+
+    def query_chromadb(self, question, query_embedding=None):
+        return "Dharma is what upholds."
+
+
+def letter_counts(texts):
+    """Tiny embedding function for the answer cache"""
+    return [[text.lower().count(letter) for letter in "abcdefghijklmnopqrstuvwxyz"] for text in texts]
+
+
+class SilentMicrophone:
+    """A microphone hearing only silence, one frame per frame duration"""
+
+    def __init__(self, frame_samples, sample_rate):
+        self.frame_samples = frame_samples
+        self.frame_seconds = frame_samples / sample_rate
+        self.stream = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def read(self, samples):
+        time.sleep(self.frame_seconds)
+        return bytes(2 * samples)
+
+
+class OfflineSTT(STT):
+    def microphone(self):
+        return SilentMicrophone(self.recognizer.frame_samples, self.sample_rate)
+
+
+class SilentTTS:
+    """Speaks nothing, every utterance is done at once"""
+
+    def speak(self, text, **options):
+        utterance = Utterance(text)
+        utterance.started = time.perf_counter()
+        utterance._finish("done")
+        return utterance
+
+    def report(self):
+        return {"spoken": 0, "cache_hits": 0, "stale": 0}
+
+
+class AlwaysGeneral:
+    def categorize(self, text):
+        return "general"
+
+
+def moving_texture(size=(240, 320)):
+    """Synthetic camera source: one random texture sliding a pixel per frame, so ORB finds features to match"""
+    texture = np.random.default_rng(0).integers(0, 255, (size[0], size[1] * 2, 3), dtype=np.uint8)
+    return lambda index: np.ascontiguousarray(texture[:, index % size[1]:index % size[1] + size[1]])
+
+
+def offline_main_ai(workdir):
+    """MainAI with its real handlers, whose subsystems are built on a synthetic camera and the stand-ins above"""
+    camera = CameraService(moving_texture())
+
+    class HeadlessReconstruct3D(Reconstruct3D):
+        def run(self, source=None, output=None, headless=True, compress=False, cancelled=None):
+            return super().run(source, output or os.path.join(workdir, "model.ply"), True, compress, cancelled)
+
+    main_ai = MainAI(config={"concurrency": LIMITS, "timeouts": TIMEOUTS})
+    factories = {
+        "tejas_ai": lambda: OfflineKnowledge(os.path.join(workdir, "answers.sqlite3")),
+        "vision": lambda: ComputerVision(camera, change_gate=False, detector=StubDetector(), ocr=StubOCR(),
+                                         display=False),
+        "reconstructor": lambda: HeadlessReconstruct3D(camera),
+        "stt": lambda: OfflineSTT(backend="stub", vad="energy", calibration_seconds=0.1),
+        "tts": SilentTTS,
+        "query_categorizer": AlwaysGeneral,
+    }
+    for name, factory in factories.items():
+        main_ai.subsystems.register(name, factory)
+        main_ai.subsystems.get(name)  # Built up front, so only the handlers are timed
+    return main_ai, camera
+
+
+def measure_stops(dispatcher, commands=CANCELLED, after=CANCEL_AFTER):
+    """
+    Run each command alone, cancel it by id after ``after`` seconds (the answer hits its timeout first)
+    :return: [(command, status, seconds from the cancel / timeout until the handler returned and freed its slot)]
+    """
+    core = CommandCore(dispatcher, limits=LIMITS, timeouts=TIMEOUTS, verbose=False)
+
+    async def session():
+        runner = asyncio.ensure_future(core.run())
+        await asyncio.sleep(0)
+        stops = []
+        for command in commands:
+            await core.submit(command)
+            await asyncio.sleep(after)
+            job = next(reversed(core.jobs.values()))
+            stopped = job.finished if job.done else time.perf_counter()
+            core.cancel(job.id)
+            while job.returned is None or not job.done:
+                await asyncio.sleep(0.005)
+            stops.append((command, job.status, job.returned - stopped))
+        await core.submit("exit")
+        await runner
+        return stops
+
+    stops = asyncio.run(session())
+    core.close()
+    return stops
+
+
+def run_cancellation():
+    """Slot release after a cancel: stub handlers that ignore match.cancelled against MainAI's real handlers"""
+    ignoring = measure_stops(stub_dispatcher({kind: 2.0 for kind in SERVICE_TIMES}))
+    workdir = tempfile.mkdtemp()
+    main_ai, camera = offline_main_ai(workdir)
+    try:
+        real = measure_stops(main_ai.dispatcher)
+    finally:
+        main_ai.subsystems.stop()
+        camera.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return ignoring, real
+
+
+if __name__ == "__main__":
+    sequential = run_sequential()
+    concurrent, report = run_core()
+    print(f"{'mode':<12}{'mean s':>9}{'p95 s':>9}{'max s':>9}{'total s':>9}{'cmd/s':>8}")
+    for name, row in (("blocking", sequential), ("core", concurrent)):
+        print(f"{name:<12}{row['mean_s']:>9.2f}{row['p95_s']:>9.2f}{row['max_s']:>9.2f}{row['total_s']:>9.2f}"
+              f"{row['commands_per_s']:>8.1f}")
+    for subsystem, row in sorted(report["subsystems"].items()):
+        print(f"   {subsystem:<16} {row['commands']:>2} commands, mean {row['mean_latency_s']:.2f}s, "
+              f"waited {row['mean_wait_s']:.2f}s for a slot (limit {LIMITS.get(subsystem, 1)})")
+    print(f"⚡ Mean command latency {sequential['mean_s'] / concurrent['mean_s']:.1f}x lower, "
+          f"throughput {concurrent['commands_per_s'] / sequential['commands_per_s']:.1f}x higher")
+
+    ignoring, real = run_cancellation()
+    print(f"\n{'command':<30}{'status':>10}{'ignored s':>11}{'MainAI s':>10}  (cancel -> slot free)")
+    for (command, status, ignored_s), (_, real_status, real_s) in zip(ignoring, real):
+        print(f"{command:<30}{real_status:>10}{ignored_s:>11.3f}{real_s:>10.3f}")
+    print(f"🛑 Handlers stopped {statistics.mean(s for _, _, s in real) * 1000:.0f}ms after a cancel or timeout "
+          f"on average (max {max(s for _, _, s in real) * 1000:.0f}ms), "
+          f"{statistics.mean(s for _, _, s in ignoring):.2f}s when the event is ignored")
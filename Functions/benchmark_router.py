@@ -0,0 +1,64 @@
+import statistics
+import time
+
+from query_classifier import GENERAL, REAL_TIME, QueryClassifier, QueryRouter
+
+# Labelled queries covering both categories, including a few deliberately vague ones
+LABELLED_QUERIES = [
+    ("weather in pune", REAL_TIME),
+    ("what's the temperature in chennai right now", REAL_TIME),
+    ("is it raining in bangalore", REAL_TIME),
+    ("will it be sunny in jaipur tomorrow", REAL_TIME),
+    ("latest news on isro", REAL_TIME),
+    ("news about the monsoon session", REAL_TIME),
+    ("today's top headlines", REAL_TIME),
+    ("stock price of infosys", REAL_TIME),
+    ("how is the sensex doing", REAL_TIME),
+    ("current price of gold", REAL_TIME),
+    ("who won the match last night", REAL_TIME),
+    ("what is happening in delhi today", REAL_TIME),
+    ("what is dharma", GENERAL),
+    ("explain karma yoga from the bhagavad gita", GENERAL),
+    ("who was maharana pratap", GENERAL),
+    ("what happened at the battle of haldighati", GENERAL),
+    ("what does the katha upanishad say about death", GENERAL),
+    ("who wrote the yoga sutras", GENERAL),
+    ("what is the surya siddhanta", GENERAL),
+    ("what did brahmagupta contribute to mathematics", GENERAL),
+    ("history of nalanda university", GENERAL),
+    ("what is the meaning of moksha", GENERAL),
+    ("difference between samkhya and nyaya", GENERAL),
+    ("tell me about chanakya", GENERAL),
+]
+
+
+def run(classify, queries=LABELLED_QUERIES):
+    """Return (accuracy, per-query latencies in ms) for a classify(query) -> category callable"""
+    correct, latencies = 0, []
+    for query, expected in queries:
+        started = time.perf_counter()
+        label = classify(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        correct += label == expected
+    return correct / len(queries), latencies
+
+
+def summarize(name, accuracy, latencies):
+    p95 = sorted(latencies)[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{name:<22}{accuracy:>10.1%}{statistics.mean(latencies):>12.1f}{statistics.median(latencies):>12.1f}{p95:>12.1f}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    router = QueryRouter()
+    router.centroids()  # build/load centroids outside the timed loop
+
+    print(f"{'classifier':<22}{'accuracy':>10}{'mean ms':>12}{'median ms':>12}{'p95 ms':>12}")
+    summarize("router (cold)", *run(router.categorize))
+    summarize("router (memoized)", *run(router.categorize))
+    print("🧭 Tier usage:", router.stats())
+
+    if "--nli" in sys.argv:
+        nli = QueryClassifier()
+        summarize("zero-shot NLI only", *run(nli.categorize))
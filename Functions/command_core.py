@@ -0,0 +1,330 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+EXIT_WORDS = ("exit", "quit")
+DEFAULT_SUBSYSTEM = "default"
+
+
+class CommandJob:
+    """One command in the core: where it came from, its state and timings."""
+
+    def __init__(self, job_id, command, source):
+        self.id = job_id
+        self.command = command
+        self.source = source  # "text", "voice", "script", ...
+        self.name = None  # Matched intent, None for the fallback
+        self.subsystem = DEFAULT_SUBSYSTEM
+        self.status = "queued"  # queued, waiting, running, done, failed, cancelled, timeout
+        self.result = None
+        self.error = None
+        self.cancelled = threading.Event()  # Cooperative stop signal for the handler thread
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.finished = None
+        self.returned = None  # When the handler thread returned, may be after finished for a cancel or timeout
+        self.task = None
+
+    @property
+    def wait_time(self):
+        """Seconds spent queued behind the subsystem's concurrency limit"""
+        return (self.started or self.finished or time.perf_counter()) - self.submitted
+
+    @property
+    def latency(self):
+        """Seconds from submission to completion"""
+        return (self.finished or time.perf_counter()) - self.submitted
+
+    @property
+    def done(self):
+        return self.finished is not None
+
+    @property
+    def stopping(self):
+        """Cancelled or timed out, but the handler has not returned yet and still holds its slot"""
+        return self.done and self.started is not None and self.returned is None
+
+
+class CommandCore:
+    """asyncio command loop running many commands at once.
+
+    Text, voice and scripted commands all go into one queue. Each command is
+    resolved by the CommandDispatcher and its handler runs on an executor
+    while the loop keeps accepting input. Every subsystem has its own
+    concurrency limit (one camera window at a time, a couple of image jobs...)
+    and optional timeout; commands can be cancelled by id. Handlers see a
+    cancelled or timed-out command through ``match.cancelled``, a
+    threading.Event, and the subsystem slot is only released once the
+    handler thread has actually returned.
+
+    Typed control words: "jobs" lists commands in flight (and handlers still
+    stopping after a cancel), "cancel <id>" /
+    "cancel all" cancel them, "exit" / "quit" stop the core.
+    """
+
+    def __init__(self, dispatcher, limits=None, timeouts=None, process_subsystems=(), fallback_subsystem="assistant",
+                 max_threads=16, controls=None, history=100, verbose=True):
+        """
+        :param dispatcher: CommandDispatcher whose intents carry a subsystem name
+        :param limits: {subsystem: max concurrent commands}, "default" covers the rest (1 if missing)
+        :param timeouts: {subsystem: seconds}, "default" covers the rest (None waits forever)
+        :param process_subsystems: Subsystems whose handlers run in a process pool (picklable handlers only)
+        :param fallback_subsystem: Subsystem of commands that go to the dispatcher's fallback
+        :param max_threads: Size of the thread pool shared by all thread-run subsystems
+        :param controls: Extra {word: callable()} control commands handled on the loop (e.g. "status")
+        :param history: Finished jobs kept for "jobs" and report()
+        :param verbose: Print a line when a command finishes
+        """
+        self.dispatcher = dispatcher
+        self.limits = {DEFAULT_SUBSYSTEM: 1, **(limits or {})}
+        self.timeouts = dict(timeouts or {})
+        self.process_subsystems = set(process_subsystems)
+        self.fallback_subsystem = fallback_subsystem
+        self.controls = dict(controls or {})
+        self.history = history
+        self.verbose = verbose
+        self.jobs = OrderedDict()
+        self.stats = {"submitted": 0, "done": 0, "failed": 0, "cancelled": 0, "timeout": 0}
+
+        self._ids = itertools.count(1)
+        self._threads = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="command")
+        self._processes = ProcessPoolExecutor() if self.process_subsystems else None
+        self._slots = {}
+        self._loop = None
+        self._queue = None
+        self._stopped = None
+
+    def limit(self, subsystem):
+        return self.limits.get(subsystem, self.limits[DEFAULT_SUBSYSTEM])
+
+    def timeout(self, subsystem):
+        return self.timeouts.get(subsystem, self.timeouts.get(DEFAULT_SUBSYSTEM))
+
+    def _slot(self, subsystem):
+        if subsystem not in self._slots:
+            self._slots[subsystem] = asyncio.Semaphore(self.limit(subsystem))
+        return self._slots[subsystem]
+
+    # Input side
+
+    def submit_threadsafe(self, command, source="text"):
+        """Queue a command from any thread (input readers, handlers such as listen mode)"""
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (command, source))
+
+    async def submit(self, command, source="script"):
+        """Queue a command from the event loop"""
+        await self._queue.put((command, source))
+
+    def start_reader(self, reader, source="text"):
+        """
+        Feed the queue from a blocking reader (input, STT listen...) on a daemon thread.
+        :param reader: Zero-argument callable returning the next command ("" is skipped)
+        """
+        def read():
+            while not self._stopped.is_set():
+                try:
+                    command = reader()
+                except EOFError:
+                    command = EXIT_WORDS[0]
+                except Exception as e:
+                    print(f"⚠️ {source} input failed: {e}")
+                    time.sleep(1)
+                    continue
+                if command and command.strip():
+                    self.submit_threadsafe(command.strip(), source)
+                    if command.strip().lower() in EXIT_WORDS:
+                        return
+
+        thread = threading.Thread(target=read, name=f"{source}-input", daemon=True)
+        thread.start()
+        return thread
+
+    # Execution side
+
+    def _control(self, command):
+        """Handle control words on the loop, returns True when the command was one"""
+        word = command.lower()
+        if word in EXIT_WORDS:
+            self._stopped.set()
+            return True
+        if word in self.controls:
+            self.controls[word]()
+            return True
+        if word == "jobs":
+            running = [job for job in self.jobs.values() if not job.done or job.stopping]
+            if not running:
+                print("   No commands in flight")
+            for job in running:
+                status = "stopping" if job.stopping else job.status
+                print(f"   [{job.id}] {status:<8} {job.subsystem:<16} {job.latency:6.1f}s  {job.command}")
+            return True
+        if word.startswith("cancel "):
+            target = word.split(" ", 1)[1].strip()
+            if target == "all":
+                cancelled = [self.cancel(job.id) for job in list(self.jobs.values()) if not job.done]
+                print(f"🛑 Cancelled {sum(cancelled)} command(s)")
+            elif target.isdigit():
+                print(f"🛑 Cancelled [{target}]" if self.cancel(int(target)) else f"❌ No command [{target}] in flight")
+            else:
+                return False
+            return True
+        return False
+
+    def cancel(self, job_id):
+        """Cancel a queued or running command by id"""
+        job = self.jobs.get(job_id)
+        if job is None or job.done or job.task is None:
+            return False
+        job.cancelled.set()
+        job.task.cancel()
+        return True
+
+    def _remember(self, job):
+        self.jobs[job.id] = job
+        finished = [key for key, old in self.jobs.items() if old.done]
+        for key in finished[:max(0, len(self.jobs) - self.history)]:
+            del self.jobs[key]
+
+    def _start(self, command, source):
+        job = CommandJob(next(self._ids), command, source)
+        handler, match = self.dispatcher.resolve(command)
+        if handler is None:
+            print(f"❌ Unknown command: {command}")
+            return None
+        job.name = match.name
+        if match.subsystem:
+            job.subsystem = match.subsystem
+        elif match.name is None:  # The dispatcher's fallback
+            job.subsystem = self.fallback_subsystem
+        # Events cannot be pickled to a worker process, so process-run handlers are not told to stop
+        match.cancelled = None if job.subsystem in self.process_subsystems else job.cancelled
+        self.stats["submitted"] += 1
+        self._remember(job)
+        job.task = asyncio.ensure_future(self._execute(job, handler, match))
+        return job
+
+    async def _execute(self, job, handler, match):
+        slot = self._slot(job.subsystem)
+        job.status = "waiting"
+        try:
+            await slot.acquire()
+        except asyncio.CancelledError:
+            self._finish(job, "cancelled")
+            return
+
+        job.status = "running"
+        job.started = time.perf_counter()
+        executor = self._processes if job.subsystem in self.process_subsystems else self._threads
+        future = executor.submit(handler, match)
+        loop = asyncio.get_running_loop()
+
+        def release(_):
+            # The slot stays taken until the handler really returns, even after a timeout or cancel
+            job.returned = time.perf_counter()
+            try:
+                loop.call_soon_threadsafe(slot.release)
+            except RuntimeError:  # Loop already closed
+                pass
+
+        future.add_done_callback(release)
+        try:
+            job.result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)),
+                                                self.timeout(job.subsystem))
+        except asyncio.TimeoutError:
+            job.cancelled.set()
+            future.cancel()
+            self._finish(job, "timeout")
+        except asyncio.CancelledError:
+            job.cancelled.set()
+            future.cancel()
+            self._finish(job, "cancelled")
+        except Exception as e:
+            job.error = e
+            self._finish(job, "failed")
+        else:
+            self._finish(job, "done")
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished = time.perf_counter()
+        self.stats[status] += 1
+        if not self.verbose:
+            return
+        label = job.name or job.subsystem
+        if status == "done":
+            print(f"✅ [{job.id}] {label} finished in {job.latency:.2f}s")
+        elif status == "failed":
+            print(f"⚠️ [{job.id}] {label} failed: {job.error}")
+        elif status == "timeout":
+            print(f"⏱️ [{job.id}] {label} timed out after {self.timeout(job.subsystem)}s")
+        else:
+            print(f"🛑 [{job.id}] {label} cancelled")
+
+    async def run(self, readers=(), commands=(), drain=False):
+        """
+        Run the core until "exit"/"quit" (or, with drain, until the scripted commands are finished).
+        :param readers: (reader, source) pairs started with start_reader
+        :param commands: Scripted (command, source) pairs queued up front
+        :param drain: Stop once the queue is empty and every command finished
+        :return: Every job submitted during the run
+        """
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._stopped = threading.Event()
+        submitted = []
+        for command, source in commands:
+            self._queue.put_nowait((command, source))
+        for reader, source in readers:
+            self.start_reader(reader, source)
+
+        while not self._stopped.is_set():
+            if drain and self._queue.empty():
+                pending = [job.task for job in submitted if not job.done]
+                if not pending:
+                    break
+                getter = asyncio.ensure_future(self._queue.get())
+                await asyncio.wait(pending + [getter], return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    continue
+                command, source = getter.result()
+            else:
+                command, source = await self._queue.get()
+            if self._control(command):
+                continue
+            job = self._start(command, source)
+            if job is not None:
+                submitted.append(job)
+
+        in_flight = [job.task for job in submitted if not job.done]
+        for task in in_flight:
+            task.cancel()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        return submitted
+
+    def close(self):
+        """Release the executors without waiting for handler threads that ignore cancellation"""
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+
+    def report(self):
+        """Counters plus mean / p95 latency and slot wait of the finished commands, per subsystem"""
+        report = {"stats": dict(self.stats), "subsystems": {}}
+        by_subsystem = {}
+        for job in self.jobs.values():
+            if job.done:
+                by_subsystem.setdefault(job.subsystem, []).append(job)
+        for subsystem, jobs in by_subsystem.items():
+            latencies = sorted(job.latency for job in jobs)
+            report["subsystems"][subsystem] = {
+                "commands": len(jobs),
+                "mean_latency_s": sum(latencies) / len(latencies),
+                "p95_latency_s": latencies[int(0.95 * (len(latencies) - 1))],
+                "mean_wait_s": sum(job.wait_time for job in jobs) / len(jobs),
+            }
+        return report
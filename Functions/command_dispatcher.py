@@ -0,0 +1,199 @@
+import threading
+from collections import deque
+
+# Words dropped between a command phrase and its argument ("generate an image of a cat" -> "a cat")
+ARGUMENT_CONNECTORS = ("of", "about", "on", "for", "to", "called", "named")
+
+
+class CommandMatch:
+    """A dispatched command: which phrase matched where, and the text after it."""
+
+    def __init__(self, name, phrase, command, start, end, subsystem=None):
+        self.name = name
+        self.phrase = phrase
+        self.command = command
+        self.start = start
+        self.end = end
+        self.subsystem = subsystem
+        self.cancelled = threading.Event()  # Set by CommandCore when the command is cancelled or times out
+
+    @property
+    def argument(self):
+        """Text following the matched phrase, without a leading connector word or closing punctuation"""
+        rest = self.command[self.end:].strip().rstrip(".!?").strip()
+        head, _, tail = rest.partition(" ")
+        if head in ARGUMENT_CONNECTORS:
+            rest = tail.strip()
+        return rest
+
+
+class _Intent:
+    def __init__(self, name, phrases, handler, anchored, priority, subsystem):
+        self.name = name
+        self.phrases = phrases
+        self.handler = handler
+        self.anchored = anchored
+        self.priority = priority
+        self.subsystem = subsystem
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over command phrases.
+
+    One pass over the input finds every phrase occurrence, so matching cost
+    depends on the input length and number of hits, not on how many phrases
+    are registered.
+    """
+
+    def __init__(self, phrases):
+        # Node 0 is the root; each node has transitions, a failure link and the phrases ending there
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for phrase in phrases:
+            self._add(phrase)
+        self._link()
+
+    def _add(self, phrase):
+        node = 0
+        for char in phrase:
+            if char not in self.goto[node]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[node][char] = len(self.goto) - 1
+            node = self.goto[node][char]
+        self.output[node].append(phrase)
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find_all(self, text):
+        """Yield (phrase, start, end) for every occurrence in text"""
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for phrase in self.output[node]:
+                yield phrase, i + 1 - len(phrase), i + 1
+
+
+class CommandDispatcher:
+    """Registry of command intents compiled into a single phrase matcher.
+
+    Subsystems register phrases with a handler; ``dispatch`` lowercases the
+    command, finds every registered phrase occurring on word boundaries in one
+    pass, and runs the handler of the best match (highest priority, then
+    longest phrase, then earliest position).
+    """
+
+    def __init__(self, fallback=None):
+        """
+        :param fallback: Handler called with a CommandMatch named None (the whole command) when no intent matches
+        """
+        self.fallback = fallback
+        self._intents = {}
+        self._by_phrase = {}
+        self._compiled = None  # (PhraseMatcher, phrase -> intent) snapshot, rebuilt after registry changes
+        self._lock = threading.Lock()
+
+    def register(self, name, phrases, handler, anchored=False, priority=0, subsystem=None):
+        """
+        Register an intent.
+        :param name: Unique intent name (re-registering replaces it)
+        :param phrases: Phrase or list of phrases that trigger the intent
+        :param handler: Callable taking a CommandMatch
+        :param anchored: Only match when the phrase starts the command
+        :param priority: Higher priority wins over longer phrases when several intents match
+        :param subsystem: Subsystem the handler runs on, used by CommandCore for concurrency limits
+        """
+        if isinstance(phrases, str):
+            phrases = [phrases]
+        phrases = [" ".join(phrase.lower().split()) for phrase in phrases]
+        with self._lock:
+            for phrase in phrases:
+                owner = self._by_phrase.get(phrase)
+                if owner is not None and owner.name != name:
+                    raise ValueError(f"Phrase '{phrase}' is already registered by '{owner.name}'")
+            if name in self._intents:
+                self._unregister(name)
+            intent = _Intent(name, phrases, handler, anchored, priority, subsystem)
+            self._intents[name] = intent
+            for phrase in phrases:
+                self._by_phrase[phrase] = intent
+            self._compiled = None
+
+    def unregister(self, name):
+        with self._lock:
+            self._unregister(name)
+            self._compiled = None
+
+    def _unregister(self, name):
+        intent = self._intents.pop(name)
+        for phrase in intent.phrases:
+            self._by_phrase.pop(phrase, None)
+
+    def command(self, name, phrases, anchored=False, priority=0, subsystem=None):
+        """Decorator form of register"""
+        def decorator(handler):
+            self.register(name, phrases, handler, anchored=anchored, priority=priority, subsystem=subsystem)
+            return handler
+        return decorator
+
+    def _best(self, command):
+        text = " ".join(command.lower().split())
+        with self._lock:
+            if self._compiled is None:
+                self._compiled = (PhraseMatcher(self._by_phrase), dict(self._by_phrase))
+            matcher, by_phrase = self._compiled
+
+        best, best_key = None, None
+        for phrase, start, end in matcher.find_all(text):
+            intent = by_phrase[phrase]
+            # Whole words only, so "scan code" does not fire inside "scan codes" but does in "scan code!"
+            if (start > 0 and text[start - 1].isalnum()) or (end < len(text) and text[end].isalnum()):
+                continue
+            if intent.anchored and start != 0:
+                continue
+            key = (intent.priority, len(phrase), -start)
+            if best_key is None or key > best_key:
+                best, best_key = (intent, CommandMatch(intent.name, phrase, text, start, end, intent.subsystem)), key
+        return best
+
+    def match(self, command):
+        """Return the best CommandMatch for a command, or None"""
+        best = self._best(command)
+        return best[1] if best else None
+
+    def resolve(self, command):
+        """
+        Find what a command would run, without running it.
+        :return: (handler, CommandMatch); the fallback gets a match named None spanning no phrase,
+                 and the handler is None when nothing matches and there is no fallback
+        """
+        best = self._best(command)
+        if best is None:
+            return self.fallback, CommandMatch(None, None, command, 0, 0)
+        intent, match = best
+        return intent.handler, match
+
+    def dispatch(self, command):
+        """Run the handler of the best matching intent (or the fallback) and return its result"""
+        handler, match = self.resolve(command)
+        if handler is None:
+            return None
+        return handler(match)
+
+    @property
+    def intents(self):
+        return list(self._intents)
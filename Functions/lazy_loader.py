@@ -0,0 +1,167 @@
+import gc
+import threading
+import time
+from contextlib import contextmanager
+
+
+class LazySubsystem:
+    """Builds a subsystem on first use and lets it be unloaded again when idle.
+
+    Handlers hold the subsystem with ``use()`` (or ``acquire()`` / ``release()``)
+    for the whole command; a subsystem in use is never idle nor unloaded.
+    """
+
+    def __init__(self, name, factory, idle_timeout=None, on_unload=None):
+        """
+        :param name: Name used in logs and reports
+        :param factory: Zero-argument callable that builds the subsystem
+        :param idle_timeout: Seconds without use after which the subsystem is unloaded (None keeps it)
+        :param on_unload: Optional callable run on the instance before it is dropped
+        """
+        self.name = name
+        self.factory = factory
+        self.idle_timeout = idle_timeout
+        self.on_unload = on_unload
+        self.instance = None
+        self.load_time = None
+        self.load_count = 0
+        self.last_used = None
+        self._users = 0
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.instance is not None
+
+    @property
+    def in_use(self):
+        return self._users > 0
+
+    def _get(self):
+        if self.instance is None:
+            print(f"🔄 Loading {self.name}...")
+            started = time.perf_counter()
+            self.instance = self.factory()
+            self.load_time = time.perf_counter() - started
+            self.load_count += 1
+            print(f"✅ {self.name} loaded in {self.load_time:.2f}s")
+        self.last_used = time.monotonic()
+        return self.instance
+
+    def get(self):
+        """Return the subsystem, building it first if needed"""
+        with self._lock:
+            return self._get()
+
+    def acquire(self):
+        """Return the subsystem and mark it in use until the matching release()"""
+        with self._lock:
+            instance = self._get()
+            self._users += 1
+            return instance
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            self.last_used = time.monotonic()  # Idle time counts from the end of the last use
+
+    @contextmanager
+    def use(self):
+        """Hold the subsystem for the duration of the block"""
+        instance = self.acquire()
+        try:
+            yield instance
+        finally:
+            self.release()
+
+    def unload(self, idle_only=False):
+        """
+        Drop the subsystem so its memory can be reclaimed, unless it is in use
+        :param idle_only: Only unload when still idle, checked atomically with the unload
+        :return: True when it was unloaded
+        """
+        with self._lock:
+            if self.instance is None or self._users or (idle_only and not self.is_idle()):
+                return False
+            instance, self.instance = self.instance, None
+        # Cleanup runs outside the lock, a slow close() never blocks get() (it builds a fresh instance)
+        if self.on_unload:
+            self.on_unload(instance)
+        del instance
+        gc.collect()
+        print(f"💤 {self.name} unloaded")
+        return True
+
+    def is_idle(self, now=None):
+        if self.instance is None or self.idle_timeout is None or self.last_used is None or self._users:
+            return False
+        return (now or time.monotonic()) - self.last_used > self.idle_timeout
+
+
+class SubsystemManager:
+    """Registry of lazily built subsystems with background prewarming and idle unloading."""
+
+    def __init__(self, check_interval=30):
+        self.subsystems = {}
+        self.check_interval = check_interval
+        self._stop = threading.Event()
+        self._reaper = None
+
+    def register(self, name, factory, idle_timeout=None, on_unload=None):
+        self.subsystems[name] = LazySubsystem(name, factory, idle_timeout, on_unload)
+
+    def get(self, name):
+        return self.subsystems[name].get()
+
+    def use(self, name):
+        """Context manager holding a subsystem for a whole command, the idle reaper skips it meanwhile"""
+        return self.subsystems[name].use()
+
+    def acquire(self, name):
+        return self.subsystems[name].acquire()
+
+    def release(self, name):
+        self.subsystems[name].release()
+
+    def unload(self, name):
+        return self.subsystems[name].unload()
+
+    def prewarm(self, names):
+        """Build the given subsystems one after another on a background thread"""
+        def warm():
+            for name in names:
+                if self._stop.is_set():
+                    return
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"⚠️ Prewarming {name} failed: {e}")
+
+        thread = threading.Thread(target=warm, name="prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def start_idle_reaper(self):
+        """Periodically unload subsystems that exceeded their idle timeout"""
+        if self._reaper is not None:
+            return
+
+        def reap():
+            while not self._stop.wait(self.check_interval):
+                now = time.monotonic()
+                for subsystem in self.subsystems.values():
+                    if subsystem.is_idle(now):
+                        subsystem.unload(idle_only=True)
+
+        self._reaper = threading.Thread(target=reap, name="idle-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def report(self):
+        """Per-subsystem load state and last load time"""
+        return {
+            name: {"loaded": s.loaded, "load_time": s.load_time, "load_count": s.load_count}
+            for name, s in self.subsystems.items()
+        }
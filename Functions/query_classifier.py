@@ -1,12 +1,196 @@
-from transformers import pipeline
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+REAL_TIME = "real_time"
+GENERAL = "general"
+
+# Zero-shot labels mapped onto the router's categories
+NLI_LABELS = {"Real-Time Query": REAL_TIME, "General Knowledge Query": GENERAL}
+
+# Tier 1: cheap patterns with the confidence they give on their own
+KEYWORD_RULES = [
+    (re.compile(r"\bweather\b|\btemperature (in|at|outside)\b|\bforecast\b|\bis it raining\b"), REAL_TIME, 0.95),
+    (re.compile(r"\bnews\b|\bheadlines?\b"), REAL_TIME, 0.9),
+    (re.compile(r"\bstock\b|\bshare price\b|\bmarket cap\b|\bnifty\b|\bsensex\b"), REAL_TIME, 0.9),
+    (re.compile(r"\b(right now|currently|today|tonight|this week|latest|live)\b"), REAL_TIME, 0.7),
+    (re.compile(r"\b(veda|upanishad|gita|purana|sutra|smriti|shastra|ramayana|mahabharata|dharma|karma|"
+                r"vedanta|ayurveda|yoga)\w*\b"), GENERAL, 0.9),
+    (re.compile(r"^(what|who|why|how) (is|was|were|are|did|does) .*\b(meaning|history|philosophy|ancient)\b"),
+     GENERAL, 0.75),
+]
+
+# Tier 2: seed examples whose embedding centroids label new queries
+CENTROID_EXAMPLES = {
+    REAL_TIME: [
+        "weather in Mumbai", "what's the temperature in Delhi right now", "will it rain tomorrow",
+        "latest news on cricket", "news about the elections", "today's headlines",
+        "stock price of TCS", "how is the share market doing today", "price of Reliance shares",
+    ],
+    GENERAL: [
+        "what is dharma", "explain the Bhagavad Gita", "who was Chhatrapati Shivaji Maharaj",
+        "what does the Isha Upanishad teach", "history of the Somnath temple", "meaning of karma",
+        "who wrote the Arthashastra", "what is Advaita Vedanta", "what did Aryabhata discover",
+    ],
+}
+
 
 class QueryClassifier:
+    """Zero-shot NLI classifier (BART-large-mnli), used as the router's last resort"""
+
     def __init__(self):
         """Initialize NLP model for text classification"""
-        self.classifier = pipeline("text-classification", model="facebook/bart-large-mnli")
+        from transformers import pipeline
+
+        self.classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
 
     def categorize(self, question):
         """Categorize query as 'Real-Time' or 'General Knowledge'"""
-        categories = ["Real-Time Query", "General Knowledge Query"]
-        result = self.classifier(question, candidate_labels=categories)
-        return result["labels"][0]  # Return top category
\ No newline at end of file
+        label, _ = self.classify(question)
+        return label
+
+    def classify(self, question):
+        """Return (category, score) of the top zero-shot label"""
+        result = self.classifier(question, candidate_labels=list(NLI_LABELS))
+        return NLI_LABELS[result["labels"][0]], float(result["scores"][0])
+
+
+class QueryRouter:
+    """Tiered query router: keyword rules, then embedding centroids, then zero-shot NLI only when unsure.
+
+    Decisions are memoized per normalized query.
+    """
+
+    def __init__(self, embedding_function=None, rule_threshold=0.85, centroid_threshold=0.08,
+                 cache_size=2048, centroid_cache="./tejas_ai_knowledge_db/router_centroids.npz",
+                 nli_classifier=None):
+        """
+        :param embedding_function: Callable mapping a list of texts to vectors (defaults to ChromaDB's MiniLM)
+        :param rule_threshold: Keyword confidence needed to skip the embedding tier
+        :param centroid_threshold: Cosine margin between the two centroids needed to skip NLI
+        :param cache_size: Number of memoized routing decisions
+        :param centroid_cache: File where the centroid embeddings are cached
+        :param nli_classifier: Object with classify(question), built lazily (QueryClassifier) when needed
+        """
+        self._embedding_function = embedding_function
+        self.rule_threshold = rule_threshold
+        self.centroid_threshold = centroid_threshold
+        self.cache_size = cache_size
+        self.centroid_cache = centroid_cache
+        self._nli = nli_classifier
+        self._centroids = None
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self.tier_counts = {"memo": 0, "rules": 0, "centroid": 0, "nli": 0}
+
+    @staticmethod
+    def normalize(query):
+        return re.sub(r"\s+", " ", query.lower()).strip().rstrip("?!. ")
+
+    def categorize(self, question):
+        """Return the category ("real_time" or "general") for a query"""
+        return self.route(question)[0]
+
+    def route(self, question):
+        """Return (category, confidence, tier) for a query"""
+        key = self.normalize(question)
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                self.tier_counts["memo"] += 1
+                return self._memo[key]
+
+        decision = self._decide(key)
+        with self._lock:
+            self._memo[key] = decision
+            if len(self._memo) > self.cache_size:
+                self._memo.popitem(last=False)
+        return decision
+
+    def _decide(self, query):
+        label, confidence = self.match_rules(query)
+        if label is not None and confidence >= self.rule_threshold:
+            self.tier_counts["rules"] += 1
+            return label, confidence, "rules"
+
+        centroid_label, margin = self.nearest_centroid(query)
+        if margin >= self.centroid_threshold:
+            self.tier_counts["centroid"] += 1
+            return centroid_label, margin, "centroid"
+
+        self.tier_counts["nli"] += 1
+        nli_label, score = self.nli.classify(query)
+        return nli_label, score, "nli"
+
+    @staticmethod
+    def match_rules(query):
+        """Tier 1: combine keyword hits into (category or None, confidence)"""
+        scores = {}
+        for pattern, label, confidence in KEYWORD_RULES:
+            if pattern.search(query):
+                # Independent hits reinforce each other: 1 - prod(1 - c)
+                scores[label] = 1 - (1 - scores.get(label, 0.0)) * (1 - confidence)
+        if not scores:
+            return None, 0.0
+        if len(scores) > 1:
+            # Conflicting evidence: report the winner with the difference as confidence
+            (label, best), (_, other) = sorted(scores.items(), key=lambda item: -item[1])
+            return label, best - other
+        return next(iter(scores.items()))
+
+    @property
+    def embedding_function(self):
+        if self._embedding_function is None:
+            from chromadb.utils import embedding_functions
+
+            self._embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        return self._embedding_function
+
+    @property
+    def nli(self):
+        if self._nli is None:
+            self._nli = QueryClassifier()
+        return self._nli
+
+    def _embed(self, texts):
+        vectors = np.asarray(self.embedding_function(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def centroids(self):
+        """Unit-length centroid per category, cached on disk and keyed by the seed examples"""
+        if self._centroids is not None:
+            return self._centroids
+
+        labels = sorted(CENTROID_EXAMPLES)
+        digest = hashlib.sha256(repr([(label, CENTROID_EXAMPLES[label]) for label in labels]).encode()).hexdigest()
+        try:
+            with np.load(self.centroid_cache) as cached:
+                if str(cached["digest"]) == digest:
+                    self._centroids = (labels, cached["matrix"])
+                    return self._centroids
+        except (OSError, KeyError, ValueError):
+            pass
+
+        matrix = np.vstack([self._embed(CENTROID_EXAMPLES[label]).mean(axis=0) for label in labels])
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        directory = os.path.dirname(self.centroid_cache)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(self.centroid_cache, digest=digest, matrix=matrix)
+        self._centroids = (labels, matrix)
+        return self._centroids
+
+    def nearest_centroid(self, query):
+        """Tier 2: (closest category, cosine margin over the runner-up)"""
+        labels, matrix = self.centroids()
+        similarities = matrix @ self._embed([query])[0]
+        order = np.argsort(similarities)[::-1]
+        return labels[order[0]], float(similarities[order[0]] - similarities[order[1]])
+
+    def stats(self):
+        return dict(self.tier_counts)
@@ -0,0 +1,369 @@
+import itertools
+import json
+import os
+import time
+import wave
+from collections import deque
+
+import numpy as np
+
+
+def read_wav(path, sample_rate=16000):
+    """Mono int16 samples of a WAV file, resampled to sample_rate"""
+    with wave.open(path) as audio:
+        channels, width, rate = audio.getnchannels(), audio.getsampwidth(), audio.getframerate()
+        raw = audio.readframes(audio.getnframes())
+    if width != 2:
+        raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+    samples = np.frombuffer(raw, dtype="<i2").reshape(-1, channels).mean(axis=1)
+    if rate != sample_rate:
+        positions = np.arange(0, len(samples), rate / sample_rate)
+        samples = np.interp(positions, np.arange(len(samples)), samples)
+    return samples.astype(np.int16)
+
+
+def wav_frames(path, sample_rate=16000, frame_ms=30):
+    """Fixed-size 16-bit PCM frames of a WAV file, as a microphone would deliver them"""
+    samples = read_wav(path, sample_rate)
+    size = sample_rate * frame_ms // 1000
+    padded = np.zeros(-(-len(samples) // size) * size, dtype=np.int16)
+    padded[:len(samples)] = samples
+    for start in range(0, len(padded), size):
+        yield padded[start:start + size].tobytes()
+
+
+def frame_rms(frame):
+    samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+    return float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+
+
+class EnergyVAD:
+    """Speech when a frame's RMS clears the calibrated noise floor by a margin."""
+
+    def __init__(self, sample_rate=16000, margin=3.0, min_delta=100.0, threshold=500.0):
+        """
+        :param margin: Speech must be this many times louder than the noise floor
+        :param min_delta: ... and at least this much louder (for near-silent rooms)
+        :param threshold: RMS threshold used until calibrate() runs
+        """
+        self.margin = margin
+        self.min_delta = min_delta
+        self.threshold = threshold
+        self.noise_floor = None
+
+    def calibrate(self, frames):
+        levels = [frame_rms(frame) for frame in frames]
+        if levels:
+            self.noise_floor = float(np.median(levels))
+            self.threshold = max(self.noise_floor * self.margin, self.noise_floor + self.min_delta)
+        return self.noise_floor
+
+    def is_speech(self, frame):
+        return frame_rms(frame) > self.threshold
+
+
+class WebRTCVAD:
+    """Google's WebRTC voice-activity detector (frames of 10, 20 or 30 ms)."""
+
+    def __init__(self, sample_rate=16000, aggressiveness=2):
+        import webrtcvad
+
+        self.sample_rate = sample_rate
+        self.vad = webrtcvad.Vad(aggressiveness)
+        self.noise_floor = None
+
+    def calibrate(self, frames):
+        # The detector adapts on its own, the floor is only kept for reporting
+        levels = [frame_rms(frame) for frame in frames]
+        self.noise_floor = float(np.median(levels)) if levels else None
+        return self.noise_floor
+
+    def is_speech(self, frame):
+        return self.vad.is_speech(frame, self.sample_rate)
+
+
+def create_vad(name="auto", sample_rate=16000, **options):
+    """"webrtc", "energy", or "auto" (webrtc when webrtcvad is installed)"""
+    if name == "auto":
+        try:
+            import webrtcvad  # noqa: F401
+            name = "webrtc"
+        except ImportError:
+            name = "energy"
+    if name == "webrtc":
+        return WebRTCVAD(sample_rate, **options)
+    if name == "energy":
+        return EnergyVAD(sample_rate, **options)
+    raise ValueError(f"Unknown VAD '{name}', choose from ['auto', 'energy', 'webrtc']")
+
+
+class GoogleBackend:
+    """The online Google Web Speech recognizer: no partials, the text arrives after the utterance."""
+
+    def __init__(self, sample_rate=16000, language="en-US"):
+        import speech_recognition as sr
+
+        self.sr = sr
+        self.recognizer = sr.Recognizer()
+        self.sample_rate = sample_rate
+        self.language = language
+
+    def start(self):
+        self._chunks = []
+
+    def accept(self, pcm):
+        self._chunks.append(pcm)
+        return None
+
+    def finish(self):
+        audio = self.sr.AudioData(b"".join(self._chunks), self.sample_rate, 2)
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language)
+        except self.sr.UnknownValueError:
+            return ""
+
+
+class VoskBackend:
+    """Offline Kaldi recognizer streaming partial hypotheses while audio arrives."""
+
+    def __init__(self, sample_rate=16000, model_path="./models/vosk-model-small-en-us-0.15"):
+        from vosk import Model, SetLogLevel
+
+        SetLogLevel(-1)
+        self.sample_rate = sample_rate
+        self.model = Model(model_path)
+
+    def start(self):
+        from vosk import KaldiRecognizer
+
+        self._recognizer = KaldiRecognizer(self.model, self.sample_rate)
+        self._final = []
+
+    def accept(self, pcm):
+        if self._recognizer.AcceptWaveform(pcm):
+            self._final.append(json.loads(self._recognizer.Result()).get("text", ""))
+            partial = ""
+        else:
+            partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        return " ".join(text for text in self._final + [partial] if text)
+
+    def finish(self):
+        self._final.append(json.loads(self._recognizer.FinalResult()).get("text", ""))
+        return " ".join(text for text in self._final if text)
+
+
+class WhisperCppBackend:
+    """Offline whisper.cpp (pywhispercpp) decoding each utterance once it ends.
+
+    ``partial_interval`` re-decodes the audio so far every that many seconds
+    of speech to show partial text, at the cost of extra compute.
+    """
+
+    def __init__(self, sample_rate=16000, model="base.en", n_threads=None, partial_interval=None):
+        from pywhispercpp.model import Model
+
+        if sample_rate != 16000:
+            raise ValueError("whisper.cpp expects 16 kHz audio")
+        self.sample_rate = sample_rate
+        self.partial_interval = partial_interval
+        self.model = Model(model, n_threads=n_threads or os.cpu_count(), print_progress=False,
+                           print_realtime=False)
+
+    def start(self):
+        self._chunks = []
+        self._seconds = 0.0
+        self._next_partial = self.partial_interval
+
+    def _decode(self):
+        audio = np.frombuffer(b"".join(self._chunks), dtype=np.int16).astype(np.float32) / 32768.0
+        return " ".join(segment.text.strip() for segment in self.model.transcribe(audio)).strip()
+
+    def accept(self, pcm):
+        self._chunks.append(pcm)
+        self._seconds += len(pcm) / (2 * self.sample_rate)
+        if self.partial_interval:
+            if self._seconds >= self._next_partial:
+                self._next_partial += self.partial_interval
+                return self._decode()
+        return None
+
+    def finish(self):
+        return self._decode() if self._chunks else ""
+
+
+class StubBackend:
+    """Deterministic stand-in backend for tests and benchmarks, no model required.
+
+    Every utterance is heard as ``text``, revealed one word per
+    ``seconds_per_word`` of audio as partials; ``compute_ratio`` sleeps that
+    fraction of the audio duration to mimic a model's real-time factor.
+    """
+
+    def __init__(self, sample_rate=16000, text="hello tejas", seconds_per_word=0.3, compute_ratio=0.0):
+        self.sample_rate = sample_rate
+        self.words = text.split()
+        self.seconds_per_word = seconds_per_word
+        self.compute_ratio = compute_ratio
+
+    def start(self):
+        self._seconds = 0.0
+
+    def accept(self, pcm):
+        seconds = len(pcm) / (2 * self.sample_rate)
+        self._seconds += seconds
+        if self.compute_ratio:
+            time.sleep(seconds * self.compute_ratio)
+        return " ".join(self.words[:int(self._seconds / self.seconds_per_word) + 1])
+
+    def finish(self):
+        return " ".join(self.words)
+
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "vosk": VoskBackend,
+    "whisper_cpp": WhisperCppBackend,
+    "stub": StubBackend,
+}
+
+
+def create_backend(name="google", **options):
+    """Build a recognition backend by name ("google", "vosk", "whisper_cpp" or "stub")"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown STT backend '{name}', choose from {sorted(BACKENDS)}")
+    return BACKENDS[name](**options)
+
+
+class Transcript:
+    """Recognized utterances plus timing: real-time factor and end-of-speech-to-text latency."""
+
+    def __init__(self):
+        self.segments = []  # {"text", "start", "end", "latency"} per utterance, times in seconds of audio
+        self.audio_seconds = 0.0
+        self.processing_seconds = 0.0
+
+    @property
+    def text(self):
+        return " ".join(segment["text"] for segment in self.segments if segment["text"])
+
+    @property
+    def rtf(self):
+        """Processing time per second of audio (below 1 keeps up with live speech)"""
+        return self.processing_seconds / self.audio_seconds if self.audio_seconds else 0.0
+
+    @property
+    def latency(self):
+        """Mean seconds from the end of speech until its final text is ready"""
+        latencies = [segment["latency"] for segment in self.segments]
+        return sum(latencies) / len(latencies) if latencies else None
+
+
+class StreamingRecognizer:
+    """Cuts a stream of PCM frames into utterances with a VAD and streams them into a backend.
+
+    An utterance starts after ``start_ms`` of consecutive speech (the
+    ``pre_roll_ms`` before it are included) and ends after ``hangover_ms``
+    of silence. The reported latency of an utterance is the hangover plus
+    the time the backend needs to produce the final text.
+    """
+
+    def __init__(self, backend, vad=None, sample_rate=16000, frame_ms=30, start_ms=90, pre_roll_ms=300,
+                 hangover_ms=600, max_utterance_s=15.0):
+        """
+        :param backend: Object with start(), accept(pcm) -> partial text or None, finish() -> text
+        :param vad: Object with calibrate(frames) and is_speech(frame) (defaults to create_vad("auto"))
+        :param frame_ms: Frame length, 10, 20 or 30 ms
+        """
+        self.backend = backend
+        self.vad = vad or create_vad("auto", sample_rate)
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.pre_roll_frames = max(self.start_frames, pre_roll_ms // frame_ms)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.max_utterance_frames = int(max_utterance_s * 1000 / frame_ms)
+
+    def calibrate(self, frames):
+        """Measure the noise floor from frames of background noise (once, the result is reused)"""
+        return self.vad.calibrate(list(frames))
+
+    def transcribe(self, frames, on_partial=None, single=True, max_wait=None, cancelled=None):
+        """
+        Recognize speech in a stream of frames.
+        :param frames: Iterable of 16-bit mono PCM frames of frame_ms
+        :param on_partial: Optional callable(text) whenever the partial hypothesis changes
+        :param single: Stop after the first utterance (live listening) instead of reading the whole stream
+        :param max_wait: Seconds of audio to wait for speech to start before giving up
+        :param cancelled: Optional threading.Event checked every frame; once set the utterance in progress
+                          is dropped without being decoded
+        :return: Transcript
+        """
+        transcript = Transcript()
+        frame_seconds = self.frame_ms / 1000
+        hangover_seconds = self.hangover_frames * frame_seconds
+        pre_roll = deque(maxlen=self.pre_roll_frames)
+        in_speech, voiced, silence, length, partial, count = False, 0, 0, 0, None, 0
+
+        def feed(frame):
+            nonlocal partial
+            text = self.backend.accept(frame)
+            if text is not None and text != partial:
+                partial = text
+                if on_partial:
+                    on_partial(text)
+
+        def end(hangover):
+            ended = time.perf_counter()
+            text = self.backend.finish()
+            finished = time.perf_counter()
+            transcript.segments.append({"text": text, "start": start, "end": count * frame_seconds - hangover,
+                                        "latency": hangover + finished - ended})
+            return finished - ended
+
+        for frame in frames:
+            if cancelled is not None and cancelled.is_set():
+                break
+            count += 1
+            started = time.perf_counter()
+            speech = self.vad.is_speech(frame)
+            if not in_speech:
+                pre_roll.append(frame)
+                voiced = voiced + 1 if speech else 0
+                if voiced >= self.start_frames:
+                    in_speech, silence, length, partial = True, 0, len(pre_roll), None
+                    start = (count - len(pre_roll)) * frame_seconds
+                    self.backend.start()
+                    for buffered in pre_roll:
+                        feed(buffered)
+                    pre_roll.clear()
+                elif single and max_wait is not None and count * frame_seconds >= max_wait:
+                    transcript.processing_seconds += time.perf_counter() - started
+                    break
+            else:
+                feed(frame)
+                length += 1
+                silence = 0 if speech else silence + 1
+                if silence >= self.hangover_frames or length >= self.max_utterance_frames:
+                    end(hangover_seconds if silence >= self.hangover_frames else 0.0)
+                    in_speech = False
+                    if single:
+                        transcript.processing_seconds += time.perf_counter() - started
+                        break
+            transcript.processing_seconds += time.perf_counter() - started
+        else:
+            if in_speech:  # The stream ended mid-utterance
+                transcript.processing_seconds += end(0.0)
+
+        transcript.audio_seconds = count * frame_seconds
+        return transcript
+
+    def transcribe_file(self, path, on_partial=None, single=False, calibrate_seconds=0.3):
+        """
+        Recognize a WAV file (any rate, 16-bit), calibrating on its first calibrate_seconds when not calibrated yet.
+        :return: Transcript
+        """
+        if calibrate_seconds and self.vad.noise_floor is None:
+            frames = wav_frames(path, self.sample_rate, self.frame_ms)
+            self.calibrate(itertools.islice(frames, max(1, int(calibrate_seconds * 1000 / self.frame_ms))))
+        return self.transcribe(wav_frames(path, self.sample_rate, self.frame_ms), on_partial, single)
@@ -1,39 +1,390 @@
+import hashlib
+import heapq
+import itertools
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import wave
+from collections import OrderedDict, deque
+
 import speech_recognition as sr
 import pyttsx3
+from stt_backends import StreamingRecognizer, create_backend, create_vad
+
+# Utterance priorities, lower is spoken first
+URGENT, NORMAL, BACKGROUND = 0, 1, 2
+
 
 class STT:
-    """Speech-to-Text (STT) System"""
-    
-    def __init__(self):
-        self.recognizer = sr.Recognizer()
-
-    def listen(self):
-        """Listen from microphone and return recognized text"""
-        with sr.Microphone() as source:
+    """Speech-to-Text (STT) System
+
+    Microphone audio is cut into utterances by voice-activity detection and
+    streamed into a pluggable backend: "google" (online) or the offline
+    "vosk" / "whisper_cpp" models, which also show partial text while you
+    speak. The noise floor is calibrated on the first listen and reused.
+    The microphone has one owner at a time: concurrent listen() calls (the
+    voice input reader, listen mode) wait for the running one to finish.
+    """
+
+    def __init__(self, backend="google", vad="auto", sample_rate=16000, frame_ms=30, calibration_seconds=0.5,
+                 listen_timeout=10.0, **backend_options):
+        """
+        :param backend: "google", "vosk", "whisper_cpp" or "stub" (see stt_backends.BACKENDS)
+        :param vad: "auto", "webrtc" or "energy"
+        :param calibration_seconds: Background noise measured once before the first utterance
+        :param listen_timeout: Seconds to wait for speech to start
+        :param backend_options: Passed to the backend (e.g. model_path for vosk, model for whisper_cpp)
+        """
+        self.recognizer = StreamingRecognizer(create_backend(backend, sample_rate=sample_rate, **backend_options),
+                                              create_vad(vad, sample_rate), sample_rate, frame_ms)
+        self.sample_rate = sample_rate
+        self.calibration_seconds = calibration_seconds
+        self.listen_timeout = listen_timeout
+        self.calibrated = False
+        self.last_transcript = None
+        self._microphone = threading.Lock()
+
+    def microphone(self):
+        """The audio source listen() reads, a context manager whose .stream.read(n) returns 16-bit PCM"""
+        return sr.Microphone(sample_rate=self.sample_rate, chunk_size=self.recognizer.frame_samples)
+
+    def _microphone_frames(self, source):
+        while True:
+            yield source.stream.read(self.recognizer.frame_samples)
+
+    @staticmethod
+    def _show_partial(text):
+        print(f"\r💬 {text}", end="", flush=True)
+
+    def calibrate(self, frames):
+        """Measure the noise floor, reused by every later listen"""
+        count = max(1, int(self.calibration_seconds * 1000 / self.recognizer.frame_ms))
+        noise_floor = self.recognizer.calibrate(itertools.islice(frames, count))
+        self.calibrated = True
+        return noise_floor
+
+    def listen(self, on_partial=None, cancelled=None):
+        """
+        Listen from microphone and return recognized text
+        :param cancelled: Optional threading.Event checked every audio frame (and while waiting for the
+                          microphone), listening stops and returns "" once it is set
+        """
+        while not self._microphone.acquire(timeout=0.1):
+            if cancelled is not None and cancelled.is_set():
+                return ""
+        try:
+            return self._listen(on_partial, cancelled)
+        finally:
+            self._microphone.release()
+
+    def _listen(self, on_partial, cancelled):
+        with self.microphone() as source:
+            frames = self._microphone_frames(source)
+            if not self.calibrated:
+                print("🎚️ Calibrating for background noise...")
+                self.calibrate(frames)
             print("🎤 Listening...")
-            self.recognizer.adjust_for_ambient_noise(source)  # Adjust for background noise
             try:
-                audio = self.recognizer.listen(source)
-                text = self.recognizer.recognize_google(audio)
-                print(f"🗣️ Recognized: {text}")
-                return text.lower()
-            except sr.UnknownValueError:
-                print("❌ Could not understand audio")
-                return ""
+                transcript = self.recognizer.transcribe(frames, on_partial or self._show_partial,
+                                                        max_wait=self.listen_timeout, cancelled=cancelled)
             except sr.RequestError:
                 print("⚠️ STT Service Unavailable")
                 return ""
+        self.last_transcript = transcript
+        if cancelled is not None and cancelled.is_set():
+            print("\n🛑 Listening cancelled")
+            return ""
+        if transcript.segments and not on_partial:
+            print()  # End the partial line
+        if not transcript.text:
+            print("❌ Could not understand audio")
+            return ""
+        print(f"🗣️ Recognized: {transcript.text} ({transcript.latency:.2f}s after you stopped, "
+              f"RTF {transcript.rtf:.2f})")
+        return transcript.text.lower()
+
+    def transcribe_file(self, path, on_partial=None):
+        """Recognize every utterance of a WAV file, returns a Transcript with RTF and latency"""
+        return self.recognizer.transcribe_file(path, on_partial)
+
+
+class Utterance:
+    """A queued piece of speech: its status, timings and a handle to wait for or cancel it."""
+
+    def __init__(self, text, priority=NORMAL, max_age=None):
+        self.text = text
+        self.priority = priority
+        self.max_age = max_age
+        self.status = "queued"  # queued, speaking, done, cancelled, stale, failed
+        self.cached = False
+        self.queued = time.perf_counter()
+        self.started = None
+        self.finished = None
+        self.cancelled = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def queue_latency(self):
+        """Seconds between speak() and the start of the audio"""
+        return self.started - self.queued if self.started is not None else None
+
+    @property
+    def stale(self):
+        return self.max_age is not None and time.perf_counter() - self.queued > self.max_age
+
+    def cancel(self):
+        """Drop the utterance if still queued, or cut it off while it is being spoken"""
+        self.cancelled.set()
+
+    def wait(self, timeout=None):
+        """Block until the utterance was spoken, cancelled or dropped"""
+        return self._done.wait(timeout)
+
+    def _finish(self, status):
+        self.status = status
+        self.finished = time.perf_counter()
+        self._done.set()
+
+
+def find_player():
+    """Command playing a sound file on this platform, None on Windows (winsound) or when none is installed"""
+    if sys.platform == "win32":
+        return None
+    if sys.platform == "darwin":
+        candidates = [["afplay"]]
+    else:
+        candidates = [["aplay", "-q"], ["paplay"], ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet"]]
+    for command in candidates:
+        if shutil.which(command[0]):
+            return command
+    return None
+
 
 class TTS:
-    """Text-to-Speech (TTS) System"""
-    
-    def __init__(self):
+    """Text-to-Speech (TTS) System
+
+    speak() only queues the text and returns an Utterance; a dedicated worker
+    thread owns the pyttsx3 engine and speaks the queue in priority order.
+    Utterances that waited longer than their max_age are dropped as stale,
+    and interrupt=True cuts off the current speech and clears the queue.
+    Phrases spoken more than once (short fixed status messages) are
+    synthesized to a file once and replayed from the cache afterwards.
+    """
+
+    def __init__(self, rate=150, volume=1.0, cache_dir="./tts_cache", max_cached_chars=80, stale_after=15.0,
+                 max_seen=512):
+        """
+        :param rate: Speaking rate in words per minute
+        :param volume: Volume between 0 and 1
+        :param cache_dir: Folder for synthesized phrases (None disables the cache)
+        :param max_cached_chars: Only phrases up to this length are cached
+        :param stale_after: Default max_age in seconds before a queued utterance is dropped (None keeps all)
+        :param max_seen: Short phrases whose use count is remembered, least recently spoken forgotten first
+        """
+        self.rate = rate
+        self.volume = volume
+        self.cache_dir = cache_dir
+        self.max_cached_chars = max_cached_chars
+        self.stale_after = stale_after
+        self.max_seen = max_seen
+        self.player = find_player()
+        if cache_dir and (self.player or sys.platform == "win32"):
+            os.makedirs(cache_dir, exist_ok=True)
+        else:
+            self.cache_dir = None  # No way to play cached files back
+        self.stats = {"spoken": 0, "cache_hits": 0, "cached": 0, "stale": 0, "cancelled": 0, "failed": 0}
+        self.queue_latencies = deque(maxlen=200)
+
+        self._queue = []
+        self._counter = itertools.count()
+        self._seen = OrderedDict()  # phrase -> times spoken, LRU bounded by max_seen
+        self._current = None
+        self._closed = False
+        self._init_error = None
+        self._condition = threading.Condition()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="tts", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._init_error is not None:
+            raise self._init_error
+
+    def _init_engine(self):
+        # pyttsx3 engines are not thread-safe, so only the worker thread touches this one
         self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', 150)  # Set speed
-        self.engine.setProperty('volume', 1.0)  # Set volume
+        self.engine.setProperty('rate', self.rate)  # Set speed
+        self.engine.setProperty('volume', self.volume)  # Set volume
+        self.engine.connect('started-word', self._on_word)
+        self.voice = self.engine.getProperty('voice')
 
-    def speak(self, text):
-        """Convert text to speech and play it"""
+    def _on_word(self, name, location, length):
+        if self._current is not None and self._current.cancelled.is_set():
+            self.engine.stop()
+
+    def speak(self, text, priority=NORMAL, interrupt=False, max_age=..., cache=None):
+        """
+        Queue text to be spoken and return immediately.
+        :param priority: URGENT, NORMAL or BACKGROUND
+        :param interrupt: Cut off the current speech and drop everything queued
+        :param max_age: Seconds the utterance may wait before it is dropped as stale (default stale_after, None keeps it)
+        :param cache: Force (True) or skip (False) the phrase cache, None caches phrases seen before
+        :return: Utterance
+        """
         print(f"🔊 Speaking: {text}")
-        self.engine.say(text)
+        utterance = Utterance(text, priority, self.stale_after if max_age is ... else max_age)
+        with self._condition:
+            if self._closed:
+                utterance._finish("cancelled")
+                return utterance
+            if interrupt:
+                self._clear()
+            if cache is None:  # Long texts are never cached, so their uses are not counted either
+                cache = len(text) <= self.max_cached_chars and self._count(text, self._seen.pop(text, 0) + 1) > 1
+            utterance.cached = cache
+            heapq.heappush(self._queue, (priority, next(self._counter), utterance))
+            self._condition.notify()
+        return utterance
+
+    def _count(self, text, seen):
+        """Store a phrase's use count as most recently used, forgetting the oldest beyond max_seen"""
+        self._seen[text] = seen
+        while len(self._seen) > self.max_seen:
+            self._seen.popitem(last=False)
+        return seen
+
+    def _clear(self):
+        for _, _, utterance in self._queue:
+            utterance.cancel()
+        if self._current is not None:
+            self._current.cancel()
+
+    def clear(self):
+        """Stop the current speech and cancel everything queued"""
+        with self._condition:
+            self._clear()
+
+    def pending(self):
+        with self._condition:
+            return sum(1 for _, _, utterance in self._queue if not utterance.cancelled.is_set())
+
+    def _next(self):
+        with self._condition:
+            while not self._queue and not self._closed:
+                self._condition.wait()
+            if not self._queue:
+                return None
+            utterance = heapq.heappop(self._queue)[2]
+            self._current = utterance
+            return utterance
+
+    def _run(self):
+        try:
+            self._init_engine()
+        except Exception as e:
+            self._init_error = e
+            return
+        finally:
+            self._ready.set()
+        while True:
+            utterance = self._next()
+            if utterance is None:
+                return
+            if utterance.cancelled.is_set():
+                self.stats["cancelled"] += 1
+                utterance._finish("cancelled")
+                continue
+            if utterance.stale:
+                self.stats["stale"] += 1
+                utterance._finish("stale")
+                continue
+
+            utterance.status = "speaking"
+            utterance.started = time.perf_counter()
+            self.queue_latencies.append(utterance.queue_latency)
+            try:
+                path = self._cached_audio(utterance.text) if utterance.cached else None
+                if path:
+                    self._play(path, utterance)
+                else:
+                    self.engine.say(utterance.text)
+                    self.engine.runAndWait()
+            except Exception as e:
+                print(f"⚠️ TTS failed: {e}")
+                self.stats["failed"] += 1
+                utterance._finish("failed")
+                continue
+            finally:
+                with self._condition:
+                    self._current = None
+            if utterance.cancelled.is_set():
+                self.stats["cancelled"] += 1
+                utterance._finish("cancelled")
+            else:
+                self.stats["spoken"] += 1
+                utterance._finish("done")
+
+    def _cache_path(self, text):
+        key = hashlib.sha1(f"{text}|{self.rate}|{self.volume}|{self.voice}".encode("utf-8")).hexdigest()
+        # The macOS driver writes AIFF, SAPI and espeak write WAV
+        return os.path.join(self.cache_dir, key + (".aiff" if sys.platform == "darwin" else ".wav"))
+
+    def _cached_audio(self, text):
+        """Path of the synthesized phrase, synthesizing it on first use (None when it cannot be cached)"""
+        if not self.cache_dir or len(text) > self.max_cached_chars:
+            return None
+        path = self._cache_path(text)
+        if os.path.exists(path):
+            self.stats["cache_hits"] += 1
+            return path
+        tmp_path = path + ".tmp" + os.path.splitext(path)[1]
+        self.engine.save_to_file(text, tmp_path)
         self.engine.runAndWait()
+        if not os.path.exists(tmp_path) or not os.path.getsize(tmp_path):
+            return None
+        os.replace(tmp_path, path)
+        self.stats["cached"] += 1
+        return path
+
+    def _play(self, path, utterance):
+        """Play a cached phrase, stopping early when the utterance is cancelled"""
+        if sys.platform == "win32":
+            import winsound
+
+            with wave.open(path) as audio:
+                duration = audio.getnframes() / audio.getframerate()
+            winsound.PlaySound(path, winsound.SND_FILENAME | winsound.SND_ASYNC)
+            if utterance.cancelled.wait(duration):
+                winsound.PlaySound(None, winsound.SND_PURGE)
+            return
+        process = subprocess.Popen(self.player + [path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        while process.poll() is None:
+            if utterance.cancelled.wait(0.02):
+                process.terminate()
+                process.wait()
+
+    def precache(self, phrases):
+        """Mark fixed phrases so even their first use is synthesized once and replayed from the cache"""
+        with self._condition:
+            for phrase in phrases:
+                self._count(phrase, max(self._seen.pop(phrase, 0), 1))
+
+    def report(self):
+        """Counters plus mean / p95 / max queue latency in milliseconds"""
+        latencies = sorted(self.queue_latencies)
+        report = dict(self.stats)
+        if latencies:
+            report["mean_queue_ms"] = 1000 * sum(latencies) / len(latencies)
+            report["p95_queue_ms"] = 1000 * latencies[int(0.95 * (len(latencies) - 1))]
+            report["max_queue_ms"] = 1000 * latencies[-1]
+        return report
+
+    def close(self, wait=True):
+        """Stop accepting speech; the worker finishes the queue before exiting"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            self._thread.join()
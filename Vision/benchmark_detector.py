@@ -0,0 +1,73 @@
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+import torch
+
+from object_detector import ObjectDetector
+
+# (model_name, input_size, quantize) combinations compared on CPU
+CONFIGURATIONS = [
+    ("fasterrcnn_resnet50_fpn", None, False),  # original setup: model's own 800px resize
+    ("fasterrcnn_resnet50_fpn", 640, False),
+    ("fasterrcnn_resnet50_fpn", 640, True),
+    ("fasterrcnn_mobilenet_v3_large_fpn", 640, False),
+    ("fasterrcnn_mobilenet_v3_large_320_fpn", None, False),
+    ("fasterrcnn_mobilenet_v3_large_320_fpn", None, True),
+    ("ssdlite320_mobilenet_v3_large", None, False),
+]
+
+
+def load_frames(source=None, count=16, size=(480, 640)):
+    """Frames from an image directory or video file, or random frames when no source is given"""
+    frames = []
+    if source and os.path.isdir(source):
+        for path in sorted(glob.glob(os.path.join(source, "*")))[:count]:
+            image = cv2.imread(path)
+            if image is not None:
+                frames.append(image)
+    elif source:
+        capture = cv2.VideoCapture(source)
+        while len(frames) < count:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(frame)
+        capture.release()
+    else:
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 256, size=(*size, 3), dtype=np.uint8) for _ in range(count)]
+    return frames
+
+
+def benchmark(detector, frames, batch_size=1, warmup=2):
+    """Return frames per second of detect_batch over all frames"""
+    for _ in range(warmup):
+        detector.detect_batch(frames[:batch_size])
+    started = time.perf_counter()
+    for start in range(0, len(frames), batch_size):
+        detector.detect_batch(frames[start:start + batch_size])
+    return len(frames) / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="CPU object detection throughput per configuration")
+    parser.add_argument("source", nargs="?", help="Image directory or video file (random frames if omitted)")
+    parser.add_argument("--frames", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=torch.get_num_threads())
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames)
+    print(f"🧪 {len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}, {args.threads} threads")
+    print(f"{'model':<40}{'input':>7}{'int8':>6}{'batch':>7}{'FPS':>9}")
+    for model_name, input_size, quantize in CONFIGURATIONS:
+        detector = ObjectDetector(model_name, input_size=input_size, num_threads=args.threads,
+                                  quantize=quantize, device="cpu")
+        for batch_size in args.batch_sizes:
+            fps = benchmark(detector, frames, batch_size)
+            print(f"{model_name:<40}{str(input_size or 'auto'):>7}{'yes' if quantize else 'no':>6}{batch_size:>7}{fps:>9.2f}")
@@ -0,0 +1,69 @@
+import time
+
+import cv2
+
+from face_auth import FaceAuthenticator, FaceEnrollmentStore
+
+# name -> FaceAuthenticator options; "baseline" matches the original full-frame, every-frame loop
+CONFIGURATIONS = {
+    "baseline": dict(scale=1.0, every_n_frames=1, change_gate=False),
+    "downscaled": dict(scale=0.25, every_n_frames=1, change_gate=False),
+    "downscaled+every3": dict(scale=0.25, every_n_frames=3, change_gate=False),
+    "downscaled+every3+gate": dict(scale=0.25, every_n_frames=3, change_gate=True),
+}
+
+
+def load_clip(path):
+    capture = cv2.VideoCapture(path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    frames = []
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames, fps
+
+
+def time_to_unlock(authenticator, frames, fps):
+    """
+    Replay a clip as a live camera: frames arrive at fps and the authenticator
+    always takes the newest one once it is free.
+    :return: (seconds from clip start to unlock or None, frames processed, mean ms per frame)
+    """
+    authenticator.reset()
+    clock = 0.0
+    processed = 0
+    busy = 0.0
+    while True:
+        index = int(clock * fps)
+        if index >= len(frames):
+            return None, processed, 1000 * busy / max(processed, 1)
+        started = time.perf_counter()
+        faces = authenticator.process(frames[index])
+        elapsed = time.perf_counter() - started
+        processed += 1
+        busy += elapsed
+        clock = max(clock + elapsed, (index + 1) / fps)
+        if any(name for name, _, _ in faces):
+            return clock, processed, 1000 * busy / processed
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Face unlock time-to-unlock on recorded clips")
+    parser.add_argument("clips", nargs="+", help="Video files of an enrolled user walking up to the camera")
+    parser.add_argument("--store", default="./face_db/encodings.npz", help="Enrollment store to match against")
+    args = parser.parse_args()
+
+    store = FaceEnrollmentStore(args.store)
+    print(f"👥 Matching against {len(store.users)} user(s), {len(store)} encodings")
+    print(f"{'clip':<28}{'configuration':<26}{'unlock s':>10}{'frames':>8}{'ms/frame':>10}")
+    for clip in args.clips:
+        frames, fps = load_clip(clip)
+        for name, options in CONFIGURATIONS.items():
+            unlocked, processed, mean_ms = time_to_unlock(FaceAuthenticator(store, **options), frames, fps)
+            unlocked = f"{unlocked:.2f}" if unlocked is not None else "denied"
+            print(f"{clip[-27:]:<28}{name:<26}{unlocked:>10}{processed:>8}{mean_ms:>10.1f}")
@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+import open3d as o3d
+
+from reconstruct_3d import Reconstruct3D
+
+RESOLUTIONS = [(160, 120), (320, 240), (640, 480), (1280, 720)]
+
+
+def legacy_generate_point_cloud(depth_map, img, focal_length=800):
+    """The original per-pixel Python loop, kept as the baseline"""
+    h, w = depth_map.shape
+    fx = fy = focal_length
+    cx, cy = w // 2, h // 2
+
+    points = []
+    colors = []
+
+    for v in range(h):
+        for u in range(w):
+            depth = depth_map[v, u]
+            if depth > 0:
+                x = (u - cx) * depth / fx
+                y = (v - cy) * depth / fy
+                z = depth
+                points.append((x, y, z))
+                colors.append(img[v, u] / 255.0)
+
+    point_cloud = o3d.geometry.PointCloud()
+    point_cloud.points = o3d.utility.Vector3dVector(np.array(points))
+    point_cloud.colors = o3d.utility.Vector3dVector(np.array(colors))
+    return point_cloud
+
+
+def timed(fn, repeat=1):
+    """Best wall time of fn over repeat runs, and its last result"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Point cloud generation: per-pixel loop vs vectorized")
+    parser.add_argument("--skip-legacy-above", type=int, default=640 * 480,
+                        help="Only run the slow loop up to this many pixels")
+    parser.add_argument("--voxel-size", type=float, default=2.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    reconstructor = Reconstruct3D()
+    print(f"{'resolution':<12}{'points':>9}{'loop s':>9}{'vec ms':>9}{'f32 ms':>9}{'voxel ms':>10}{'speedup':>9}")
+    for w, h in RESOLUTIONS:
+        depth_map = rng.integers(0, 256, size=(h, w), dtype=np.uint8)
+        img = rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+
+        reconstructor.generate_point_cloud(depth_map, img)  # fill the pixel grid cache
+        vectorized, cloud = timed(lambda: reconstructor.generate_point_cloud(depth_map, img), repeat=5)
+        float32, _ = timed(lambda: reconstructor.generate_point_cloud(depth_map, img, dtype=np.float32), repeat=5)
+        voxel, _ = timed(lambda: reconstructor.generate_point_cloud(depth_map, img, voxel_size=args.voxel_size),
+                         repeat=5)
+
+        if w * h <= args.skip_legacy_above:
+            # int32 depth: under NumPy 2 the loop's uint8 scalar arithmetic overflows
+            legacy, legacy_cloud = timed(lambda: legacy_generate_point_cloud(depth_map.astype(np.int32), img))
+            assert np.allclose(np.asarray(cloud.points), np.asarray(legacy_cloud.points))
+            assert np.allclose(np.asarray(cloud.colors), np.asarray(legacy_cloud.colors))
+            legacy_s, speedup = f"{legacy:.2f}", f"{legacy / vectorized:.0f}x"
+        else:
+            legacy_s = speedup = "-"
+        print(f"{w}x{h:<8}{len(cloud.points):>9}{legacy_s:>9}{1000 * vectorized:>9.1f}{1000 * float32:>9.1f}"
+              f"{1000 * voxel:>10.1f}{speedup:>9}")
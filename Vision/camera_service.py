@@ -0,0 +1,265 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+SHARED_IDLE_TIMEOUT = 5.0  # Seconds a shared camera stays open without subscribers
+
+
+class FrameSubscription:
+    """A consumer's view of a CameraService: iterate to get the newest frame not seen yet."""
+
+    def __init__(self, service, timeout=2.0):
+        self.service = service
+        self.timeout = timeout
+        self.last_seq = -1
+        self.dropped = 0  # frames produced but never seen by this consumer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            frame = self.next()
+            if frame is None:
+                return
+            yield frame
+
+    def next(self, timeout=None):
+        """Block until a newer frame is available, return None when the stream ended or timed out"""
+        return self.service.next_frame(self, self.timeout if timeout is None else timeout)
+
+    def close(self):
+        self.service.unsubscribe(self)
+
+
+class CameraService:
+    """Owns one capture device and reads it on a dedicated producer thread.
+
+    Frames go into a small ring buffer (oldest dropped first) and are handed
+    to every subscriber as the same read-only array, so fan-out costs no
+    copies; consumers that draw on a frame must ``.copy()`` it first.
+
+    Live cameras always serve the newest frame. Video files and synthetic
+    sources read with ``realtime=False`` are lossless instead: the producer
+    waits for the slowest subscriber so recorded clips are analysed frame by
+    frame.
+
+    ``source`` can be a camera index, a video file path, or a callable
+    ``source(index)`` returning a frame (or None to end) for synthetic tests.
+    """
+
+    def __init__(self, source=0, buffer_size=4, realtime=True, loop=False, width=None, height=None,
+                 idle_timeout=None):
+        """
+        :param source: Camera index, video file path or frame-producing callable
+        :param buffer_size: Number of recent frames kept in the ring buffer
+        :param realtime: Pace video files/synthetic sources at their frame rate instead of as fast as possible
+        :param loop: Restart video files from the beginning when they end
+        :param width: Requested capture width (cameras only)
+        :param height: Requested capture height (cameras only)
+        :param idle_timeout: Release the device after this many seconds without subscribers (None keeps it open)
+        """
+        self.source = source
+        self.buffer_size = buffer_size
+        self.realtime = realtime
+        self.loop = loop
+        self.width = width
+        self.height = height
+        self.idle_timeout = idle_timeout
+        self.lossless = not realtime and not isinstance(source, int)
+        self.fps = None
+
+        self._frames = deque(maxlen=buffer_size)
+        self._seq = -1
+        self._condition = threading.Condition()
+        self._subscribers = set()
+        self._idle_since = None
+        self._thread = None
+        self._running = False
+        self._ended = False
+        self.frames_read = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def running(self):
+        return self._running
+
+    def _open(self):
+        if callable(self.source):
+            self.fps = 30.0
+            return None
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            raise RuntimeError(f"Could not open video source {self.source!r}")
+        if isinstance(self.source, int):
+            if self.width:
+                capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            if self.height:
+                capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        return capture
+
+    def start(self):
+        """Open the source and start the producer thread (no-op if already running)"""
+        while True:
+            with self._condition:
+                if self._running:
+                    return
+                previous = self._thread
+                if previous is None or not previous.is_alive() or previous is threading.current_thread():
+                    capture = self._open()
+                    self._running = True
+                    self._ended = False
+                    self._idle_since = None
+                    self._frames.clear()  # Never serve a frame from before the device was reopened
+                    self._thread = threading.Thread(target=self._produce, args=(capture,), name="camera",
+                                                    daemon=True)
+                    self._thread.start()
+                    return
+            # A producer that just idle-stopped still holds the device until its finally releases it
+            previous.join()
+
+    def stop(self):
+        """Stop the producer thread and release the device"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def _read(self, capture, index):
+        if capture is None:
+            frame = self.source(index)
+            return frame is not None, frame
+        ok, frame = capture.read()
+        if not ok and self.loop and not isinstance(self.source, int):
+            capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = capture.read()
+        return ok, frame
+
+    def _produce(self, capture):
+        paced = self.realtime and not isinstance(self.source, int)
+        interval = 1.0 / self.fps if paced and self.fps else 0.0
+        next_due = time.monotonic()
+        index = 0
+        try:
+            while self._running:
+                ok, frame = self._read(capture, index)
+                if not ok:
+                    break
+                frame.setflags(write=False)
+                index += 1
+                with self._condition:
+                    if self.lossless:
+                        # Never overwrite a frame a subscriber has not seen yet
+                        while self._running and self._subscribers and \
+                                min(s.last_seq for s in self._subscribers) <= self._seq - self.buffer_size:
+                            self._condition.wait(0.1)
+                    self._seq += 1
+                    self._frames.append((self._seq, frame))
+                    self.frames_read += 1
+                    self._condition.notify_all()
+                    if self._should_idle_stop():
+                        break
+                if interval:
+                    next_due += interval
+                    delay = next_due - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+        finally:
+            if capture is not None:
+                capture.release()
+            with self._condition:
+                if self._thread is threading.current_thread():  # A later start() may already run a new producer
+                    self._running = False
+                    self._ended = True
+                self._condition.notify_all()
+
+    def _should_idle_stop(self):
+        """Called with the condition held; marks the service stopped so the next subscribe() reopens it"""
+        if self.idle_timeout is None or self._subscribers:
+            return False
+        if self._idle_since is None:
+            self._idle_since = time.monotonic()
+        if time.monotonic() - self._idle_since <= self.idle_timeout:
+            return False
+        self._running = False
+        return True
+
+    def subscribe(self, timeout=2.0):
+        """Register a consumer, starting the device if needed"""
+        subscription = FrameSubscription(self, timeout)
+        with self._condition:
+            self._subscribers.add(subscription)
+            self._idle_since = None
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._condition:
+            self._subscribers.discard(subscription)
+            if not self._subscribers:
+                self._idle_since = time.monotonic()
+
+    def latest(self):
+        """Return (seq, frame) of the newest frame, or None if nothing was read yet"""
+        with self._condition:
+            return self._frames[-1] if self._frames else None
+
+    def wait_for_frame(self, after_seq, timeout=2.0):
+        """Return the newest (seq, frame) with seq > after_seq (the next one in lossless mode), or None"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not self._frames or self._frames[-1][0] <= after_seq:
+                remaining = deadline - time.monotonic()
+                if self._ended or not self._running or remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+            if self.lossless:
+                for item in self._frames:
+                    if item[0] > after_seq:
+                        return item
+            return self._frames[-1]
+
+    def next_frame(self, subscription, timeout=2.0):
+        """Advance a subscription to its next frame and record what it skipped"""
+        item = self.wait_for_frame(subscription.last_seq, timeout)
+        if item is None:
+            return None
+        seq, frame = item
+        with self._condition:
+            if subscription.last_seq >= 0:
+                subscription.dropped += seq - subscription.last_seq - 1
+            subscription.last_seq = seq
+            self._condition.notify_all()
+        return frame
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def get_camera(source=0, **options):
+    """
+    Return the process-wide CameraService for a source, creating it on first use.
+    The device is released after SHARED_IDLE_TIMEOUT seconds without subscribers and reopened on the next
+    subscribe(), unless an idle_timeout option says otherwise.
+    """
+    options.setdefault("idle_timeout", SHARED_IDLE_TIMEOUT)
+    with _shared_lock:
+        service = _shared.get(source)
+        if service is None:
+            service = _shared[source] = CameraService(source, **options)
+        return service
@@ -0,0 +1,197 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class ChangeDetector:
+    """Cheap scene-change test on a small grayscale thumbnail of each frame.
+
+    ``method="diff"`` compares mean absolute pixel difference of the
+    thumbnails, ``method="dhash"`` compares the Hamming distance of their
+    difference hashes (more tolerant to lighting flicker and sensor noise).
+    """
+
+    def __init__(self, method="diff", size=(64, 48), threshold=None, hash_size=8):
+        """
+        :param method: "diff" or "dhash"
+        :param size: Thumbnail (width, height) the frames are reduced to
+        :param threshold: Distance above which a frame counts as changed
+                          (defaults to 4.0 grey levels for diff, 4 bits for dhash)
+        :param hash_size: dHash grid size, the hash has hash_size² bits
+        """
+        if method not in ("diff", "dhash"):
+            raise ValueError(f"Unknown change detection method '{method}'")
+        self.method = method
+        self.size = size
+        self.threshold = threshold if threshold is not None else (4.0 if method == "diff" else 4)
+        self.hash_size = hash_size
+        self._window = cv2.createHanningWindow(size, cv2.CV_32F)
+
+    def thumbnail(self, frame):
+        """Downscaled float32 grayscale copy of a BGR (or gray) frame"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def dhash(self, thumbnail):
+        small = cv2.resize(thumbnail, (self.hash_size + 1, self.hash_size), interpolation=cv2.INTER_AREA)
+        return small[:, 1:] > small[:, :-1]
+
+    def distance(self, reference, thumbnail):
+        if self.method == "dhash":
+            return int(np.count_nonzero(self.dhash(reference) != self.dhash(thumbnail)))
+        return float(cv2.absdiff(reference, thumbnail).mean())
+
+    def changed(self, reference, thumbnail):
+        return self.distance(reference, thumbnail) > self.threshold
+
+    def estimate_shift(self, reference, thumbnail, min_response=0.2):
+        """
+        Global translation of thumbnail relative to reference, in thumbnail pixels.
+        :return: (dx, dy), or None if the change is not explained by a camera/scene shift
+        """
+        # phaseCorrelate applies the window to its inputs in place, keep the cached reference intact
+        (dx, dy), response = cv2.phaseCorrelate(reference.copy(), thumbnail.copy(), self._window)
+        if response < min_response:
+            return None
+        shifted = cv2.warpAffine(reference, np.float32([[1, 0, dx], [0, 1, dy]]), self.size,
+                                 borderMode=cv2.BORDER_REPLICATE)
+        if self.changed(shifted, thumbnail):
+            return None
+        return dx, dy
+
+
+def shift_detections(detections, dx, dy):
+    """Tracker for (label, score, box) detections: move every box by (dx, dy) frame pixels"""
+    offset = np.array([dx, dy, dx, dy])
+    return [(label, score, (np.asarray(box) + offset).round().astype(np.int64))
+            for label, score, box in detections]
+
+
+class ChangeGate:
+    """Wraps an expensive per-frame function and only calls it when the scene changed.
+
+    The last full result is kept with the thumbnail of the frame it came from.
+    New frames close to that reference reuse the result; frames that differ by
+    a global shift are passed to ``tracker`` to move the previous result (e.g.
+    bounding boxes) instead of re-running the model. A full inference is
+    forced after ``max_reuse`` consecutive skips so slow drift is not missed.
+    """
+
+    def __init__(self, fn, detector=None, tracker=None, max_reuse=60, name=None, reusable=None):
+        """
+        :param fn: Callable taking a frame and returning a result
+        :param detector: ChangeDetector (defaults to the thumbnail diff)
+        :param tracker: Optional callable (result, dx, dy) -> result for shifted frames
+        :param max_reuse: Consecutive reused/tracked frames before a forced full inference
+        :param name: Label used in printed metrics
+        :param reusable: Optional predicate on a result; results it rejects are recomputed on the next call
+        """
+        self.fn = fn
+        self.detector = detector or ChangeDetector()
+        self.tracker = tracker
+        self.max_reuse = max_reuse
+        self.name = name or getattr(fn, "__name__", "gate")
+        self.reusable = reusable
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget the reference frame and metrics"""
+        with self._lock:
+            self._reference = None
+            self._result = None
+            self._reused_in_row = 0
+            self.frames = 0
+            self.inferences = 0
+            self.reused = 0
+            self.tracked = 0
+            self.inference_time = 0.0
+            self.gate_time = 0.0
+
+    def __call__(self, frame):
+        started = time.perf_counter()
+        thumbnail = self.detector.thumbnail(frame)
+        result = self._reuse(frame, thumbnail)
+        gate_done = time.perf_counter()
+        with self._lock:
+            self.frames += 1
+            self.gate_time += gate_done - started
+        if result is not None:
+            return result[0]
+
+        result = self.fn(frame)
+        with self._lock:
+            self.inferences += 1
+            self.inference_time += time.perf_counter() - gate_done
+            self._reference = thumbnail
+            self._result = result
+            self._reused_in_row = 0
+        return result
+
+    def track(self, frame):
+        """Previous result carried over to this frame without ever running fn (None before the first run)"""
+        started = time.perf_counter()
+        with self._lock:
+            self.frames += 1
+            if self._reference is None:
+                return None
+        result = self._reuse(frame, self.detector.thumbnail(frame), force=True)
+        with self._lock:
+            self.gate_time += time.perf_counter() - started
+            if result is None:
+                self.reused += 1
+                return self._result
+        return result[0]
+
+    def _reuse(self, frame, thumbnail, force=False):
+        """Return (result,) when the previous result can stand in for this frame, else None"""
+        with self._lock:
+            reference, result = self._reference, self._result
+            if reference is None or (self._reused_in_row >= self.max_reuse and not force):
+                return None
+            if not force and self.reusable is not None and not self.reusable(result):
+                return None
+        if not self.detector.changed(reference, thumbnail):
+            with self._lock:
+                self.reused += 1
+                self._reused_in_row += 1
+            return (result,)
+        if self.tracker is None:
+            return None
+        shift = self.detector.estimate_shift(reference, thumbnail)
+        if shift is None:
+            return None
+        # Thumbnail pixels -> frame pixels
+        dx = shift[0] * frame.shape[1] / self.detector.size[0]
+        dy = shift[1] * frame.shape[0] / self.detector.size[1]
+        with self._lock:
+            self.tracked += 1
+            self._reused_in_row += 1
+        return (self.tracker(result, dx, dy),)
+
+    def stats(self):
+        """Skip ratio and estimated CPU time saved versus running fn on every frame"""
+        with self._lock:
+            skipped = self.reused + self.tracked
+            mean_inference = self.inference_time / self.inferences if self.inferences else 0.0
+            ungated = mean_inference * self.frames
+            spent = self.inference_time + self.gate_time
+            return {
+                "frames": self.frames,
+                "inferences": self.inferences,
+                "reused": self.reused,
+                "tracked": self.tracked,
+                "skip_ratio": skipped / self.frames if self.frames else 0.0,
+                "mean_inference_ms": 1000 * mean_inference,
+                "mean_gate_ms": 1000 * self.gate_time / self.frames if self.frames else 0.0,
+                "cpu_saved_s": ungated - spent,
+                "cpu_saved_ratio": 1 - spent / ungated if ungated else 0.0,
+            }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"   🚦 {self.name:<10} {stats['inferences']}/{stats['frames']} frames inferred, "
+              f"skip ratio {stats['skip_ratio']:.0%} (tracked {stats['tracked']}), "
+              f"~{stats['cpu_saved_s']:.1f}s CPU saved ({stats['cpu_saved_ratio']:.0%})")
@@ -1,135 +1,181 @@
 import cv2
-import pytesseract
 from pyzbar.pyzbar import decode
-import torch
-import torchvision.transforms as transforms
-from torchvision import models
+from camera_service import get_camera
+from change_gate import ChangeDetector, ChangeGate, shift_detections
+from object_detector import ObjectDetector
+from ocr_pipeline import OCRPipeline
+from realtime_engine import Analyzer, RealTimeVisionEngine
 
 class ComputerVision:
-    def __init__(self):
-        """Initialize Computer Vision functionalities"""
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-
-        # Load Object Detection Model (Faster R-CNN)
-        self.model = models.detection.fasterrcnn_resnet50_fpn(pretrained=True)
-        self.model.to(self.device)
-        self.model.eval()
-
-        # Label Mapping for COCO Dataset (Common Objects in Context)
-        self.labels = {i: label for i, label in enumerate([
-            '__background__', 'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train',
-            'truck', 'boat', 'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench',
-            'bird', 'cat', 'dog', 'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe',
-            'backpack', 'umbrella', 'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard',
-            'sports ball', 'kite', 'baseball bat', 'baseball glove', 'skateboard', 'surfboard',
-            'tennis racket', 'bottle', 'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana',
-            'apple', 'sandwich', 'orange', 'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake',
-            'chair', 'couch', 'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse',
-            'remote', 'keyboard', 'cell phone', 'microwave', 'oven', 'toaster', 'sink', 'refrigerator',
-            'book', 'clock', 'vase', 'scissors', 'teddy bear', 'hair drier', 'toothbrush'
-        ])}
+    def __init__(self, camera=None, detector_options=None, change_gate=True, ocr_options=None, detector=None,
+                 ocr=None, display=True):
+        """
+        Initialize Computer Vision functionalities
+        :param camera: CameraService to read frames from (defaults to the shared webcam service)
+        :param detector_options: Keyword arguments for ObjectDetector (model_name, input_size, num_threads, quantize)
+        :param change_gate: Skip OCR/detection/barcode work on unchanged frames in live loops
+                            (True, False, or a dict of ChangeDetector options such as method/threshold)
+        :param ocr_options: Keyword arguments for OCRPipeline (detector, workers, use_processes, lang)
+        :param detector: Ready detector to use instead of building an ObjectDetector (e.g. a benchmark stand-in)
+        :param ocr: Ready OCR pipeline to use instead of building an OCRPipeline
+        :param display: Default for the live loops' preview windows, False runs them headless
+        """
+        self.camera = camera or get_camera(0)
+        self.change_gate = change_gate
+        self.display = display
+        self.gates = {}
+        # Object detection model (Faster R-CNN by default, lighter backbones via detector_options)
+        self.detector = detector or ObjectDetector(**(detector_options or {}))
+        self.labels = self.detector.labels  # COCO (Common Objects in Context) label mapping
+        # Text-region OCR, its worker pool starts on first use
+        self.ocr = ocr or OCRPipeline(**(ocr_options or {}))
+
+    def close(self):
+        """Stop the OCR worker pool"""
+        self.ocr.close()
+
+    def gated(self, name, fn, tracker=None):
+        """Return the named ChangeGate around fn (or fn itself when gating is disabled)"""
+        if not self.change_gate:
+            return fn
+        if name not in self.gates:
+            options = self.change_gate if isinstance(self.change_gate, dict) else {}
+            self.gates[name] = ChangeGate(fn, ChangeDetector(**options), tracker=tracker, name=name)
+        return self.gates[name]
+
+    def print_gate_stats(self):
+        for gate in self.gates.values():
+            gate.print_stats()
 
     def extract_text_from_image(self, image_path):
         """Extract text from an image using OCR"""
         image = cv2.imread(image_path)
-        return pytesseract.image_to_string(image)
-
-    def extract_text_from_camera(self):
-        """Extract text from live camera feed"""
-        cap = cv2.VideoCapture(0)
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            text = pytesseract.image_to_string(frame)
-            cv2.imshow("OCR Live", frame)
-
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                break
-
-        cap.release()
-        cv2.destroyAllWindows()
+        return self.ocr.read(image)
+
+    def extract_text_from_camera(self, display=None, cancelled=None):
+        """
+        Extract text from live camera feed
+        :param display: Show the feed in a window ("q" stops), None uses self.display
+        :param cancelled: Optional threading.Event checked every frame, the scan stops once it is set
+        """
+        display = self.display if display is None else display
+        text = ""
+        ocr = self.gated("ocr", self.ocr.read)
+        with self.camera.subscribe() as frames:
+            for frame in frames:
+                if cancelled is not None and cancelled.is_set():
+                    break
+                text = ocr(frame)
+                if display:
+                    cv2.imshow("OCR Live", frame)
+                    if cv2.waitKey(1) & 0xFF == ord("q"):
+                        break
+
+        if display:
+            cv2.destroyAllWindows()
         return text
 
-    def scan_barcode(self):
-        """Scan a QR code or Barcode from live camera"""
-        cap = cv2.VideoCapture(0)
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            decoded_objects = decode(frame)
-            for obj in decoded_objects:
-                cap.release()
-                cv2.destroyAllWindows()
-                return obj.data.decode("utf-8")  # Return barcode data
-
-            cv2.imshow("Barcode Scanner", frame)
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                break
-
-        cap.release()
-        cv2.destroyAllWindows()
+    def decode_barcode(self, frame):
+        """Return the data of the first barcode/QR code in a frame, or None"""
+        for obj in decode(frame):
+            return obj.data.decode("utf-8")
         return None
 
-    def detect_objects(self):
-        """Detect objects from live camera feed"""
-        cap = cv2.VideoCapture(0)
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
+    def scan_barcode(self, display=None, cancelled=None):
+        """
+        Scan a QR code or Barcode from live camera
+        :param display: Show the feed in a window ("q" stops), None uses self.display
+        :param cancelled: Optional threading.Event checked every frame, the scan stops once it is set
+        """
+        display = self.display if display is None else display
+        data = None
+        decode_barcode = self.gated("barcode", self.decode_barcode)
+        with self.camera.subscribe() as frames:
+            for frame in frames:
+                if cancelled is not None and cancelled.is_set():
+                    break
+                data = decode_barcode(frame)
+                if data is not None:
+                    break  # Return barcode data
+
+                if display:
+                    cv2.imshow("Barcode Scanner", frame)
+                    if cv2.waitKey(1) & 0xFF == ord("q"):
+                        break
+
+        if display:
+            cv2.destroyAllWindows()
+        return data
+
+    def detect(self, frame):
+        """Run object detection on one frame, returns a list of (label, score, box)"""
+        return self.detector.detect(frame)
+
+    def draw_detections(self, frame, detections):
+        """Return a copy of the (read-only, shared) frame with bounding boxes drawn on it"""
+        frame = frame.copy()
+        for label, score, box in detections:
+            cv2.rectangle(frame, (box[0], box[1]), (box[2], box[3]), (0, 255, 0), 2)
+            cv2.putText(frame, label, (box[0], box[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+        return frame
+
+    def detect_objects(self, display=None, cancelled=None):
+        """
+        Detect objects from live camera feed
+        :param display: Show the annotated feed in a window ("q" stops), None uses self.display
+        :param cancelled: Optional threading.Event checked every frame, detection stops once it is set
+        """
+        display = self.display if display is None else display
+        detections = []
+        detect = self.gated("detect", self.detect, tracker=shift_detections)
+        with self.camera.subscribe() as frames:
+            for frame in frames:
+                if cancelled is not None and cancelled.is_set():
+                    break
+                detections = detect(frame)
+                if display:
+                    cv2.imshow("Object Detection", self.draw_detections(frame, detections))
+                    if cv2.waitKey(1) & 0xFF == ord("q"):
+                        break
+
+        if display:
+            cv2.destroyAllWindows()
+        return [label for label, _, _ in detections]
+
+    def build_realtime_engine(self, ocr_every=15, barcode_hz=5.0, detect_every=1):
+        """Real-time engine running detection, OCR and barcode decoding concurrently on shared frames"""
+        return RealTimeVisionEngine(self.camera, [
+            Analyzer("detect", self.gated("detect", self.detect, tracker=shift_detections),
+                     every_n_frames=detect_every),
+            Analyzer("ocr", self.gated("ocr", self.ocr.read), every_n_frames=ocr_every),
+            Analyzer("barcode", self.gated("barcode", self.decode_barcode), rate_hz=barcode_hz),
+        ])
+
+    def scan_real_time_environment(self, display=None, max_frames=None, cancelled=None):
+        """
+        Detect objects, recognize text, and scan barcodes in real-time
+        :param cancelled: Optional threading.Event checked every frame, the scan stops once it is set
+        """
+        display = self.display if display is None else display
+        engine = self.build_realtime_engine()
+        last_seen = {}
+
+        for record in engine.run(max_frames=max_frames):
+            if cancelled is not None and cancelled.is_set():
                 break
-
-            # Convert to Tensor
-            transform = transforms.Compose([transforms.ToPILImage(), transforms.ToTensor()])
-            img_tensor = transform(frame).to(self.device).unsqueeze(0)
-
-            # Detect Objects
-            with torch.no_grad():
-                preds = self.model(img_tensor)[0]
-
-            for i in range(len(preds["labels"])):
-                score = preds["scores"][i].item()
-                if score > 0.5:
-                    label = self.labels.get(preds["labels"][i].item(), "Unknown")
-                    box = preds["boxes"][i].cpu().numpy().astype(int)
-
-                    # Draw Bounding Box
-                    cv2.rectangle(frame, (box[0], box[1]), (box[2], box[3]), (0, 255, 0), 2)
-                    cv2.putText(frame, label, (box[0], box[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-
-            cv2.imshow("Object Detection", frame)
-
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                break
-
-        cap.release()
-        cv2.destroyAllWindows()
-
-    def scan_real_time_environment(self):
-        """Detect objects, recognize text, and scan barcodes in real-time"""
-        cap = cv2.VideoCapture(0)
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            text = pytesseract.image_to_string(frame)
-            barcode = self.scan_barcode()
-
-            print("📝 Text:", text)
-            print("📌 Barcode Data:", barcode)
-
-            self.detect_objects()  # Run object detection
-
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                break
-
-        cap.release()
-        cv2.destroyAllWindows()
+            for name, label in (("ocr", "📝 Text:"), ("barcode", "📌 Barcode Data:")):
+                value = record.results.get(name)
+                if name in record.fresh and value and value != last_seen.get(name):
+                    print(label, value)
+                    last_seen[name] = value
+
+            if display:
+                cv2.imshow("Real-Time Environment", self.draw_detections(record.frame, record.results.get("detect", [])))
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
+
+        if display:
+            cv2.destroyAllWindows()
+        engine.print_stats()
+        self.print_gate_stats()
+        return last_seen
@@ -0,0 +1,166 @@
+import os
+
+import cv2
+import face_recognition
+import numpy as np
+
+from change_gate import ChangeGate
+
+
+class FaceEnrollmentStore:
+    """Authorized users' 128-d face encodings, persisted as one NumPy array.
+
+    Every enrolled image adds a row to ``encodings`` and the user's name to
+    ``names``; a user may have several rows (glasses, lighting, angles).
+    """
+
+    def __init__(self, path="./face_db/encodings.npz"):
+        """
+        :param path: .npz file holding the encodings matrix and the matching names
+        """
+        self.path = path
+        self.encodings = np.empty((0, 128))
+        self.names = []
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.path):
+            with np.load(self.path, allow_pickle=False) as data:
+                self.encodings = data["encodings"]
+                self.names = data["names"].tolist()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, encodings=self.encodings, names=np.array(self.names, dtype=str))
+        os.replace(tmp_path, self.path)
+
+    @property
+    def users(self):
+        return sorted(set(self.names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, encodings):
+        """Store precomputed encodings for a user"""
+        encodings = np.atleast_2d(np.asarray(encodings, dtype=np.float64))
+        self.encodings = np.vstack([self.encodings, encodings])
+        self.names.extend([name] * len(encodings))
+        self.save()
+
+    def enroll(self, name, image_paths):
+        """Encode the (single) face in each image and store it for a user"""
+        encodings = []
+        for image_path in image_paths:
+            found = face_recognition.face_encodings(face_recognition.load_image_file(image_path))
+            if len(found) != 1:
+                print(f"⚠️ Skipping {image_path}: expected one face, found {len(found)}")
+                continue
+            encodings.append(found[0])
+        if encodings:
+            self.add(name, encodings)
+            print(f"👤 Enrolled {name} with {len(encodings)} image(s)")
+        return len(encodings)
+
+    def remove(self, name):
+        keep = [i for i, n in enumerate(self.names) if n != name]
+        self.encodings = self.encodings[keep]
+        self.names = [self.names[i] for i in keep]
+        self.save()
+
+    def match(self, encodings, tolerance=0.6):
+        """
+        Match face encodings against every enrolled one in a single distance computation.
+        :return: (name or None, distance) per encoding
+        """
+        if not len(encodings):
+            return []
+        if not len(self.names):
+            return [(None, float("inf"))] * len(encodings)
+        distances = np.linalg.norm(np.asarray(encodings)[:, None, :] - self.encodings[None, :, :], axis=2)
+        best = distances.argmin(axis=1)
+        best_distances = distances[np.arange(len(best)), best]
+        return [(self.names[i] if d <= tolerance else None, float(d)) for i, d in zip(best, best_distances)]
+
+
+def shift_faces(faces, dx, dy):
+    """Tracker for (name, distance, (top, right, bottom, left)) faces: move every box by (dx, dy) frame pixels"""
+    return [(name, distance, (round(top + dy), round(right + dx), round(bottom + dy), round(left + dx)))
+            for name, distance, (top, right, bottom, left) in faces]
+
+
+class FaceAuthenticator:
+    """Finds and identifies faces in a frame stream at a fraction of the full-frame cost.
+
+    Faces are located with HOG on a downscaled copy of the frame and encoded
+    on the full-resolution one. Only every Nth frame gets this full pass; the
+    frames in between carry the last faces over, shifted with the scene, and
+    unchanged scenes reuse the last match instead of re-encoding. A miss (no
+    face, or no authorized face) is never reused, so every due frame retries.
+    """
+
+    def __init__(self, store=None, scale=0.25, every_n_frames=3, upsample=1, model="hog", tolerance=0.6,
+                 change_gate=True):
+        """
+        :param store: FaceEnrollmentStore of authorized users
+        :param scale: Factor the frame is downscaled by for face detection
+        :param every_n_frames: Run detection and encoding on every Nth frame, track in between
+        :param upsample: face_locations upsampling of the downscaled frame (finds smaller faces)
+        :param model: face_locations model, "hog" (CPU) or "cnn"
+        :param tolerance: Maximum encoding distance for a match
+        :param change_gate: Reuse the last match while the scene is unchanged
+        """
+        self.store = store if store is not None else FaceEnrollmentStore()
+        self.scale = scale
+        self.every_n_frames = max(1, every_n_frames)
+        self.upsample = upsample
+        self.model = model
+        self.tolerance = tolerance
+        self.gate = ChangeGate(self.identify, tracker=shift_faces, name="face",
+                               max_reuse=60 if change_gate else 0, reusable=self.granted)
+        self.frame_index = 0
+
+    def identify(self, frame):
+        """Full pass: locate, encode and match every face in a BGR frame"""
+        rgb = np.ascontiguousarray(frame[:, :, ::-1])  # BGR -> RGB
+        small = rgb if self.scale == 1 else cv2.resize(rgb, None, fx=self.scale, fy=self.scale,
+                                                       interpolation=cv2.INTER_AREA)
+        locations = [tuple(round(v / self.scale) for v in location)
+                     for location in face_recognition.face_locations(small, self.upsample, self.model)]
+        encodings = face_recognition.face_encodings(rgb, locations)
+        return [(name, distance, location)
+                for (name, distance), location in zip(self.store.match(encodings, self.tolerance), locations)]
+
+    @staticmethod
+    def granted(faces):
+        """True when at least one face matched an authorized user"""
+        return any(name for name, _, _ in faces)
+
+    def process(self, frame):
+        """
+        Faces in the next frame of a stream.
+        :return: List of (name or None, distance, (top, right, bottom, left))
+        """
+        due = self.frame_index % self.every_n_frames == 0
+        self.frame_index += 1
+        if due:
+            return self.gate(frame)
+        return self.gate.track(frame) or []
+
+    def reset(self):
+        self.frame_index = 0
+        self.gate.reset()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python face_auth.py enroll NAME image.jpg [...] | remove NAME | list
+    store = FaceEnrollmentStore()
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "enroll":
+        store.enroll(sys.argv[2], sys.argv[3:])
+    elif command == "remove":
+        store.remove(sys.argv[2])
+    print(f"👥 {len(store.users)} user(s), {len(store)} encodings: {', '.join(store.users)}")
@@ -0,0 +1,324 @@
+import glob
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+class FrameFeatures:
+    """ORB keypoints/descriptors of one frame, its estimated pose and the map points its keypoints observe."""
+
+    def __init__(self, index, points, descriptors, colors):
+        self.index = index
+        self.points = points  # (N, 2) float32 keypoint positions
+        self.descriptors = descriptors
+        self.colors = colors  # (N, 3) RGB in [0, 1] sampled at the keypoints
+        self.point_ids = np.full(len(points), -1, dtype=np.int64)  # map point of every keypoint, -1 if none
+        self.R = None
+        self.t = None
+
+    @property
+    def projection(self):
+        return np.hstack([self.R, self.t])
+
+
+class IncrementalReconstructor:
+    """Sparse multi-view reconstruction that grows one global point cloud frame by frame.
+
+    Features are extracted once per frame (on a thread pool, OpenCV releases
+    the GIL) and cached. Each new frame is matched only against the previous
+    frame and the last keyframe, never against all earlier frames. The first
+    pair is initialised from the essential matrix; later frames are
+    localised with PnP on map points they re-observe, and new points are
+    triangulated against the keyframe (wider baseline) and fused into the
+    global model immediately.
+    """
+
+    def __init__(self, focal_length=800, matcher=None, n_features=2000, keyframe_interval=5,
+                 min_matches=40, min_parallax_deg=1.0, init_parallax_deg=4.0, max_reprojection_error=2.0,
+                 workers=None):
+        """
+        :param focal_length: Focal length in pixels, the optical center is the image center
+        :param matcher: Descriptor matcher (defaults to a cross-checked Hamming BFMatcher)
+        :param n_features: ORB features per frame
+        :param keyframe_interval: Promote a frame to keyframe at least every this many accepted frames
+        :param min_matches: Matches/correspondences needed to estimate a pose
+        :param min_parallax_deg: Minimum viewing-angle difference for a triangulated point
+        :param init_parallax_deg: Minimum viewing-angle difference of the points the initial map is built from
+                                  (small-baseline initialisations distort the whole model)
+        :param max_reprojection_error: Pixels a triangulated point may miss its observations by
+        :param workers: Feature extraction threads (defaults to the CPU count)
+        """
+        self.focal_length = focal_length
+        self.matcher = matcher or cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+        self.n_features = n_features
+        self.keyframe_interval = keyframe_interval
+        self.min_matches = min_matches
+        self.min_parallax = np.deg2rad(min_parallax_deg)
+        self.init_parallax = np.deg2rad(init_parallax_deg)
+        self.max_reprojection_error = max_reprojection_error
+        self.workers = workers or os.cpu_count() or 1
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+
+        self.K = None
+        self.frames = []  # accepted frames, in order
+        self.keyframe = None
+        self._since_keyframe = 0
+        self.map_points = np.empty((0, 3))
+        self.map_colors = np.empty((0, 3))
+        self.stats = {"frames": 0, "accepted": 0, "rejected": 0, "keyframes": 0,
+                      "extract_s": 0.0, "update_s": 0.0}
+
+    # Features
+
+    def extract(self, index, image):
+        """Detect and describe ORB features of a BGR image (thread-safe, one ORB per thread)"""
+        orb = getattr(self._local, "orb", None)
+        if orb is None:
+            orb = self._local.orb = cv2.ORB_create(self.n_features)
+        started = time.perf_counter()
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        keypoints, descriptors = orb.detectAndCompute(gray, None)
+        points = np.array([kp.pt for kp in keypoints], dtype=np.float32).reshape(-1, 2)
+        pixels = np.round(points).astype(np.int64)
+        pixels[:, 0] = pixels[:, 0].clip(0, image.shape[1] - 1)
+        pixels[:, 1] = pixels[:, 1].clip(0, image.shape[0] - 1)
+        colors = image[pixels[:, 1], pixels[:, 0], ::-1] / 255.0  # BGR -> RGB
+        with self._stats_lock:
+            self.stats["extract_s"] += time.perf_counter() - started
+        return FrameFeatures(index, points, descriptors, colors)
+
+    def match(self, a, b):
+        """Matched keypoint indices (ia, ib) between two frames"""
+        if a.descriptors is None or b.descriptors is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        matches = self.matcher.match(a.descriptors, b.descriptors)
+        ia = np.array([m.queryIdx for m in matches], dtype=np.int64)
+        ib = np.array([m.trainIdx for m in matches], dtype=np.int64)
+        return ia, ib
+
+    # Geometry
+
+    def _initialize(self, first, second, ia, ib):
+        """Relative pose of the first pair from the essential matrix; the first frame is the world origin"""
+        E, inliers = cv2.findEssentialMat(first.points[ia], second.points[ib], self.K, cv2.RANSAC, 0.999, 1.0)
+        if E is None or E.shape != (3, 3):
+            return False
+        count, R, t, inliers = cv2.recoverPose(E, first.points[ia], second.points[ib], self.K, mask=inliers)
+        if count < self.min_matches:
+            return False
+        first.R, first.t = np.eye(3), np.zeros((3, 1))
+        second.R, second.t = R, t
+        return True
+
+    def _localize(self, frame, references):
+        """Pose of frame from the map points its matches to the reference frames observe (PnP)"""
+        object_points, image_points, keypoints, seen = [], [], [], set()
+        for reference, (ir, i_frame) in references:
+            for point_id, keypoint in zip(reference.point_ids[ir], i_frame):
+                if point_id >= 0 and keypoint not in seen:
+                    seen.add(keypoint)
+                    object_points.append(self.map_points[point_id])
+                    image_points.append(frame.points[keypoint])
+                    keypoints.append((keypoint, point_id))
+        if len(object_points) < self.min_matches:
+            return False
+        object_points, image_points = np.array(object_points), np.array(image_points, dtype=np.float64)
+        ok, rvec, tvec, inliers = cv2.solvePnPRansac(object_points, image_points, self.K, None,
+                                                     reprojectionError=self.max_reprojection_error * 2)
+        if not ok or inliers is None or len(inliers) < self.min_matches // 2:
+            return False
+        inliers = inliers.ravel()
+        rvec, tvec = cv2.solvePnPRefineLM(object_points[inliers], image_points[inliers], self.K, None, rvec, tvec)
+        frame.R, frame.t = cv2.Rodrigues(rvec)[0], tvec
+        for i in inliers:
+            keypoint, point_id = keypoints[i]
+            frame.point_ids[keypoint] = point_id
+        return True
+
+    def _triangulate(self, a, b, ia, ib, min_parallax=None):
+        """Triangulate matches not yet in the map, keep well-conditioned points and fuse them"""
+        new = (a.point_ids[ia] < 0) & (b.point_ids[ib] < 0)
+        ia, ib = ia[new], ib[new]
+        if not len(ia):
+            return 0
+        homogeneous = cv2.triangulatePoints(self.K @ a.projection, self.K @ b.projection,
+                                            a.points[ia].T.astype(np.float64), b.points[ib].T.astype(np.float64))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            points = (homogeneous[:3] / homogeneous[3]).T
+
+        keep = np.isfinite(points).all(axis=1)
+        rays = []
+        for frame, idx in ((a, ia), (b, ib)):
+            camera = points @ frame.R.T + frame.t.ravel()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                projected = camera @ self.K.T
+                projected = projected[:, :2] / projected[:, 2:3]
+            error = np.linalg.norm(projected - frame.points[idx], axis=1)
+            keep &= (camera[:, 2] > 0) & (error < self.max_reprojection_error)
+            center = -frame.R.T @ frame.t.ravel()
+            rays.append(points - center)
+        cos_angle = np.einsum("ij,ij->i", rays[0], rays[1]) / (
+            np.linalg.norm(rays[0], axis=1) * np.linalg.norm(rays[1], axis=1) + 1e-12)
+        keep &= cos_angle < np.cos(self.min_parallax if min_parallax is None else min_parallax)
+
+        points, ia, ib = points[keep], ia[keep], ib[keep]
+        ids = np.arange(len(self.map_points), len(self.map_points) + len(points))
+        a.point_ids[ia] = ids
+        b.point_ids[ib] = ids
+        self.map_points = np.vstack([self.map_points, points])
+        self.map_colors = np.vstack([self.map_colors, b.colors[ib]])
+        return len(points)
+
+    # Incremental update
+
+    def add(self, features, image_shape):
+        """
+        Integrate one frame's features into the model.
+        :return: Number of new map points, or None if the frame could not be registered
+        """
+        started = time.perf_counter()
+        self.stats["frames"] += 1
+        if self.K is None:
+            h, w = image_shape[:2]
+            self.K = np.array([[self.focal_length, 0, w / 2], [0, self.focal_length, h / 2], [0, 0, 1]])
+
+        try:
+            if self.keyframe is None:
+                self.keyframe = features
+                self.stats["keyframes"] += 1
+                return 0
+
+            previous = self.frames[-1] if self.frames else None
+            references = [(self.keyframe, self.match(self.keyframe, features))]
+            if previous is not None and previous is not self.keyframe:
+                references.append((previous, self.match(previous, features)))
+
+            if previous is None:
+                return self._bootstrap(features, *references[0][1])
+            if not self._localize(features, references):
+                self.stats["rejected"] += 1
+                return None
+
+            added = sum(self._triangulate(reference, features, *matches) for reference, matches in references)
+            self.frames.append(features)
+            self.stats["accepted"] += 1
+            self._since_keyframe += 1
+
+            # New keyframe on schedule or when the view has drifted away from the current one
+            keyframe_matches = len(references[0][1][0])
+            if self._since_keyframe >= self.keyframe_interval or keyframe_matches < 3 * self.min_matches:
+                self.keyframe = features
+                self._since_keyframe = 0
+                self.stats["keyframes"] += 1
+            return added
+        finally:
+            self.stats["update_s"] += time.perf_counter() - started
+
+    def _bootstrap(self, features, ia, ib):
+        """Build the initial map from the first keyframe and a frame with enough baseline to it"""
+        if len(ia) < self.min_matches:
+            # Lost the first keyframe's view, restart initialisation from this frame
+            self.keyframe = features
+            self.stats["rejected"] += 1
+            return None
+        if self._initialize(self.keyframe, features, ia, ib):
+            added = self._triangulate(self.keyframe, features, ia, ib, self.init_parallax)
+            if added >= self.min_matches:
+                self.frames.extend([self.keyframe, features])
+                self.stats["accepted"] += 1
+                self.keyframe = features
+                self.stats["keyframes"] += 1
+                return added
+            # Too little parallax so far: undo and wait for more camera motion
+            self.keyframe.point_ids[:] = -1
+            features.point_ids[:] = -1
+            self.map_points = np.empty((0, 3))
+            self.map_colors = np.empty((0, 3))
+        self.stats["rejected"] += 1
+        return None
+
+    def run(self, images, lookahead=None, on_update=None, cancelled=None):
+        """
+        Reconstruct from an iterable of BGR images (a list, a directory reader or a live feed).
+        Feature extraction for upcoming images runs in parallel while earlier ones are integrated.
+        :param on_update: Optional callable(index, added_points, reconstructor) after every frame
+        :param cancelled: Optional threading.Event checked every image; once set the frames integrated
+                          so far are kept and the ones still in extraction are dropped
+        """
+        lookahead = lookahead or 2 * self.workers
+        pending = deque()
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="orb") as executor:
+            def integrate():
+                index, shape, future = pending.popleft()
+                added = self.add(future.result(), shape)
+                if on_update:
+                    on_update(index, added, self)
+
+            for index, image in enumerate(images):
+                if cancelled is not None and cancelled.is_set():
+                    break
+                pending.append((index, image.shape, executor.submit(self.extract, index, image)))
+                if len(pending) > lookahead:
+                    integrate()
+            while pending:
+                if cancelled is not None and cancelled.is_set():
+                    for _, _, future in pending:
+                        future.cancel()
+                    break
+                integrate()
+        return self
+
+    def point_cloud(self, voxel_size=None):
+        """The fused global model as (points, colors) arrays"""
+        points, colors = self.map_points, self.map_colors
+        if voxel_size and len(points):
+            from reconstruct_3d import voxel_downsample
+            points, colors = voxel_downsample(points, colors, voxel_size)
+        return points, colors
+
+    def camera_poses(self):
+        """World-to-camera (R, t) of every registered frame"""
+        return [(frame.index, frame.R, frame.t) for frame in self.frames]
+
+
+def read_image_directory(directory):
+    """Yield the images of a directory in name order"""
+    for path in sorted(glob.glob(os.path.join(directory, "*"))):
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            image = cv2.imread(path)
+            if image is not None:
+                yield image
+
+
+def sample_feed(camera, max_frames=60, interval=0.25, display=True, cancelled=None):
+    """
+    Yield a live camera frame every interval seconds until max_frames or 'q'
+    :param cancelled: Optional threading.Event checked every frame, the feed ends once it is set
+    """
+    last = 0.0
+    count = 0
+    with camera.subscribe() as frames:
+        for frame in frames:
+            if cancelled is not None and cancelled.is_set():
+                break
+            if display:
+                cv2.imshow("Multi-view capture", frame)
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
+            now = time.monotonic()
+            if now - last >= interval:
+                last = now
+                count += 1
+                yield frame
+                if count >= max_frames:
+                    break
+    if display:
+        cv2.destroyAllWindows()
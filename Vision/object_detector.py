@@ -0,0 +1,98 @@
+import cv2
+import numpy as np
+import torch
+from torchvision.models import detection
+
+# Selectable detection models (builder, pretrained COCO weights), from most accurate to fastest on CPU
+DETECTION_MODELS = {
+    "fasterrcnn_resnet50_fpn": (detection.fasterrcnn_resnet50_fpn,
+                                detection.FasterRCNN_ResNet50_FPN_Weights.DEFAULT),
+    "fasterrcnn_mobilenet_v3_large_fpn": (detection.fasterrcnn_mobilenet_v3_large_fpn,
+                                          detection.FasterRCNN_MobileNet_V3_Large_FPN_Weights.DEFAULT),
+    "fasterrcnn_mobilenet_v3_large_320_fpn": (detection.fasterrcnn_mobilenet_v3_large_320_fpn,
+                                              detection.FasterRCNN_MobileNet_V3_Large_320_FPN_Weights.DEFAULT),
+    "ssdlite320_mobilenet_v3_large": (detection.ssdlite320_mobilenet_v3_large,
+                                      detection.SSDLite320_MobileNet_V3_Large_Weights.DEFAULT),
+}
+
+
+class ObjectDetector:
+    """Batched COCO object detector with configurable model, input size and CPU tuning."""
+
+    def __init__(self, model_name="fasterrcnn_resnet50_fpn", input_size=640, score_threshold=0.5,
+                 num_threads=None, quantize=False, device=None):
+        """
+        :param model_name: Key of DETECTION_MODELS
+        :param input_size: Longest image side fed to the model (None keeps the model's own resizing)
+        :param score_threshold: Minimum score of a returned detection
+        :param num_threads: torch intra-op threads for CPU inference (None leaves torch's default)
+        :param quantize: Apply int8 dynamic quantization to the Linear layers (CPU only)
+        :param device: torch device (defaults to CUDA when available)
+        """
+        if model_name not in DETECTION_MODELS:
+            raise ValueError(f"Unknown detection model '{model_name}', choose from {sorted(DETECTION_MODELS)}")
+        self.model_name = model_name
+        self.input_size = input_size
+        self.score_threshold = score_threshold
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+
+        if num_threads and self.device.type == "cpu":
+            torch.set_num_threads(num_threads)
+
+        builder, weights = DETECTION_MODELS[model_name]
+        model = builder(weights=weights)
+        self.labels = dict(enumerate(weights.meta["categories"]))
+
+        # Frames are already resized to input_size, stop the R-CNN transform from scaling them back up to 800px
+        if input_size and not model_name.startswith("ssdlite"):
+            model.transform.min_size = (input_size,)
+            model.transform.max_size = input_size
+
+        model.eval()
+        if quantize:
+            if self.device.type != "cpu":
+                raise ValueError("Dynamic quantization is only supported on CPU")
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model.to(self.device)
+
+    def _to_tensor(self, frame):
+        """BGR uint8 frame -> resized RGB float tensor, plus the scale applied"""
+        scale = 1.0
+        if self.input_size:
+            h, w = frame.shape[:2]
+            scale = self.input_size / max(h, w)
+            if scale < 1.0:
+                frame = cv2.resize(frame, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+            else:
+                scale = 1.0
+        rgb = np.ascontiguousarray(frame[:, :, ::-1])
+        tensor = torch.from_numpy(rgb).to(self.device).permute(2, 0, 1).float().div_(255.0)
+        return tensor, scale
+
+    def detect_batch(self, frames):
+        """
+        Detect objects in a batch of BGR frames.
+        :return: One list of (label, score, box) per frame, boxes as int [x1, y1, x2, y2] in frame coordinates
+        """
+        if not frames:
+            return []
+        tensors, scales = zip(*(self._to_tensor(frame) for frame in frames))
+
+        with torch.inference_mode():
+            predictions = self.model(list(tensors))
+
+        results = []
+        for preds, scale in zip(predictions, scales):
+            keep = preds["scores"] > self.score_threshold
+            boxes = (preds["boxes"][keep] / scale).round().to(torch.int64).cpu().numpy()
+            scores = preds["scores"][keep].cpu().tolist()
+            labels = preds["labels"][keep].cpu().tolist()
+            results.append([
+                (self.labels.get(label, "Unknown"), score, box)
+                for label, score, box in zip(labels, scores, boxes)
+            ])
+        return results
+
+    def detect(self, frame):
+        """Detect objects in a single BGR frame"""
+        return self.detect_batch([frame])[0]
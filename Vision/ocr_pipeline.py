@@ -0,0 +1,315 @@
+import glob
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+
+class TextRegionDetector:
+    """Finds text lines/words in a frame so OCR only sees the parts that contain text.
+
+    ``method="mser"`` groups MSER character blobs into lines and needs no
+    model; ``method="east"`` runs OpenCV's EAST text detector and needs the
+    frozen ``frozen_east_text_detection.pb`` graph.
+    """
+
+    def __init__(self, method="mser", east_model=None, max_width=960, padding=4,
+                 east_input_size=(320, 320), east_confidence=0.5):
+        """
+        :param method: "mser" or "east"
+        :param east_model: Path of the EAST .pb model (required for method="east")
+        :param max_width: Frames wider than this are downscaled before MSER detection
+        :param padding: Pixels added around every region before cropping
+        :param east_input_size: EAST network input (width, height), multiples of 32
+        :param east_confidence: Minimum EAST text score
+        """
+        if method not in ("mser", "east"):
+            raise ValueError(f"Unknown text detection method '{method}'")
+        self.method = method
+        self.max_width = max_width
+        self.padding = padding
+        if method == "east":
+            if not east_model:
+                raise ValueError("method='east' needs the path of frozen_east_text_detection.pb")
+            self.east = cv2.dnn_TextDetectionModel_EAST(east_model)
+            self.east.setConfidenceThreshold(east_confidence)
+            self.east.setNMSThreshold(0.4)
+            self.east.setInputParams(1.0, east_input_size, (123.68, 116.78, 103.94), True)
+        else:
+            # Looser than the defaults: crisp printed/on-screen text has near-constant areas across
+            # thresholds that the default delta/variation would reject
+            self.mser = cv2.MSER_create()
+            self.mser.setDelta(10)
+            self.mser.setMaxVariation(0.5)
+            self.mser.setMinArea(20)
+
+    def detect(self, frame):
+        """Return text regions as (x, y, w, h) boxes in frame coordinates"""
+        if self.method == "east":
+            quads, _ = self.east.detect(frame)
+            boxes = [cv2.boundingRect(np.asarray(quad, dtype=np.int32)) for quad in quads]
+        else:
+            boxes = self._mser_lines(frame)
+        h, w = frame.shape[:2]
+        p = self.padding
+        return [(max(0, x - p), max(0, y - p), min(w, x + bw + p) - max(0, x - p), min(h, y + bh + p) - max(0, y - p))
+                for x, y, bw, bh in boxes]
+
+    def _mser_lines(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        scale = min(1.0, self.max_width / gray.shape[1])
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(gray, (3, 3), 0)
+        height, width = gray.shape
+        self.mser.setMaxArea(max(100, height * width // 20))
+        _, blobs = self.mser.detectRegions(gray)
+        if len(blobs) == 0:
+            return []
+
+        # Character-like blobs only: not too large, not extremely elongated
+        bw, bh = blobs[:, 2], blobs[:, 3]
+        keep = (bh >= 6) & (bh <= height // 3) & (bw <= bh * 3) & (bh <= bw * 8)
+        blobs = blobs[keep]
+        if len(blobs) == 0:
+            return []
+
+        # Merge neighbouring characters into lines with a horizontal dilation
+        mask = np.zeros((height, width), np.uint8)
+        for x, y, w, h in blobs:
+            mask[y:y + h, x:x + w] = 255
+        char_height = int(np.median(blobs[:, 3]))
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, char_height), 1))
+        mask = cv2.dilate(mask, kernel)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        lines = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w >= h and w >= 2 * char_height:
+                lines.append(tuple(round(v / scale) for v in (x, y, w, h)))
+        return lines
+
+
+def deskew(binary):
+    """Rotate a binarized crop (text black on white) so its text runs horizontally"""
+    coords = cv2.findNonZero(255 - binary)
+    if coords is None or len(coords) < 10:
+        return binary
+    angle = cv2.minAreaRect(coords)[-1]
+    # minAreaRect reports angles in [0, 90) (OpenCV >= 4.5) or [-90, 0): bring to [-45, 45]
+    if angle > 45:
+        angle -= 90
+    elif angle < -45:
+        angle += 90
+    if abs(angle) < 0.5:
+        return binary
+    h, w = binary.shape
+    rotation = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(binary, rotation, (w, h), flags=cv2.INTER_CUBIC, borderValue=255)
+
+
+def preprocess(crop, min_height=32):
+    """Grayscale, upscale small text, binarize (Otsu) and deskew a crop for Tesseract"""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    if gray.shape[0] < min_height:
+        factor = min_height / gray.shape[0]
+        gray = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # Tesseract expects dark text on a light background
+    if np.count_nonzero(binary) < binary.size / 2:
+        binary = 255 - binary
+    return deskew(binary)
+
+
+_local = threading.local()
+
+
+def _ocr_engine(lang, psm):
+    """Per-process/per-thread OCR callable: a persistent tesserocr API when installed, pytesseract otherwise"""
+    engine = getattr(_local, "engine", None)
+    if engine is None:
+        try:
+            import tesserocr
+            api = tesserocr.PyTessBaseAPI(lang=lang, psm=psm)
+
+            def engine(image):
+                h, w = image.shape
+                api.SetImageBytes(image.tobytes(), w, h, 1, w)
+                return api.GetUTF8Text()
+        except ImportError:
+            import pytesseract
+
+            def engine(image):
+                return pytesseract.image_to_string(image, lang=lang, config=f"--psm {psm}")
+        _local.engine = engine
+    return engine
+
+
+def _ocr_crop(image, lang, psm):
+    return _ocr_engine(lang, psm)(image).strip()
+
+
+def reading_order(regions):
+    """Join (box, text) regions into text: top-to-bottom lines, left-to-right within a line"""
+    lines = []
+    for (x, y, w, h), text in sorted(regions, key=lambda r: r[0][1] + r[0][3] / 2):
+        if not text:
+            continue
+        center = y + h / 2
+        if lines and abs(center - lines[-1][0]) < h / 2:
+            lines[-1][1].append((x, text))
+        else:
+            lines.append((center, [(x, text)]))
+    return "\n".join(" ".join(text for _, text in sorted(words)) for _, words in lines)
+
+
+class OCRPipeline:
+    """Region-based OCR: detect text regions, preprocess only those crops and OCR them in parallel.
+
+    Crops are OCR'd on a pool of workers that each keep one Tesseract
+    instance alive (tesserocr), falling back to pytesseract. Results are
+    cached by the hash of the preprocessed crop, so unchanged text in a live
+    feed is not OCR'd again.
+    """
+
+    def __init__(self, detector=None, workers=None, use_processes=True, lang="eng", psm=7, cache_size=4096):
+        """
+        :param detector: TextRegionDetector (defaults to MSER)
+        :param workers: OCR workers (defaults to the CPU count)
+        :param use_processes: Run OCR in a process pool (threads otherwise, enough with tesserocr)
+        :param lang: Tesseract language
+        :param psm: Tesseract page segmentation mode for the crops (7 = single text line)
+        :param cache_size: Number of crop results kept
+        """
+        self.detector = detector or TextRegionDetector()
+        self.workers = workers or os.cpu_count() or 1
+        self.use_processes = use_processes
+        self.lang = lang
+        self.psm = psm
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._executor = None
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            if self.use_processes:
+                # spawn: forking a parent that already runs torch/OpenCV threads can deadlock
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="ocr")
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def crops(self, frame):
+        """Preprocessed crops of a frame's text regions as (box, image)"""
+        return [(box, preprocess(frame[box[1]:box[1] + box[3], box[0]:box[0] + box[2]]))
+                for box in self.detector.detect(frame)]
+
+    def _recognize(self, images):
+        """OCR preprocessed crops, serving repeats from the cache"""
+        keys = [hashlib.blake2b(image.tobytes() + bytes(str(image.shape), "ascii"), digest_size=16).digest()
+                for image in images]
+        texts = [None] * len(images)
+        todo = {}
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    texts[i] = self._cache[key]
+                    self.hits += 1
+                else:
+                    todo.setdefault(key, []).append(i)
+                    self.misses += 1
+
+        futures = {key: self.executor.submit(_ocr_crop, images[indices[0]], self.lang, self.psm)
+                   for key, indices in todo.items()}
+        for key, future in futures.items():
+            text = future.result()
+            for i in todo[key]:
+                texts[i] = text
+            with self._cache_lock:
+                self._cache[key] = text
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return texts
+
+    def read_batch(self, frames):
+        """OCR several frames at once, all their crops share the worker pool; returns one text per frame"""
+        per_frame = [self.crops(frame) for frame in frames]
+        texts = iter(self._recognize([image for crops in per_frame for _, image in crops]))
+        return [reading_order([(box, next(texts)) for box, _ in crops]) for crops in per_frame]
+
+    def read(self, frame):
+        """OCR one BGR frame"""
+        return self.read_batch([frame])[0]
+
+    def read_directory(self, directory, batch_size=8):
+        """
+        OCR every image in a directory.
+        :return: ({path: text}, throughput stats)
+        """
+        paths = sorted(path for path in glob.glob(os.path.join(directory, "*"))
+                       if path.lower().endswith(IMAGE_EXTENSIONS))
+        results = {}
+        started = time.perf_counter()
+        hits, misses = self.hits, self.misses
+        for start in range(0, len(paths), batch_size):
+            batch = [(path, cv2.imread(path)) for path in paths[start:start + batch_size]]
+            batch = [(path, image) for path, image in batch if image is not None]
+            for (path, _), text in zip(batch, self.read_batch([image for _, image in batch])):
+                results[path] = text
+        elapsed = time.perf_counter() - started
+        crops = self.hits - hits + self.misses - misses
+        stats = {
+            "images": len(results),
+            "crops": crops,
+            "cache_hits": self.hits - hits,
+            "seconds": elapsed,
+            "images_per_s": len(results) / elapsed if elapsed else None,
+            "crops_per_s": crops / elapsed if elapsed else None,
+        }
+        return results, stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Region-based OCR over a directory of images")
+    parser.add_argument("directory")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads", action="store_true", help="Use a thread pool instead of processes")
+    parser.add_argument("--east", help="EAST model path (MSER is used otherwise)")
+    parser.add_argument("--quiet", action="store_true", help="Only print throughput")
+    args = parser.parse_args()
+
+    detector = TextRegionDetector("east", args.east) if args.east else TextRegionDetector()
+    with OCRPipeline(detector, workers=args.workers, use_processes=not args.threads) as pipeline:
+        texts, stats = pipeline.read_directory(args.directory)
+    if not args.quiet:
+        for path, text in texts.items():
+            print(f"📄 {os.path.basename(path)}: {text!r}")
+    print(f"⚡ {stats['images']} images, {stats['crops']} regions ({stats['cache_hits']} cached) in "
+          f"{stats['seconds']:.2f}s: {stats['images_per_s'] or 0:.1f} images/s, {stats['crops_per_s'] or 0:.1f} regions/s")
@@ -0,0 +1,244 @@
+import json
+import math
+import os
+
+import numpy as np
+
+
+def _record_dtype(dtype):
+    return np.dtype([("xyz", dtype, 3), ("rgb", np.uint8, 3)])
+
+
+def _to_records(points, colors, dtype):
+    """Pack (N, 3) points and [0, 1] colors into xyz/rgb records"""
+    records = np.empty(len(points), dtype=_record_dtype(dtype))
+    records["xyz"] = points
+    if colors is None:
+        records["rgb"] = 255
+    else:
+        records["rgb"] = np.clip(np.asarray(colors) * 255.0 + 0.5, 0, 255).astype(np.uint8)
+    return records
+
+
+class StreamingPLYWriter:
+    """Appends point batches to a binary little-endian PLY as they are produced.
+
+    The vertex count in the header is a fixed-width field rewritten after
+    every batch, so the file on disk is a valid, loadable PLY at all times.
+    """
+
+    COUNT_WIDTH = 12
+
+    def __init__(self, path, dtype=np.float32):
+        """
+        :param path: Output .ply file (overwritten)
+        :param dtype: np.float32 or np.float64 vertex coordinates
+        """
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+        ply_type = {"float32": "float", "float64": "double"}[self.dtype.name]
+        header = [
+            "ply",
+            "format binary_little_endian 1.0",
+            "comment written incrementally by Tejas AI",
+            "element vertex " + "0".ljust(self.COUNT_WIDTH),
+            f"property {ply_type} x",
+            f"property {ply_type} y",
+            f"property {ply_type} z",
+            "property uchar red",
+            "property uchar green",
+            "property uchar blue",
+            "end_header",
+        ]
+        header = ("\n".join(header) + "\n").encode("ascii")
+        self._count_offset = header.index(b"element vertex ") + len(b"element vertex ")
+        self._file = open(path, "wb")
+        self._file.write(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, points, colors=None):
+        """Write a batch of (N, 3) points with optional (N, 3) colors in [0, 1]"""
+        if not len(points):
+            return
+        records = _to_records(points, colors, self.dtype.newbyteorder("<"))
+        self._file.write(records.tobytes())
+        self.count += len(records)
+        end = self._file.tell()
+        self._file.seek(self._count_offset)
+        self._file.write(str(self.count).ljust(self.COUNT_WIDTH).encode("ascii"))
+        self._file.seek(end)
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class ChunkedPointStore:
+    """Directory of fixed-size point chunks with a tiled level-of-detail index.
+
+    Batches are buffered and written as ``chunk_NNNNN.npy`` (memory-mappable)
+    or ``chunk_NNNNN.npz`` (compressed) files. Inside a chunk, points are
+    sorted by spatial tile and shuffled within each tile, and ``index.json``
+    records every tile's range in every chunk. Loading a region reads only
+    the tiles it overlaps, and a level of detail reads only the first
+    1/4**lod of each tile range — a uniform subsample, with no extra copies
+    stored.
+    """
+
+    def __init__(self, directory, chunk_size=1_000_000, compress=False, tile_size=1.0, dtype=np.float32, mode="a"):
+        """
+        :param directory: Store directory (created, or reopened if it has an index)
+        :param chunk_size: Points per chunk file
+        :param compress: Write zlib-compressed .npz chunks instead of memory-mappable .npy
+        :param tile_size: Edge length of the cubic tiles of the spatial index
+        :param dtype: Coordinate dtype on disk
+        :param mode: "a" reopens an existing store and appends to it, "w" deletes its chunks and starts empty
+        """
+        if mode not in ("a", "w"):
+            raise ValueError(f"mode must be 'a' or 'w', not {mode!r}")
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        os.makedirs(directory, exist_ok=True)
+        if mode == "w":
+            self._truncate()
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        else:
+            self.index = {"chunk_size": chunk_size, "compress": compress, "tile_size": tile_size,
+                          "dtype": np.dtype(dtype).name, "count": 0, "chunks": []}
+        self.dtype = np.dtype(self.index["dtype"])
+        self._buffer = []
+        self._buffered = 0
+        self._rng = np.random.default_rng()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _truncate(self):
+        """Delete the index and chunk files of a previous store in the directory (nothing else)"""
+        for name in os.listdir(self.directory):
+            if name in ("index.json", "index.json.tmp") or \
+                    (name.startswith("chunk_") and name.endswith((".npy", ".npz"))):
+                os.remove(os.path.join(self.directory, name))
+
+    @property
+    def count(self):
+        return self.index["count"] + self._buffered
+
+    def append(self, points, colors=None):
+        """Buffer a batch, writing full chunks as they fill up"""
+        if not len(points):
+            return
+        self._buffer.append(_to_records(points, colors, self.dtype))
+        self._buffered += len(points)
+        while self._buffered >= self.index["chunk_size"]:
+            records = np.concatenate(self._buffer)
+            size = self.index["chunk_size"]
+            self._write_chunk(records[:size])
+            rest = records[size:]
+            self._buffer = [rest] if len(rest) else []
+            self._buffered = len(rest)
+
+    def flush(self):
+        """Write buffered points as a (possibly short) chunk"""
+        if self._buffered:
+            self._write_chunk(np.concatenate(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def close(self):
+        self.flush()
+
+    def _tile_keys(self, xyz):
+        return np.floor(xyz / self.index["tile_size"]).astype(np.int64)
+
+    def _write_chunk(self, records):
+        tiles = self._tile_keys(records["xyz"])
+        # Sort by tile, random order inside each tile so any prefix of a tile range is a uniform sample
+        order = np.lexsort((self._rng.random(len(records)), tiles[:, 2], tiles[:, 1], tiles[:, 0]))
+        records, tiles = records[order], tiles[order]
+        starts = np.flatnonzero(np.r_[True, (tiles[1:] != tiles[:-1]).any(axis=1)])
+        counts = np.diff(np.r_[starts, len(records)])
+
+        name = f"chunk_{len(self.index['chunks']):05d}." + ("npz" if self.index["compress"] else "npy")
+        path = os.path.join(self.directory, name)
+        if self.index["compress"]:
+            np.savez_compressed(path, records=records)
+        else:
+            np.save(path, records)
+
+        xyz = records["xyz"]
+        self.index["chunks"].append({
+            "file": name,
+            "count": len(records),
+            "min": xyz.min(axis=0).tolist(),
+            "max": xyz.max(axis=0).tolist(),
+            "tiles": [[*map(int, tiles[s]), int(s), int(c)] for s, c in zip(starts, counts)],
+        })
+        self.index["count"] += len(records)
+        self._save_index()
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _open_chunk(self, chunk):
+        path = os.path.join(self.directory, chunk["file"])
+        if chunk["file"].endswith(".npz"):
+            with np.load(path) as data:
+                return data["records"]
+        return np.load(path, mmap_mode="r")
+
+    def load(self, bounds=None, lod=0):
+        """
+        Read flushed points back.
+        :param bounds: Optional ((xmin, ymin, zmin), (xmax, ymax, zmax)): only tiles overlapping it are read
+        :param lod: Level of detail, every level keeps a quarter of each tile's points
+        :return: (points, colors in [0, 1])
+        """
+        if bounds is not None:
+            low, high = (np.floor(np.asarray(b) / self.index["tile_size"]).astype(np.int64) for b in bounds)
+        fraction = 0.25 ** lod
+        parts = []
+        for chunk in self.index["chunks"]:
+            if bounds is not None and (np.any(np.asarray(chunk["max"]) < bounds[0]) or
+                                       np.any(np.asarray(chunk["min"]) > bounds[1])):
+                continue
+            records = None
+            for tx, ty, tz, start, count in chunk["tiles"]:
+                if bounds is not None and not (np.all(low <= (tx, ty, tz)) and np.all((tx, ty, tz) <= high)):
+                    continue
+                if records is None:
+                    records = self._open_chunk(chunk)
+                parts.append(np.asarray(records[start:start + max(1, math.ceil(count * fraction))]))
+        if not parts:
+            return np.empty((0, 3), self.dtype), np.empty((0, 3))
+        records = np.concatenate(parts)
+        return records["xyz"], records["rgb"] / 255.0
+
+
+def open_exporter(path, compress=False, mode="w", **options):
+    """
+    StreamingPLYWriter for a .ply path, ChunkedPointStore for anything else (a directory).
+    :param mode: "w" replaces an existing output, "a" appends to an existing store (directories only)
+    """
+    if path.lower().endswith(".ply"):
+        if compress:
+            raise ValueError("Binary PLY output is not compressed, export to a store directory instead")
+        if mode != "w":
+            raise ValueError("A PLY file is always rewritten, append to a store directory instead")
+        return StreamingPLYWriter(path, **options)
+    return ChunkedPointStore(path, compress=compress, mode=mode, **options)
@@ -0,0 +1,200 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Analyzer:
+    """One analysis stage (OCR, barcode, detection, ...) with its own schedule and worker pool."""
+
+    def __init__(self, name, fn, every_n_frames=1, rate_hz=None, workers=1):
+        """
+        :param name: Key of this stage's result in every FrameRecord
+        :param fn: Callable taking a frame and returning a result
+        :param every_n_frames: Run on every Nth frame
+        :param rate_hz: Run at most this many times per second (overrides every_n_frames)
+        :param workers: Threads in this stage's pool
+        """
+        self.name = name
+        self.fn = fn
+        self.every_n_frames = max(1, every_n_frames)
+        self.rate_hz = rate_hz
+        self.workers = workers
+        self.executor = None
+        self.in_flight = 0
+        self.last_started = None
+        self.latencies = deque(maxlen=500)
+        self.runs = 0
+        self.skipped_busy = 0
+
+    def due(self, frame_index, now, drop_when_busy=True):
+        if drop_when_busy and self.in_flight >= self.workers:
+            self.skipped_busy += 1
+            return False
+        if self.rate_hz:
+            return self.last_started is None or now - self.last_started >= 1.0 / self.rate_hz
+        return frame_index % self.every_n_frames == 0
+
+
+class FrameRecord:
+    """Merged analysis of one frame: fresh results of the stages that ran on it plus the latest of the others."""
+
+    def __init__(self, index, timestamp, frame):
+        self.index = index
+        self.timestamp = timestamp
+        self.frame = frame
+        self.results = {}
+        self.fresh = set()
+        self.latencies = {}
+        self.errors = {}
+        self._futures = {}
+
+    @property
+    def done(self):
+        return all(future.done() for future in self._futures.values())
+
+
+class RealTimeVisionEngine:
+    """Runs several analyzers concurrently on frames from a CameraService.
+
+    Each frame is offered to every analyzer whose schedule says it is due;
+    the due ones run in parallel on their own pools while the engine keeps
+    pulling frames. Records are emitted in frame order once their stages
+    finish. By default stages that are still busy are skipped rather than
+    queued, so a slow analyzer lowers its own rate instead of the whole
+    pipeline's; offline runs can set ``drop_when_busy=False`` to analyse
+    every due frame.
+    """
+
+    def __init__(self, camera, analyzers, max_pending=4, drop_when_busy=True):
+        """
+        :param camera: CameraService providing the frames (a video file source works headless)
+        :param analyzers: List of Analyzer stages
+        :param max_pending: Frames allowed in flight before the engine waits for the oldest
+        :param drop_when_busy: Skip a due stage while its workers are all busy
+        """
+        self.camera = camera
+        self.analyzers = analyzers
+        self.max_pending = max_pending
+        self.drop_when_busy = drop_when_busy
+        self.latest = {}
+        self.frames_processed = 0
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def _submit(self, analyzer, record):
+        def run():
+            started = time.perf_counter()
+            try:
+                return analyzer.fn(record.frame)
+            finally:
+                latency = time.perf_counter() - started
+                with self._lock:
+                    analyzer.in_flight -= 1
+                    analyzer.latencies.append(latency)
+                    record.latencies[analyzer.name] = latency
+
+        with self._lock:
+            analyzer.in_flight += 1
+            analyzer.runs += 1
+            analyzer.last_started = time.monotonic()
+        record._futures[analyzer.name] = analyzer.executor.submit(run)
+
+    def _finish(self, record):
+        for name, future in record._futures.items():
+            try:
+                self.latest[name] = future.result()
+                record.fresh.add(name)
+            except Exception as e:
+                record.errors[name] = e
+        record.results = dict(self.latest)
+        record._futures = {}
+        self.frames_processed += 1
+        return record
+
+    def run(self, max_frames=None, duration=None):
+        """
+        Process frames until the source ends, max_frames or duration is reached.
+        :return: Generator of FrameRecord in frame order
+        """
+        for analyzer in self.analyzers:
+            analyzer.executor = ThreadPoolExecutor(max_workers=analyzer.workers, thread_name_prefix=analyzer.name)
+        pending = deque()
+        started = time.perf_counter()
+        index = 0
+
+        try:
+            with self.camera.subscribe() as frames:
+                for frame in frames:
+                    now = time.monotonic()
+                    record = FrameRecord(index, now, frame)
+                    for analyzer in self.analyzers:
+                        if analyzer.due(index, now, self.drop_when_busy):
+                            self._submit(analyzer, record)
+                    pending.append(record)
+                    index += 1
+
+                    # Emit finished records in order, block only when too many frames are in flight
+                    while pending and (pending[0].done or len(pending) > self.max_pending):
+                        record = pending.popleft()
+                        for future in record._futures.values():
+                            future.exception()
+                        yield self._finish(record)
+
+                    if (max_frames and index >= max_frames) or (duration and time.perf_counter() - started >= duration):
+                        break
+
+            while pending:
+                record = pending.popleft()
+                for future in record._futures.values():
+                    future.exception()
+                yield self._finish(record)
+        finally:
+            self.elapsed += time.perf_counter() - started
+            for analyzer in self.analyzers:
+                analyzer.executor.shutdown(wait=True)
+
+    def stats(self):
+        """Overall FPS and per-stage latency/throughput"""
+        stages = {}
+        for analyzer in self.analyzers:
+            latencies = sorted(analyzer.latencies)
+            stages[analyzer.name] = {
+                "runs": analyzer.runs,
+                "skipped_busy": analyzer.skipped_busy,
+                "mean_ms": 1000 * sum(latencies) / len(latencies) if latencies else None,
+                "p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+                "rate_hz": analyzer.runs / self.elapsed if self.elapsed else None,
+            }
+        return {
+            "frames": self.frames_processed,
+            "fps": self.frames_processed / self.elapsed if self.elapsed else None,
+            "stages": stages,
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"🎞️ {stats['frames']} frames at {stats['fps'] or 0:.1f} FPS")
+        for name, stage in stats["stages"].items():
+            mean = f"{stage['mean_ms']:.1f}" if stage["mean_ms"] is not None else "-"
+            p95 = f"{stage['p95_ms']:.1f}" if stage["p95_ms"] is not None else "-"
+            print(f"   {name:<10} runs {stage['runs']:>5}  mean {mean:>7} ms  p95 {p95:>7} ms  "
+                  f"{stage['rate_hz'] or 0:.1f} Hz  (busy skips {stage['skipped_busy']})")
+
+
+if __name__ == "__main__":
+    import sys
+
+    from camera_service import CameraService
+    from computer_vision import ComputerVision
+
+    # Headless run over a recorded video: python realtime_engine.py clip.mp4
+    source = sys.argv[1] if len(sys.argv) > 1 else 0
+    camera = CameraService(source, realtime=False)
+    vision = ComputerVision(camera=camera)
+    engine = vision.build_realtime_engine()
+    engine.drop_when_busy = False
+    for record in engine.run():
+        if {"ocr", "barcode"} & record.fresh:
+            print(f"#{record.index}", {name: record.results.get(name) for name in ("ocr", "barcode")})
+    engine.print_stats()
@@ -1,76 +1,191 @@
+from functools import lru_cache
+
 import cv2
 import numpy as np
 import open3d as o3d
+from camera_service import get_camera
+from point_cloud_store import open_exporter
+from stereo_depth import StereoDepthEngine
+
+
+@lru_cache(maxsize=8)
+def pixel_grid(h, w, fx, fy, cx, cy, dtype=np.float64):
+    """(u - cx) / fx and (v - cy) / fy for every pixel, cached per resolution and intrinsics"""
+    x_factor = (np.arange(w, dtype=dtype) - cx) / dtype(fx)
+    y_factor = (np.arange(h, dtype=dtype) - cy) / dtype(fy)
+    x_grid, y_grid = np.meshgrid(x_factor, y_factor)
+    x_grid.setflags(write=False)
+    y_grid.setflags(write=False)
+    return x_grid, y_grid
+
+
+def voxel_downsample(points, colors, voxel_size):
+    """Average the points and colors falling into each voxel_size cube"""
+    if not len(points):  # No valid depth in the view, nothing to merge
+        return points, colors
+    voxels = np.floor(points / voxel_size).astype(np.int64)
+    voxels -= voxels.min(axis=0)
+    keys = np.ravel_multi_index(voxels.T, voxels.max(axis=0) + 1)
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    merged = []
+    for values in (points, colors):
+        columns = [np.bincount(inverse, weights=values[:, i], minlength=len(counts)) for i in range(3)]
+        merged.append((np.stack(columns, axis=1) / counts[:, None]).astype(values.dtype))
+    return merged[0], merged[1]
+
 
 class Reconstruct3D:
-    def __init__(self):
+    def __init__(self, camera=None, focal_length=800, baseline=0.06, stereo_options=None):
+        """
+        :param camera: CameraService to capture from (defaults to the shared webcam service)
+        :param focal_length: Camera focal length in pixels, the optical center is the image center
+        :param baseline: Distance between the two stereo views in meters
+        :param stereo_options: Keyword arguments for StereoDepthEngine (mode, pyramid_levels, num_disparities, ...)
+        """
+        self.camera = camera or get_camera(0)  # Shared capture service
+        self.focal_length = focal_length
+        # Stereo matcher configured once and reused for every pair
+        self.depth_engine = StereoDepthEngine(focal_length, baseline, **(stereo_options or {}))
         self.orb = cv2.ORB_create()  # Feature extractor
         self.bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
 
-    def capture_images(self, num_images=10):
-        """Captures multiple images from the webcam for 3D reconstruction"""
-        cap = cv2.VideoCapture(0)
+    def capture_images(self, num_images=10, cancelled=None):
+        """
+        Captures multiple images from the webcam for 3D reconstruction
+        :param cancelled: Optional threading.Event checked before every capture, stops capturing once it is set
+        """
         images = []
 
-        for i in range(num_images):
-            ret, frame = cap.read()
-            if not ret:
-                break
-            images.append(frame)
-            cv2.imshow("Capturing Images", frame)
-            cv2.waitKey(500)  # Wait 500ms between captures
+        with self.camera.subscribe() as frames:
+            for i in range(num_images):
+                if cancelled is not None and cancelled.is_set():
+                    break
+                frame = frames.next()
+                if frame is None:
+                    break
+                images.append(frame)
+                cv2.imshow("Capturing Images", frame)
+                cv2.waitKey(500)  # Wait 500ms between captures
 
-        cap.release()
         cv2.destroyAllWindows()
         return images
 
     def compute_depth_map(self, img1, img2):
-        """Compute depth map using Stereo Matching"""
-        gray1 = cv2.cvtColor(img1, cv2.COLOR_BGR2GRAY)
-        gray2 = cv2.cvtColor(img2, cv2.COLOR_BGR2GRAY)
-
-        stereo = cv2.StereoBM_create(numDisparities=64, blockSize=15)
-        disparity = stereo.compute(gray1, gray2)
-
-        depth_map = cv2.normalize(disparity, None, alpha=0, beta=255, norm_type=cv2.NORM_MINMAX)
-        depth_map = np.uint8(depth_map)
-
-        return depth_map
-
-    def generate_point_cloud(self, depth_map, img):
-        """Generate a 3D point cloud from the depth map"""
+        """Compute a metric float32 depth map (0 where unknown) from a rectified stereo pair"""
+        return self.depth_engine.depth(img1, img2)
+
+    def generate_point_cloud(self, depth_map, img, voxel_size=None, dtype=np.float64, as_arrays=False):
+        """
+        Generate a 3D point cloud from the depth map
+        :param voxel_size: Merge points into voxels of this size (None keeps every pixel)
+        :param dtype: Float type the points and colors are computed in
+        :param as_arrays: Return (points, colors) arrays instead of an Open3D point cloud
+        """
+        dtype = np.dtype(dtype).type
         h, w = depth_map.shape
-        fx = fy = 800  # Focal length
+        fx = fy = self.focal_length  # Focal length
         cx, cy = w // 2, h // 2  # Optical center
-
-        points = []
-        colors = []
-
-        for v in range(h):
-            for u in range(w):
-                depth = depth_map[v, u]
-                if depth > 0:
-                    x = (u - cx) * depth / fx
-                    y = (v - cy) * depth / fy
-                    z = depth
-                    points.append((x, y, z))
-                    colors.append(img[v, u] / 255.0)
+        x_grid, y_grid = pixel_grid(h, w, fx, fy, cx, cy, dtype)
+
+        mask = depth_map > 0
+        depth = depth_map[mask].astype(dtype)
+        points = np.empty((len(depth), 3), dtype=dtype)
+        np.multiply(x_grid[mask], depth, out=points[:, 0])
+        np.multiply(y_grid[mask], depth, out=points[:, 1])
+        points[:, 2] = depth
+        colors = img[mask].astype(dtype)
+        colors *= dtype(1 / 255.0)
+
+        if voxel_size:
+            points, colors = voxel_downsample(points, colors, voxel_size)
+        if as_arrays:
+            return points, colors
 
         point_cloud = o3d.geometry.PointCloud()
-        point_cloud.points = o3d.utility.Vector3dVector(np.array(points))
-        point_cloud.colors = o3d.utility.Vector3dVector(np.array(colors))
+        point_cloud.points = o3d.utility.Vector3dVector(np.asarray(points, dtype=np.float64))
+        point_cloud.colors = o3d.utility.Vector3dVector(np.asarray(colors, dtype=np.float64))
         return point_cloud
 
-    def save_point_cloud(self, point_cloud, filename="output.ply"):
-        """Save the generated point cloud to a file"""
-        o3d.io.write_point_cloud(filename, point_cloud)
+    def save_point_cloud(self, point_cloud, filename="output.ply", compress=False):
+        """Save the generated point cloud to a binary .ply file or a chunked store directory"""
+        with open_exporter(filename, compress=compress) as exporter:
+            colors = np.asarray(point_cloud.colors) if point_cloud.has_colors() else None
+            exporter.append(np.asarray(point_cloud.points), colors)
         print(f"✅ 3D Model saved as {filename}")
 
-    def run(self):
-        """Main function to capture images, compute depth, and generate 3D model"""
+    def reconstruct_multiview(self, source=None, max_frames=60, interval=0.25, voxel_size=None, display=True,
+                              exporter=None, cancelled=None):
+        """
+        Incrementally reconstruct a sparse model from many views
+        :param source: Directory of images, or None for the live camera feed
+        :param max_frames: Frames sampled from the live feed
+        :param interval: Seconds between sampled live frames
+        :param voxel_size: Merge the fused points into voxels of this size
+        :param exporter: Optional StreamingPLYWriter/ChunkedPointStore receiving new points as they are triangulated
+        :param cancelled: Optional threading.Event stopping capture and reconstruction, the partial model is returned
+        :return: (point cloud, IncrementalReconstructor with poses and stats)
+        """
+        from incremental_reconstruction import IncrementalReconstructor, read_image_directory, sample_feed
+
+        reconstructor = IncrementalReconstructor(self.focal_length, matcher=self.bf,
+                                                 n_features=self.orb.getMaxFeatures())
+        if source:
+            images = read_image_directory(source)
+        else:
+            images = sample_feed(self.camera, max_frames, interval, display, cancelled)
+
+        def progress(index, added, model):
+            status = f"+{added} points" if added is not None else "not registered"
+            print(f"🧩 Frame {index}: {status}, model has {len(model.map_points)} points")
+            if exporter is not None and added:
+                exporter.append(model.map_points[-added:], model.map_colors[-added:])
+
+        reconstructor.run(images, on_update=progress, cancelled=cancelled)
+        points, colors = reconstructor.point_cloud(voxel_size)
+        point_cloud = o3d.geometry.PointCloud()
+        point_cloud.points = o3d.utility.Vector3dVector(points)
+        point_cloud.colors = o3d.utility.Vector3dVector(colors)
+        return point_cloud, reconstructor
+
+    def run(self, source=None, output="output.ply", headless=False, compress=False, cancelled=None):
+        """
+        Main function to capture views, reconstruct them incrementally and show the 3D model
+        :param source: Directory of images, or None for the live camera feed
+        :param output: .ply file or store directory the model is streamed to while it grows
+        :param headless: Skip the preview windows and the 3D viewer
+        :param compress: Compress the chunks of a store directory
+        :param cancelled: Optional threading.Event; once set the partial model is saved and the viewer skipped
+        :return: True when a model was saved
+        """
+        print("📸 Capturing views..." if source is None else f"📂 Reading views from {source}...")
+        with open_exporter(output, compress=compress) as exporter:
+            point_cloud, reconstructor = self.reconstruct_multiview(source, display=not headless, exporter=exporter,
+                                                                    cancelled=cancelled)
+        stats = reconstructor.stats
+        print(f"🔷 {stats['accepted']}/{stats['frames']} views registered ({stats['keyframes']} keyframes), "
+              f"{len(point_cloud.points)} points")
+
+        if cancelled is not None and cancelled.is_set():
+            print(f"🛑 Reconstruction cancelled, partial model saved as {output}")
+            return False
+        if not len(point_cloud.points):
+            print("❌ Could not reconstruct a model, move the camera slowly around a textured object!")
+            return False
+        print(f"✅ 3D Model saved as {output}")
+
+        if not headless:
+            print("🎨 Visualizing 3D Model...")
+            o3d.visualization.draw_geometries([point_cloud])
+        return True
+
+    def run_stereo(self, output="output.ply", headless=False, compress=False, cancelled=None):
+        """Two-view depth-map reconstruction from the first two captured images"""
         print("📸 Capturing images...")
-        images = self.capture_images()
+        images = self.capture_images(cancelled=cancelled)
 
+        if cancelled is not None and cancelled.is_set():
+            print("🛑 Capture cancelled")
+            return
         if len(images) < 2:
             print("❌ Need at least two images for depth estimation!")
             return
@@ -82,11 +197,22 @@ class Reconstruct3D:
         point_cloud = self.generate_point_cloud(depth_map, images[0])
 
         print("💾 Saving 3D Model...")
-        self.save_point_cloud(point_cloud)
+        self.save_point_cloud(point_cloud, output, compress)
+
+        if not headless:
+            print("🎨 Visualizing 3D Model...")
+            o3d.visualization.draw_geometries([point_cloud])
 
-        print("🎨 Visualizing 3D Model...")
-        o3d.visualization.draw_geometries([point_cloud])
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Multi-view 3D reconstruction")
+    parser.add_argument("source", nargs="?", help="Directory of images (live camera if omitted)")
+    parser.add_argument("--output", default="output.ply", help=".ply file or chunked store directory")
+    parser.add_argument("--headless", action="store_true", help="No preview windows or 3D viewer")
+    parser.add_argument("--compress", action="store_true", help="Compress store chunks")
+    args = parser.parse_args()
+
     reconstructor = Reconstruct3D()
-    reconstructor.run()
\ No newline at end of file
+    reconstructor.run(args.source, args.output, args.headless, args.compress)
\ No newline at end of file
@@ -0,0 +1,168 @@
+import hashlib
+import time
+from collections import OrderedDict, deque
+
+import cv2
+import numpy as np
+
+STEREO_MODES = ("bm", "sgbm", "sgbm3way")
+
+
+class StereoDepthEngine:
+    """Metric depth from rectified stereo pairs with a matcher configured once.
+
+    ``mode`` trades speed for quality: "bm" (block matching, fastest),
+    "sgbm3way" and "sgbm" (semi-global, smoothest). ``pyramid_levels`` runs
+    the matcher on frames halved that many times and scales the disparity
+    back up, roughly 4x (and fewer disparities) cheaper per level.
+
+    Depth is ``focal_length * baseline / disparity`` as float32 in the unit
+    of ``baseline``; pixels without a valid disparity are 0.
+    """
+
+    def __init__(self, focal_length=800, baseline=0.06, mode="bm", num_disparities=64, block_size=15,
+                 pyramid_levels=0, max_depth=None, cache_size=8):
+        """
+        :param focal_length: Focal length in pixels at full resolution
+        :param baseline: Distance between the two cameras (meters)
+        :param mode: "bm", "sgbm" or "sgbm3way"
+        :param num_disparities: Disparity search range at full resolution (multiple of 16)
+        :param block_size: Matching block size (odd)
+        :param pyramid_levels: Number of times the pair is halved before matching
+        :param max_depth: Depths beyond this are treated as invalid (0)
+        :param cache_size: Number of recent pairs whose depth maps are kept for reuse
+        """
+        if mode not in STEREO_MODES:
+            raise ValueError(f"Unknown stereo mode '{mode}', choose from {STEREO_MODES}")
+        self.focal_length = focal_length
+        self.baseline = baseline
+        self.mode = mode
+        self.pyramid_levels = pyramid_levels
+        self.max_depth = max_depth
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.frame_times = deque(maxlen=100)
+
+        # The matcher runs at the pyramid resolution, where the disparity range shrinks with the image
+        scale = 2 ** pyramid_levels
+        self.num_disparities = max(16, int(round(num_disparities / scale / 16)) * 16)
+        block_size = max(5, (block_size // scale) | 1)
+        if mode == "bm":
+            self.matcher = cv2.StereoBM_create(numDisparities=self.num_disparities, blockSize=block_size)
+        else:
+            self.matcher = cv2.StereoSGBM_create(
+                minDisparity=0, numDisparities=self.num_disparities, blockSize=block_size,
+                P1=8 * block_size ** 2, P2=32 * block_size ** 2, uniquenessRatio=10,
+                speckleWindowSize=100, speckleRange=2,
+                mode=cv2.STEREO_SGBM_MODE_SGBM_3WAY if mode == "sgbm3way" else cv2.STEREO_SGBM_MODE_SGBM)
+
+    def _prepare(self, image):
+        if self.mode == "bm" and image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        for _ in range(self.pyramid_levels):
+            image = cv2.pyrDown(image)
+        return image
+
+    def disparity(self, left, right):
+        """Float32 disparity in full-resolution pixels (<= 0 where matching failed)"""
+        raw = self.matcher.compute(self._prepare(left), self._prepare(right))
+        disparity = raw.astype(np.float32) * (2 ** self.pyramid_levels / 16.0)  # fixed point with 4 fractional bits
+        if self.pyramid_levels:
+            h, w = left.shape[:2]
+            disparity = cv2.resize(disparity, (w, h), interpolation=cv2.INTER_NEAREST)
+        return disparity
+
+    def depth_from_disparity(self, disparity):
+        """Metric float32 depth, 0 where the disparity is invalid or the depth exceeds max_depth"""
+        depth = np.zeros_like(disparity, dtype=np.float32)
+        valid = disparity > 0
+        depth[valid] = np.float32(self.focal_length * self.baseline) / disparity[valid]
+        if self.max_depth:
+            depth[depth > self.max_depth] = 0
+        return depth
+
+    def depth(self, left, right):
+        """Depth map of a rectified pair, served from the cache when the same pair was processed before"""
+        key = hashlib.blake2b(left.tobytes(), digest_size=16)
+        key.update(right.tobytes())
+        key = key.digest()
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        started = time.perf_counter()
+        depth = self.depth_from_disparity(self.disparity(left, right))
+        depth.setflags(write=False)  # shared with later callers through the cache
+        self.frame_times.append(time.perf_counter() - started)
+
+        self._cache[key] = depth
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return depth
+
+    @property
+    def fps(self):
+        """Pairs per second over the recent computed pairs"""
+        return len(self.frame_times) / sum(self.frame_times) if self.frame_times else None
+
+    def stream(self, pairs, report_every=30):
+        """
+        Depth maps for an iterable of (left, right) pairs, printing the rate every report_every pairs.
+        :return: Generator of float32 depth maps
+        """
+        for count, (left, right) in enumerate(pairs, 1):
+            yield self.depth(left, right)
+            if report_every and count % report_every == 0:
+                print(f"📏 {count} stereo pairs, {self.fps or 0:.1f} FPS ({self.mode}, pyramid {self.pyramid_levels})")
+
+
+def split_side_by_side(frame):
+    """(left, right) halves of a side-by-side stereo camera frame"""
+    half = frame.shape[1] // 2
+    return frame[:, :half], frame[:, half:]
+
+
+def video_pairs(left_source, right_source=None):
+    """Yield (left, right) pairs from two videos/cameras, or from one side-by-side source"""
+    left = cv2.VideoCapture(left_source)
+    right = cv2.VideoCapture(right_source) if right_source is not None else None
+    try:
+        while True:
+            ok, frame = left.read()
+            if not ok:
+                return
+            if right is None:
+                yield split_side_by_side(frame)
+                continue
+            ok, other = right.read()
+            if not ok:
+                return
+            yield frame, other
+    finally:
+        left.release()
+        if right is not None:
+            right.release()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Streaming stereo depth with FPS reporting")
+    parser.add_argument("left", help="Left video/camera, or a side-by-side stereo video when right is omitted")
+    parser.add_argument("right", nargs="?")
+    parser.add_argument("--mode", choices=STEREO_MODES, default="bm")
+    parser.add_argument("--pyramid", type=int, default=0)
+    parser.add_argument("--focal-length", type=float, default=800)
+    parser.add_argument("--baseline", type=float, default=0.06)
+    parser.add_argument("--display", action="store_true")
+    args = parser.parse_args()
+
+    left, right = (int(s) if s is not None and s.isdigit() else s for s in (args.left, args.right))
+    engine = StereoDepthEngine(args.focal_length, args.baseline, args.mode, pyramid_levels=args.pyramid)
+    for depth in engine.stream(video_pairs(left, right)):
+        if args.display:
+            cv2.imshow("Depth", cv2.applyColorMap(cv2.convertScaleAbs(depth, alpha=255 / (depth.max() or 1)),
+                                                  cv2.COLORMAP_JET))
+            if cv2.waitKey(1) & 0xFF == ord("q"):
+                break
+    print(f"📏 {engine.mode} pyramid {engine.pyramid_levels}: {engine.fps or 0:.1f} FPS")
@@ -1,64 +1,137 @@
+import asyncio
+import time
 import cv2
-import face_recognition
-from query_categorizer import QueryCategorizer
-from tejas_ai import TejasAI
-from real_time_processor import RealTimeProcessor
-from computer_vision import ComputerVision
-from reconstruct_3d import Reconstruct3D
-from image_generator import ImageGenerator
-from stt_tts import STT, TTS  # Importing STT & TTS
+from camera_service import get_camera
+from command_core import CommandCore
+from command_dispatcher import CommandDispatcher
+from face_auth import FaceAuthenticator, FaceEnrollmentStore
+from lazy_loader import SubsystemManager
 
 # Initialize image generator (Choose API or Local Model)
 use_api = False  # Set to True if using DeepAI API
 api_key = "your_deepai_api_key"  # Required if using API
 
+# Speech recognition backend: "google" (online) or "vosk" / "whisper_cpp" (offline,
+# with model_path / model options), see Functions/stt_backends.py
+stt_options = {"backend": "google"}
+
+# Subsystems are built on first use. "prewarm" lists the ones to build in the
+# background right after startup, "idle_timeout" (seconds) unloads heavy models
+# that have not been used for that long. "concurrency" caps how many commands
+# run on a subsystem at once and "timeouts" (seconds) gives up on slow ones
+# ("assistant" is the free-form question path, "default" everything else).
+# Every command that opens an OpenCV window (scans, detection, 3D capture)
+# shares the "camera_ui" limit, so only one window loop runs at a time.
+# "voice_input" keeps the microphone listening next to the keyboard (it then
+# owns the microphone, and "listen mode" just points you to it).
+subsystem_config = {
+    "prewarm": ["tts", "query_categorizer"],
+    "idle_timeout": {"tejas_ai": 1800, "vision": 600, "reconstructor": 600, "image_generator": 600},
+    "concurrency": {"camera_ui": 1, "image_generator": 2, "stt": 1, "assistant": 1, "default": 2},
+    "timeouts": {"assistant": 300},
+    "voice_input": False,
+}
+
+
+def load_knowledge():
+    from knowledge import Knowledge
+    return Knowledge()
+
+
+def load_real_time_processor():
+    from real_time_processor import RealTimeProcessor
+    return RealTimeProcessor()
+
+
+def load_vision():
+    from computer_vision import ComputerVision
+    return ComputerVision()
+
+
+def load_reconstructor():
+    from reconstruct_3d import Reconstruct3D
+    return Reconstruct3D()
+
+
+def load_image_generator():
+    from image_generator import ImageGenerator
+    return ImageGenerator(use_api=use_api, api_key=api_key)
+
+
+def load_query_categorizer():
+    from query_classifier import QueryRouter
+    return QueryRouter()
+
+
+def load_stt():
+    from stt_tts import STT
+    return STT(**stt_options)
+
+
+def load_tts():
+    from stt_tts import TTS
+    return TTS()
+
+
+SUBSYSTEM_FACTORIES = {
+    "tejas_ai": load_knowledge,
+    "real_time_processor": load_real_time_processor,
+    "vision": load_vision,
+    "reconstructor": load_reconstructor,
+    "image_generator": load_image_generator,
+    "query_categorizer": load_query_categorizer,
+    "stt": load_stt,
+    "tts": load_tts,
+}
+
+# Cleanup run on a subsystem's instance when it is unloaded
+SUBSYSTEM_UNLOADERS = {
+    "tejas_ai": lambda knowledge: knowledge.unload_model(),  # Frees the LLM weights
+    "vision": lambda vision: vision.close(),
+    "image_generator": lambda generator: generator.close(),
+    "tts": lambda tts: tts.close(),  # Finishes the queued speech
+}
+
 
 class FaceUnlock:
     """Handles face recognition-based unlocking."""
     
-    def __init__(self):
+    def __init__(self, camera=None, store_path="./face_db/encodings.npz", authenticator_options=None):
         print("🔒 Face recognition activated for unlocking...")
-        self.known_face_encodings = []
-        self.known_face_names = []
+        self.camera = camera or get_camera(0)  # Shared with the vision subsystems, released when idle
+        self.store = FaceEnrollmentStore(store_path)
         self.load_faces()
+        self.authenticator = FaceAuthenticator(self.store, **(authenticator_options or {}))
 
     def load_faces(self):
-        """Load authorized faces for unlocking"""
+        """Enroll face.jpg as the authorized user the first time, later starts load the stored encodings"""
+        if len(self.store):
+            return
         try:
-            my_image = face_recognition.load_image_file("face.jpg")  # Replace with your face image
-            my_face_encoding = face_recognition.face_encodings(my_image)[0]
-            self.known_face_encodings.append(my_face_encoding)
-            self.known_face_names.append("Authorized User")
+            if not self.store.enroll("Authorized User", ["face.jpg"]):  # Replace with your face image
+                print("⚠️ Error loading face: no single face found in face.jpg")
         except Exception as e:
             print(f"⚠️ Error loading face: {e}")
 
     def authenticate(self):
         """Capture camera feed and authenticate"""
-        video_capture = cv2.VideoCapture(0)
-        
-        while True:
-            ret, frame = video_capture.read()
-            if not ret:
-                break
-
-            rgb_frame = frame[:, :, ::-1]  # Convert BGR to RGB
-            face_locations = face_recognition.face_locations(rgb_frame)
-            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-
-            for face_encoding in face_encodings:
-                matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding)
-                if True in matches:
-                    print("✅ Access Granted!")
-                    video_capture.release()
+        started = time.perf_counter()
+        self.authenticator.reset()
+        with self.camera.subscribe() as frames:
+            for frame in frames:
+                granted = [name for name, _, _ in self.authenticator.process(frame) if name]
+                if granted:
+                    print(f"✅ Access Granted! Welcome {granted[0]} ({time.perf_counter() - started:.2f}s)")
                     cv2.destroyAllWindows()
+                    self.authenticator.gate.print_stats()
                     return True
 
-            cv2.imshow("Face Unlock", frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+                cv2.imshow("Face Unlock", frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
 
-        video_capture.release()
         cv2.destroyAllWindows()
+        self.authenticator.gate.print_stats()
         print("❌ Access Denied!")
         return False
 
@@ -66,76 +139,229 @@ class FaceUnlock:
 class MainAI:
     """Main AI system that routes queries and commands"""
     
-    def __init__(self):
-        self.tejas_ai = Knowledge()
-        self.real_time_processor = RealTimeProcessor()
-        self.vision = ComputerVision()
-        self.reconstructor = Reconstruct3D()
-        self.image_generator = ImageGenerator(use_api=use_api, api_key=api_key)
-        self.query_categorizer = QueryCategorizer()
-        self.stt = STT()
-        self.tts = TTS()
+    def __init__(self, config=None):
+        started = time.perf_counter()
+        config = config or subsystem_config
+        self.subsystems = SubsystemManager()
+        for name, factory in SUBSYSTEM_FACTORIES.items():
+            self.subsystems.register(name, factory, idle_timeout=config.get("idle_timeout", {}).get(name),
+                                     on_unload=SUBSYSTEM_UNLOADERS.get(name))
+        self.subsystems.start_idle_reaper()
+        if config.get("prewarm"):
+            self.subsystems.prewarm(config["prewarm"])
+        self.metrics = {}  # time_to_first_token / time_to_first_audio of the last streamed answer
+        self.dispatcher = CommandDispatcher(fallback=self.answer_query)
+        self.register_commands(self.dispatcher)
+        self.config = config
+        self.core = None  # CommandCore once the concurrent command loop runs
+        print(f"🚀 Tejas AI core ready in {time.perf_counter() - started:.2f}s (subsystems load on first use)")
+
+    # Subsystems are resolved through the manager so they are only built when a command needs them
+    tejas_ai = property(lambda self: self.subsystems.get("tejas_ai"))
+    real_time_processor = property(lambda self: self.subsystems.get("real_time_processor"))
+    vision = property(lambda self: self.subsystems.get("vision"))
+    reconstructor = property(lambda self: self.subsystems.get("reconstructor"))
+    image_generator = property(lambda self: self.subsystems.get("image_generator"))
+    query_categorizer = property(lambda self: self.subsystems.get("query_categorizer"))
+    stt = property(lambda self: self.subsystems.get("stt"))
+    tts = property(lambda self: self.subsystems.get("tts"))
+
+    def report_load_times(self):
+        """Print which subsystems are loaded and how long each took to build"""
+        for name, info in self.subsystems.report().items():
+            load_time = f"{info['load_time']:.2f}s" if info["load_time"] is not None else "-"
+            state = "loaded" if info["loaded"] else "not loaded"
+            print(f"   {name:<20} {state:<12} last load {load_time} ({info['load_count']}x)")
+        if self.subsystems.subsystems["tts"].loaded:
+            speech = self.tts.report()
+            print(f"   🔊 TTS queue latency: mean {speech.get('mean_queue_ms', 0):.0f}ms, "
+                  f"p95 {speech.get('p95_queue_ms', 0):.0f}ms ({speech['spoken']} spoken, "
+                  f"{speech['cache_hits']} from cache, {speech['stale']} stale)")
+        if self.core is not None:
+            for subsystem, row in self.core.report()["subsystems"].items():
+                print(f"   ⚙️ {subsystem:<16} {row['commands']} commands, mean {row['mean_latency_s']:.2f}s, "
+                      f"waited {row['mean_wait_s']:.2f}s for a slot")
+
+    def shutdown(self):
+        self.subsystems.stop()
+        self.subsystems.unload("tts")
+        get_camera(0).stop()
+
+    def speak_stream(self, sentences, started, cancelled=None):
+        """
+        Speak each sentence as soon as it is complete while generation continues in the background
+        :param cancelled: Optional threading.Event checked every sentence; once set the answer stops being
+                          read out, including the sentences already queued
+        """
+        spoken = []
+        utterances = []
+        self.metrics["time_to_first_audio"] = None
+        for sentence in sentences:
+            if cancelled is not None and cancelled.is_set():
+                break
+            if not spoken:
+                self.metrics["time_to_first_audio"] = time.perf_counter() - started
+                print("🤖 AI Response:", end=" ", flush=True)
+            print(sentence, end=" ", flush=True)
+            utterances.append(self.tts.speak(sentence, max_age=None))  # Answers are never dropped as stale
+            spoken.append(sentence)
+        print()
+        if cancelled is not None and cancelled.is_set():
+            for utterance in utterances:
+                utterance.cancel()
+        if utterances and utterances[0].started is not None:
+            self.metrics["time_to_first_audio"] = utterances[0].started - started  # Includes the TTS queue wait
+        return " ".join(spoken)
+
+    def register_commands(self, dispatcher):
+        """Register MainAI's built-in commands (other subsystems can add theirs the same way)"""
+        # HighGUI windows are not safe to drive from two threads, every windowed handler shares one slot
+        dispatcher.register("scan_text", "scan text", self.scan_text, subsystem="camera_ui")
+        dispatcher.register("scan_code", ["scan code", "scan barcode", "scan qr code"], self.scan_code,
+                            subsystem="camera_ui")
+        dispatcher.register("scan_image", "scan image", self.scan_image, subsystem="camera_ui")
+        dispatcher.register("detect_objects", ["detect object", "detect objects"], self.detect_objects,
+                            subsystem="camera_ui")
+        dispatcher.register("scan_environment", "scan real time environment", self.scan_environment,
+                            subsystem="camera_ui")
+        dispatcher.register("make_3d_model", "make a 3d model", self.make_3d_model, subsystem="camera_ui")
+        dispatcher.register("generate_image", "generate an image", self.generate_image, anchored=True,
+                            subsystem="image_generator")
+        dispatcher.register("listen_mode", "listen mode", self.listen_mode, subsystem="stt")
+
+    def command_core(self):
+        """CommandCore running this MainAI's commands concurrently with the configured limits and timeouts"""
+        self.core = CommandCore(self.dispatcher, limits=self.config.get("concurrency"),
+                                timeouts=self.config.get("timeouts"), controls={"status": self.report_load_times})
+        return self.core
 
     def process_command(self, command):
         """Handle different commands"""
-        command = command.lower()
-
-        if "scan text" in command:
-            result = self.vision.scan_text()
-            print("📝 Scanned Text:", result)
-            self.tts.speak("Here is the scanned text.")
-
-        elif "scan code" in command:
-            result = self.vision.scan_barcode()
-            print("🔍 Scanned Code:", result)
-            self.tts.speak("Barcode scanned successfully.")
-
-        elif "scan image" in command:
-            result = self.vision.recognize_image()
-            print("🖼️ Image Recognized:", result)
-            self.tts.speak("Image recognition completed.")
-
-        elif "detect object" in command:
-            result = self.vision.detect_objects()
-            print("📦 Detected Objects:", result)
-            self.tts.speak("Object detection successful.")
-
-        elif "scan real time environment" in command:
-            result = self.vision.scan_real_time()
-            print("🌎 Real-time Environment Scanned.")
-            self.tts.speak("Real-time scanning done.")
-
-        elif "make a 3d model" in command:
-            self.reconstructor.create_3d_model()
+        return self.dispatcher.dispatch(command)
+
+    # Long-running handlers pass match.cancelled down to their frame / chunk loops, so "cancel <id>"
+    # and timeouts stop the work itself, and stay quiet about a result they were stopped before reaching.
+    # They hold their subsystem with subsystems.use() so the idle reaper never unloads it mid-command.
+
+    def scan_text(self, match):
+        with self.subsystems.use("vision") as vision:
+            result = vision.extract_text_from_camera(cancelled=match.cancelled)
+        if match.cancelled.is_set():
+            return
+        print("📝 Scanned Text:", result)
+        self.tts.speak("Here is the scanned text.")
+
+    def scan_code(self, match):
+        with self.subsystems.use("vision") as vision:
+            result = vision.scan_barcode(cancelled=match.cancelled)
+        if match.cancelled.is_set():
+            return
+        print("🔍 Scanned Code:", result)
+        self.tts.speak("Barcode scanned successfully.")
+
+    def scan_image(self, match):
+        # Image recognition is served by the object detector
+        with self.subsystems.use("vision") as vision:
+            result = vision.detect_objects(cancelled=match.cancelled)
+        if match.cancelled.is_set():
+            return
+        print("🖼️ Image Recognized:", result)
+        self.tts.speak("Image recognition completed.")
+
+    def detect_objects(self, match):
+        with self.subsystems.use("vision") as vision:
+            result = vision.detect_objects(cancelled=match.cancelled)
+        if match.cancelled.is_set():
+            return
+        print("📦 Detected Objects:", result)
+        self.tts.speak("Object detection successful.")
+
+    def scan_environment(self, match):
+        with self.subsystems.use("vision") as vision:
+            vision.scan_real_time_environment(cancelled=match.cancelled)
+        if match.cancelled.is_set():
+            return
+        print("🌎 Real-time Environment Scanned.")
+        self.tts.speak("Real-time scanning done.")
+
+    def make_3d_model(self, match):
+        with self.subsystems.use("reconstructor") as reconstructor:
+            created = reconstructor.run(cancelled=match.cancelled)
+        if created:
             print("🛠️ 3D Model Created!")
             self.tts.speak("3D model created successfully.")
 
-        elif command.startswith("generate an image"):
-            result = self.image_generator.generate_image(command)
+    def generate_image(self, match):
+        # Generation runs on the image worker / DeepAI client, the prompt returns right away
+        image_generator = self.subsystems.acquire("image_generator")
+        try:
+            job = image_generator.submit(match.argument)
+        except Exception:
+            self.subsystems.release("image_generator")
+            raise
+        if job is None:
+            self.subsystems.release("image_generator")
+            print("❌ Please provide an image description.")
+            return
+        if use_api:
+            print("🖼️ Image requested from DeepAI, keep giving commands meanwhile.")
+            job.add_done_callback(self.show_api_image)
+        else:
+            print(f"🖼️ Image job {job.id} queued, keep giving commands meanwhile.")
+            job.future.add_done_callback(lambda future: self.show_image(job))
+        # Held until the image is done, so the generator is never closed under a queued render
+        (job if use_api else job.future).add_done_callback(lambda _: self.subsystems.release("image_generator"))
+        self.tts.speak("Generating your image in the background.")
 
-            if use_api:
-                print(f"🖼️ Image generated: {result}")  # Display URL
-                self.tts.speak("Image generated successfully.")
-            else:
-                result.show()  # Display image locally
-                self.tts.speak("Image displayed.")
+    def show_image(self, job):
+        """Display a finished image job (runs on the image worker thread unless it came from the cache)"""
+        if job.future.cancelled() or job.future.exception():
+            return
+        job.result().show()  # Display image locally
 
-        elif "listen mode" in command:
-            print("🎙️ Entering voice command mode...")
-            self.tts.speak("Voice mode activated. Say your command.")
-            spoken_command = self.stt.listen()
-            if spoken_command:
-                self.process_command(spoken_command)
+    def show_api_image(self, future):
+        """Report a finished DeepAI request (runs on a client thread unless it came from the cache)"""
+        if future.exception():
+            print(f"⚠️ Image generation failed: {future.exception()}")
+            return
+        result = future.result()
+        print(f"🖼️ Image generated: {result.path or result.url}")  # Local copy, else the URL
 
-        else:
-            # Categorize the query and route accordingly
-            category = self.query_categorizer.categorize(command)
+    def listen_mode(self, match):
+        if self.core is not None and self.config.get("voice_input"):
+            # The voice input reader already owns the microphone and feeds the same queue
+            print("🎙️ Voice input is always on, just say your command.")
+            self.tts.speak("I am already listening. Say your command.")
+            return
+        print("🎙️ Entering voice command mode...")
+        self.tts.speak("Voice mode activated. Say your command.").wait()  # Keep the prompt out of the recording
+        spoken_command = self.stt.listen(cancelled=match.cancelled)
+        if spoken_command and self.core is not None:
+            self.core.submit_threadsafe(spoken_command, "voice")  # Same queue as typed commands
+        elif spoken_command:
+            self.process_command(spoken_command)
 
-            if category == "general":
-                response = self.tejas_ai.get_response(command)
-            else:
-                response = self.real_time_processor.process(command)
+    def answer_query(self, match):
+        """Fallback for free-form commands: categorize the query and route accordingly"""
+        command = match.command.lower()
+        category = self.query_categorizer.categorize(command)
 
+        if category == "general":
+            started = time.perf_counter()
+            with self.subsystems.use("tejas_ai") as tejas_ai:
+                self.speak_stream(tejas_ai.stream_query(command, cancelled=match.cancelled), started,
+                                  match.cancelled)
+                stream_metrics = tejas_ai.stream_metrics
+            if match.cancelled.is_set():
+                print("🛑 Answer stopped")
+                return
+            self.metrics["time_to_first_token"] = stream_metrics.get("time_to_first_token")
+            print(f"⏱️ First token: {self.metrics['time_to_first_token'] or 0:.2f}s, "
+                  f"first audio: {self.metrics['time_to_first_audio'] or 0:.2f}s")
+        else:
+            response = self.real_time_processor.process(command)
+            if match.cancelled.is_set():
+                return
             print("🤖 AI Response:", response)
             self.tts.speak(response)
 
@@ -144,17 +370,31 @@ if __name__ == "__main__":
     face_unlock = FaceUnlock()
 
     if face_unlock.authenticate():
+        from stt_tts import BACKGROUND
+
+        main_ai = MainAI()  # Built only once unlocked, nothing loads for an unauthenticated user
         print("🔹 Welcome to the Tejas AI System")
-		self.tts.speak(" Welcome to the Tejas AI System")
-        main_ai = MainAI()
-
-        while True:
-			self.tts.speak("Enter Command (or type 'listen mode' for voice commands")
-            command = input("\n💬 Enter Command (or type 'listen mode' for voice commands): ")
-            if command.lower() in ["exit", "quit"]:
-                print("🚪 Exiting AI System...")
-                break
-            main_ai.process_command(command)
+        main_ai.tts.speak(" Welcome to the Tejas AI System")
+
+        def read_command():
+            main_ai.tts.speak("Enter Command (or type 'listen mode' for voice commands", priority=BACKGROUND)
+            return input("\n💬 Enter Command (or type 'listen mode' for voice commands): ")
+
+        # Commands run concurrently: the prompt comes back while earlier ones are still working.
+        # Type "jobs" to list them, "cancel <id>" to stop one.
+        readers = [(read_command, "text")]
+        if main_ai.config.get("voice_input"):
+            readers.append((main_ai.stt.listen, "voice"))  # Sole microphone user, listen mode defers to it
+        core = main_ai.command_core()
+        asyncio.run(core.run(readers))
+        print("🚪 Exiting AI System...")
+        core.close()
+        main_ai.shutdown()
     else:
+        from stt_tts import TTS
+
         print("🔒 System Locked. Unauthorized Access Denied!")
-		self.tts.speak("System Locked. Unauthorized Access Denied!")
\ No newline at end of file
+        tts = TTS()
+        tts.speak("System Locked. Unauthorized Access Denied!")
+        tts.close()  # Finishes the queued speech
+        get_camera(0).stop()